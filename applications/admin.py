@@ -1,21 +1,27 @@
 from django.contrib import admin
-from django.urls import path
-from django.shortcuts import render, redirect
+from django.urls import path, reverse
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
-from django.http import HttpResponse
-from django.db.models import Sum, Count
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse
 from django.utils import timezone
 from django.utils.html import format_html
 import csv
-import io
+
+from core.imports import READERS, import_job_status_data, queue_import_job
+from core.models import ImportJob
+from core.renditions import rendition_url
 
 from .models import (
     Program, FormField, Application, ApplicationDocument,
     Beneficiary, BeneficiarySupport, EducationProfile,
     HealthProfile, YouthProfile, HousingProfile,
-    ApplicationStatus, NotificationPreference
+    ApplicationStatus, NotificationPreference, OutboundEmail, ExportJob, ProgramStats, ImpactSnapshot,
+    ImpactRollup
+)
+from .utils import (
+    approve_applications, bulk_update_status, rebuild_program_stats, refresh_impact_snapshot
 )
-from .signals import create_beneficiary_from_application
 
 class FormFieldInline(admin.TabularInline):
     model = FormField
@@ -67,35 +73,24 @@ class ApplicationAdmin(admin.ModelAdmin):
 
     def approve_and_create_beneficiary(self, request, queryset):
         """Approve applications and create beneficiary records"""
-        created_count = 0
-        for application in queryset.filter(status__in=['submitted', 'under_review']):
-            application.status = 'approved'
-            application.reviewed_by = request.user
-            application.save()
-
-            # Create beneficiary if not exists
-            if not hasattr(application, 'beneficiary'):
-                create_beneficiary_from_application(
-                    application,
-                    beneficiary_type=None,
-                    created_by=request.user
-                )
-                created_count += 1
-
+        approved, beneficiaries = approve_applications(
+            queryset.filter(status__in=['submitted', 'under_review']),
+            request.user, notes='Approved from admin'
+        )
         messages.success(
             request,
-            f'{queryset.count()} applications approved, {created_count} beneficiaries created.'
+            f'{len(approved)} applications approved, {len(beneficiaries)} beneficiaries created.'
         )
     approve_and_create_beneficiary.short_description = "Approve and create beneficiary"
 
     def mark_under_review(self, request, queryset):
-        queryset.update(status='under_review', reviewed_by=request.user)
-        messages.success(request, f'{queryset.count()} applications marked as under review.')
+        changed = bulk_update_status(queryset, 'under_review', request.user, notes='Marked as under review')
+        messages.success(request, f'{len(changed)} applications marked as under review.')
     mark_under_review.short_description = "Mark as under review"
 
     def mark_rejected(self, request, queryset):
-        queryset.update(status='rejected', reviewed_by=request.user)
-        messages.success(request, f'{queryset.count()} applications rejected.')
+        changed = bulk_update_status(queryset, 'rejected', request.user, notes='Rejected from admin')
+        messages.success(request, f'{len(changed)} applications rejected.')
     mark_rejected.short_description = "Mark as rejected"
 
 
@@ -221,13 +216,46 @@ class BeneficiarySupportInline(admin.TabularInline):
     readonly_fields = ('created_at',)
 
 
+class TotalSupportFilter(admin.SimpleListFilter):
+    """Filter beneficiaries by the stored total of their support records"""
+    title = "total support"
+    parameter_name = 'total_support'
+    RANGES = {
+        'none': (None, 0),
+        'under_100k': (0, 100000),
+        '100k_500k': (100000, 500000),
+        '500k_1m': (500000, 1000000),
+        'over_1m': (1000000, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return (
+            ('none', 'No support yet'),
+            ('under_100k', 'Under ₦100,000'),
+            ('100k_500k', '₦100,000 – ₦500,000'),
+            ('500k_1m', '₦500,000 – ₦1,000,000'),
+            ('over_1m', 'Over ₦1,000,000'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.RANGES:
+            return queryset
+        low, high = self.RANGES[self.value()]
+        if low is None:
+            return queryset.filter(total_support_amount__lte=0)
+        queryset = queryset.filter(total_support_amount__gt=low)
+        if high is not None:
+            queryset = queryset.filter(total_support_amount__lte=high)
+        return queryset
+
+
 @admin.register(Beneficiary)
 class BeneficiaryAdmin(admin.ModelAdmin):
     list_display = (
         'full_name', 'beneficiary_type', 'program', 'status',
         'start_date', 'total_support', 'photo_preview'
     )
-    list_filter = ('beneficiary_type', 'status', 'gender', 'program', 'show_on_website')
+    list_filter = ('beneficiary_type', 'status', 'gender', 'program', 'show_on_website', TotalSupportFilter)
     search_fields = ('full_name', 'email', 'phone_number', 'guardian_name')
     date_hierarchy = 'start_date'
     readonly_fields = ('created_at', 'updated_at', 'total_support_display')
@@ -285,7 +313,7 @@ class BeneficiaryAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 50%;"/>',
-                obj.photo.url
+                rendition_url(obj.photo)
             )
         return "-"
     photo_preview.short_description = "Photo"
@@ -293,6 +321,7 @@ class BeneficiaryAdmin(admin.ModelAdmin):
     def total_support(self, obj):
         return f"₦{obj.total_support_amount:,.2f}"
     total_support.short_description = "Total Support"
+    total_support.admin_order_field = 'total_support_amount'
 
     def total_support_display(self, obj):
         return f"₦{obj.total_support_amount:,.2f}"
@@ -331,7 +360,7 @@ class BeneficiaryAdmin(admin.ModelAdmin):
             'Phone', 'Email', 'Start Date', 'Total Support'
         ])
 
-        for b in queryset:
+        for b in queryset.select_related('program'):
             writer.writerow([
                 b.full_name,
                 b.get_beneficiary_type_display(),
@@ -356,70 +385,42 @@ class BeneficiaryAdmin(admin.ModelAdmin):
         return custom_urls + urls
 
     def dashboard_view(self, request):
-        """Dashboard with statistics"""
+        """Dashboard with statistics, read from the impact rollup as last refreshed"""
+        totals = ImpactRollup.objects.totals()
         context = {
             **self.admin_site.each_context(request),
             'title': 'Beneficiary Dashboard',
-            'total_beneficiaries': Beneficiary.objects.count(),
-            'active_beneficiaries': Beneficiary.objects.filter(status='active').count(),
-            'by_type': Beneficiary.objects.values('beneficiary_type').annotate(count=Count('id')),
-            'total_disbursed': BeneficiarySupport.objects.aggregate(total=Sum('amount'))['total'] or 0,
+            'total_beneficiaries': totals['beneficiaries'],
+            'active_beneficiaries': totals['active_beneficiaries'],
+            'by_type': [
+                {'beneficiary_type': row['beneficiary_type'], 'count': row['beneficiaries']}
+                for row in ImpactRollup.objects.totals('beneficiary_type')
+            ],
+            'total_disbursed': totals['amount_disbursed'],
             'recent_beneficiaries': Beneficiary.objects.order_by('-created_at')[:10],
         }
         return render(request, 'admin/applications/beneficiary/dashboard.html', context)
 
     def bulk_upload_view(self, request):
-        """Bulk upload beneficiaries from CSV"""
+        """Bulk upload beneficiaries from CSV or Excel; the import worker processes the file"""
         if request.method == 'POST' and request.FILES.get('csv_file'):
             csv_file = request.FILES['csv_file']
-
-            try:
-                decoded_file = csv_file.read().decode('utf-8')
-                reader = csv.DictReader(io.StringIO(decoded_file))
-
-                created_count = 0
-                errors = []
-
-                for row_num, row in enumerate(reader, start=2):
-                    try:
-                        # Get program
-                        program = None
-                        if row.get('program'):
-                            program = Program.objects.filter(name__icontains=row['program']).first()
-
-                        beneficiary = Beneficiary.objects.create(
-                            beneficiary_type=row.get('type', 'education'),
-                            program=program,
-                            full_name=row.get('full_name', ''),
-                            gender=row.get('gender', 'male').lower(),
-                            phone_number=row.get('phone', ''),
-                            email=row.get('email', ''),
-                            address=row.get('address', ''),
-                            guardian_name=row.get('guardian_name', ''),
-                            guardian_phone=row.get('guardian_phone', ''),
-                            status='active',
-                            start_date=row.get('start_date') or timezone.now().date(),
-                            created_by=request.user,
-                        )
-                        created_count += 1
-
-                    except Exception as e:
-                        errors.append(f"Row {row_num}: {str(e)}")
-
-                if created_count:
-                    messages.success(request, f'Successfully created {created_count} beneficiaries.')
-                if errors:
-                    messages.warning(request, f'Errors: {"; ".join(errors[:5])}')
-
-                return redirect('admin:applications_beneficiary_changelist')
-
-            except Exception as e:
-                messages.error(request, f'Error processing file: {str(e)}')
+            if not csv_file.name.lower().endswith(tuple(READERS)):
+                messages.error(request, 'Invalid file type. Please upload a CSV or Excel (.xlsx) file.')
+            else:
+                job = queue_import_job(request.user, 'beneficiary', csv_file)
+                messages.info(request, f'"{csv_file.name}" has been queued for import.')
+                return redirect(f"{reverse('admin:beneficiary_bulk_upload')}?job={job.pk}")
 
         context = {
             **self.admin_site.each_context(request),
             'title': 'Bulk Upload Beneficiaries',
         }
+        job_id = request.GET.get('job', '')
+        job = ImportJob.objects.filter(pk=job_id, kind='beneficiary').first() if job_id.isdigit() else None
+        if job is not None:
+            context['job'] = job
+            context['job_status'] = import_job_status_data(job)
         return render(request, 'admin/applications/beneficiary/bulk_upload.html', context)
 
 
@@ -444,8 +445,97 @@ class ApplicationStatusAdmin(admin.ModelAdmin):
     search_fields = ('application__applicant__email', 'notes')
 
 
+@admin.register(ProgramStats)
+class ProgramStatsAdmin(admin.ModelAdmin):
+    list_display = ('program', 'total_applications', 'draft', 'submitted', 'under_review',
+                    'additional_info', 'approved', 'rejected', 'updated_at')
+    readonly_fields = ('program', *ProgramStats.STATUS_FIELDS, 'updated_at')
+    actions = ['recount']
+
+    def has_add_permission(self, request):
+        return False
+
+    def recount(self, request, queryset):
+        fixed = rebuild_program_stats(queryset.values_list('program_id', flat=True))
+        messages.success(request, f'{fixed} program counters corrected.')
+    recount.short_description = "Recount from applications"
+
+
+@admin.register(ImpactSnapshot)
+class ImpactSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('computed_at', 'total_beneficiaries', 'total_programs', 'total_disbursed', 'completed_count')
+    readonly_fields = (*ImpactSnapshot.FIGURES, 'active_programs', 'recent_beneficiaries', 'computed_at')
+    actions = ['refresh']
+
+    def has_add_permission(self, request):
+        return False
+
+    def refresh(self, request, queryset):
+        refresh_impact_snapshot()
+        messages.success(request, 'Impact figures recomputed.')
+    refresh.short_description = "Recompute impact figures now"
+
+
 @admin.register(NotificationPreference)
 class NotificationPreferenceAdmin(admin.ModelAdmin):
     list_display = ('user', 'email_on_status_change', 'email_on_review', 'email_on_document_request')
     list_filter = ('email_on_status_change', 'email_on_review')
-    search_fields = ('user__email',)
\ No newline at end of file
+    search_fields = ('user__email',)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipient_display', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('created_at', 'sent_at', 'claimed_by', 'claimed_at', 'last_error')
+    actions = ['requeue']
+
+    def recipient_display(self, obj):
+        return ', '.join(obj.recipients)
+    recipient_display.short_description = "Recipients"
+
+    def requeue(self, request, queryset):
+        count = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), claimed_by=''
+        )
+        messages.success(request, f'{count} emails queued for delivery.')
+    requeue.short_description = "Retry delivery"
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'requested_by', 'status', 'processed_rows', 'total_rows', 'created_at', 'finished_at')
+    list_filter = ('status', 'export_format', 'created_at')
+    readonly_fields = ('requested_by', 'params', 'download_link', 'total_rows', 'processed_rows', 'error',
+                       'created_at', 'started_at', 'updated_at', 'finished_at')
+    actions = ['requeue']
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view),
+                 name='applications_exportjob_download'),
+        ]
+        return custom_urls + urls
+
+    def download_link(self, obj):
+        # The export storage is private, so the file is served by download_view, not MEDIA_URL
+        if not obj.file:
+            return '-'
+        return format_html('<a href="{}">{}</a>',
+                           reverse('admin:applications_exportjob_download', args=[obj.pk]), obj.filename)
+    download_link.short_description = "File"
+
+    def download_view(self, request, pk):
+        job = get_object_or_404(ExportJob, pk=pk)
+        if not self.has_view_permission(request, job):
+            raise PermissionDenied
+        if not job.file:
+            raise Http404
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.filename)
+
+    def requeue(self, request, queryset):
+        count = queryset.filter(status='failed').update(status='queued', processed_rows=0, error='')
+        messages.success(request, f'{count} export jobs queued again.')
+    requeue.short_description = "Run failed exports again"
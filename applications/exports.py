@@ -0,0 +1,330 @@
+"""
+Application export helpers.
+
+Rows are read in primary-key ordered chunks with only the exported columns,
+so memory use stays flat no matter how many applications are exported.
+"""
+import csv
+import logging
+import re
+import tempfile
+import uuid
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from openpyxl import Workbook
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.platypus import Flowable, SimpleDocTemplate, Table, TableStyle
+
+from core.jobs import claim_job
+from core.utils import Echo
+
+from .models import Application, ApplicationStatus, ExportJob
+
+logger = logging.getLogger(__name__)
+
+
+EXPORT_HEADER = ['Program', 'Applicant', 'Status', 'Submitted Date', 'Review Notes', 'Reviewed By']
+
+EXPORT_COLUMNS = (
+    'program__name',
+    'applicant__first_name', 'applicant__last_name',
+    'status', 'submitted_at', 'review_notes',
+    'reviewed_by__first_name', 'reviewed_by__last_name',
+)
+
+HISTORY_HEADER = ['Application ID', 'Program', 'Applicant', 'Status', 'Notes', 'Changed By', 'Changed At']
+
+HISTORY_COLUMNS = (
+    'application_id', 'application__program__name',
+    'application__applicant__first_name', 'application__applicant__last_name',
+    'status', 'notes', 'created_by__first_name', 'created_by__last_name', 'created_at',
+)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def export_queryset(date_from=None, date_to=None):
+    """Applications selected for export, optionally limited to a submission date range"""
+    applications = Application.objects.all()
+    if date_from and date_to:
+        applications = applications.filter(
+            submitted_at__date__range=[date_from, date_to]
+        )
+    return applications
+
+
+def iter_values_chunked(queryset, fields, chunk_size=None):
+    """
+    Yield ``values_list`` tuples for ``fields`` in primary-key order.
+
+    Each chunk is a separate ``pk > last_pk LIMIT n`` query. Unlike
+    ``iterator()`` this stays bounded on MySQL, whose driver buffers the
+    complete result set of a single query.
+    """
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    queryset = queryset.order_by('pk').values_list('pk', *fields)
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        for row in rows:
+            yield row[1:]
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+def _full_name(first_name, last_name):
+    # Same result as User.get_full_name() without loading the user
+    return f"{first_name or ''} {last_name or ''}".strip()
+
+
+def iter_export_rows(queryset, chunk_size=None):
+    """Yield one list per application, matching EXPORT_HEADER"""
+    status_labels = dict(Application.STATUS_CHOICES)
+    for (program, first_name, last_name, status, submitted_at, review_notes,
+         reviewer_first_name, reviewer_last_name) in iter_values_chunked(queryset, EXPORT_COLUMNS, chunk_size):
+        yield [
+            program,
+            _full_name(first_name, last_name),
+            status_labels.get(status, status),
+            submitted_at.strftime('%Y-%m-%d') if submitted_at else '',
+            review_notes or '',
+            _full_name(reviewer_first_name, reviewer_last_name),
+        ]
+
+
+def stream_csv(rows, rows_per_chunk=500):
+    """Encode rows as CSV text, yielding the header first and then batches of lines"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= rows_per_chunk:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_history_rows(queryset, chunk_size=None):
+    """Yield the ApplicationStatus history of the given applications, matching HISTORY_HEADER"""
+    status_labels = dict(Application.STATUS_CHOICES)
+    history = ApplicationStatus.objects.filter(application__in=queryset.values('pk'))
+    for (application_id, program, first_name, last_name, status, notes,
+         author_first_name, author_last_name, created_at) in iter_values_chunked(history, HISTORY_COLUMNS, chunk_size):
+        yield [
+            application_id,
+            program,
+            _full_name(first_name, last_name),
+            status_labels.get(status, status),
+            notes,
+            _full_name(author_first_name, author_last_name),
+            created_at.strftime('%Y-%m-%d %H:%M') if created_at else '',
+        ]
+
+
+def sheet_title(name, used):
+    """
+    Turn ``name`` into a valid worksheet title that is not in ``used``.
+
+    Excel titles are at most 31 characters, may not contain ``[]:*?/\\``
+    and are compared case-insensitively.
+    """
+    base = re.sub(r'[\[\]:*?/\\]', ' ', name or '').strip().strip("'")[:31] or 'Sheet'
+    title, n = base, 1
+    while title.lower() in used:
+        n += 1
+        suffix = f' ({n})'
+        title = base[:31 - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
+
+def write_xlsx(fileobj, queryset, per_program=False, include_history=False, chunk_size=None):
+    """
+    Write the export as an XLSX workbook into ``fileobj``.
+
+    The workbook is opened in write-only mode, so rows go straight from the
+    chunked reads to disk instead of being kept as cell objects. With
+    ``per_program`` each program gets its own sheet; ``include_history``
+    adds a sheet with the status history of the exported applications.
+    """
+    wb = Workbook(write_only=True)
+    used = set()
+
+    if per_program:
+        programs = (queryset.order_by('program__name', 'program_id')
+                    .values_list('program_id', 'program__name').distinct())
+        sheets = [(name, queryset.filter(program_id=program_id)) for program_id, name in programs]
+    else:
+        sheets = [('Applications', queryset)]
+
+    for name, applications in sheets:
+        ws = wb.create_sheet(sheet_title(name, used))
+        ws.append(EXPORT_HEADER)
+        for row in iter_export_rows(applications, chunk_size):
+            ws.append(row)
+
+    if include_history:
+        ws = wb.create_sheet(sheet_title('Status History', used))
+        ws.append(HISTORY_HEADER)
+        for row in iter_history_rows(queryset, chunk_size):
+            ws.append(row)
+
+    if not wb.worksheets:
+        wb.create_sheet('Applications').append(EXPORT_HEADER)
+
+    wb.save(fileobj)
+
+
+PDF_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+# Share of the page width given to each EXPORT_HEADER column
+PDF_COLUMN_WIDTHS = (0.2, 0.18, 0.11, 0.11, 0.24, 0.16)
+
+
+class _ProgressMarker(Flowable):
+    """Zero-size flowable that reports how many rows have been laid out once the page reaches it"""
+    def __init__(self, callback, rows):
+        super().__init__()
+        self.callback = callback
+        self.rows = rows
+
+    def wrap(self, available_width, available_height):
+        return 0, 0
+
+    def draw(self):
+        self.callback(self.rows)
+
+
+class _FlowableStream(list):
+    """
+    The flowable list for ``doc.build()``, filled from an iterator as the
+    layout consumes it, so only the tables being laid out are in memory.
+    """
+    def __init__(self, flowables):
+        super().__init__()
+        self.source = iter(flowables)
+
+    def _fill(self, count):
+        while super().__len__() < count:
+            flowable = next(self.source, None)
+            if flowable is None:
+                return
+            self.append(flowable)
+
+    def __len__(self):
+        self._fill(1)
+        return super().__len__()
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            self._fill(index + 1)
+        return super().__getitem__(index)
+
+
+def render_pdf(fileobj, queryset, progress=None, chunk_size=None):
+    """
+    Write the export as a PDF into ``fileobj``.
+
+    Rows are laid out as a series of tables of EXPORT_PDF_ROWS_PER_TABLE rows
+    with a repeated header, so each page break only splits a small table
+    instead of re-measuring every row. The tables are built as the layout
+    reaches them, so memory stays bounded by one table whatever the row
+    count. ``progress`` is called with the number of rows drawn so far.
+    """
+    rows_per_table = getattr(settings, 'EXPORT_PDF_ROWS_PER_TABLE', 500)
+    doc = SimpleDocTemplate(fileobj, pagesize=landscape(letter))
+    col_widths = [doc.width * share for share in PDF_COLUMN_WIDTHS]
+
+    def tables():
+        rows = iter_export_rows(queryset, chunk_size)
+        rows_done = 0
+        while True:
+            chunk = list(islice(rows, rows_per_table))
+            if not chunk and rows_done:
+                return
+            yield Table([EXPORT_HEADER, *chunk], colWidths=col_widths, repeatRows=1, style=PDF_TABLE_STYLE)
+            rows_done += len(chunk)
+            if progress:
+                yield _ProgressMarker(progress, rows_done)
+            if len(chunk) < rows_per_table:
+                return
+
+    doc.build(_FlowableStream(tables()))
+
+
+def queue_export_job(user, export_format, date_from=None, date_to=None):
+    """Queue an export for ``user``, reusing an identical export that is still in progress"""
+    params = {'date_from': date_from, 'date_to': date_to}
+    active = ExportJob.objects.filter(
+        requested_by=user, export_format=export_format, status__in=['queued', 'running']
+    )
+    for job in active:
+        if job.params == params:
+            return job
+    return ExportJob.objects.create(requested_by=user, export_format=export_format, params=params)
+
+
+def claim_export_job(max_running=None):
+    """
+    Mark the oldest queued job as running and return it.
+
+    Returns None when nothing is queued or EXPORT_MAX_CONCURRENT_JOBS jobs are
+    already running. Jobs that stopped reporting progress for longer than
+    EXPORT_JOB_TIMEOUT are marked failed so they no longer hold a slot.
+    """
+    max_running = max_running or getattr(settings, 'EXPORT_MAX_CONCURRENT_JOBS', 2)
+    now = timezone.now()
+    timeout = getattr(settings, 'EXPORT_JOB_TIMEOUT', 1800)
+    ExportJob.objects.filter(status='running', updated_at__lt=now - timedelta(seconds=timeout)).update(
+        status='failed', error='The export worker stopped responding.', finished_at=now, updated_at=now
+    )
+
+    return claim_job(ExportJob, max_running, started_at=now, updated_at=now)
+
+
+def run_export_job(job):
+    """Render a claimed job into its file and record the outcome"""
+    renderers = {'pdf': render_pdf}
+    queryset = export_queryset(job.params.get('date_from'), job.params.get('date_to'))
+    job.total_rows = queryset.count()
+    ExportJob.objects.filter(pk=job.pk).update(total_rows=job.total_rows, processed_rows=0)
+
+    def progress(rows):
+        ExportJob.objects.filter(pk=job.pk).update(processed_rows=rows, updated_at=timezone.now())
+
+    try:
+        with tempfile.TemporaryFile() as output:
+            renderers[job.export_format](output, queryset, progress)
+            output.seek(0)
+            job.file.save(f'{uuid.uuid4().hex}.{job.export_format}', File(output), save=False)
+    except Exception as exc:
+        logger.exception("Export job %s failed", job.pk)
+        job.status = 'failed'
+        job.error = str(exc)
+    else:
+        job.status = 'completed'
+        job.processed_rows = job.total_rows
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'file', 'processed_rows', 'finished_at', 'updated_at'])
+    return job
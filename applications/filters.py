@@ -1,10 +1,10 @@
 import django_filters
 from .models import Application
+from .search import search_applications
 
 class ApplicationFilter(django_filters.FilterSet):
     program_name = django_filters.CharFilter(
-        field_name='program__name',
-        lookup_expr='icontains',
+        method='filter_program_name',
         label='Program Name'
     )
     status = django_filters.ChoiceFilter(
@@ -23,4 +23,7 @@ class ApplicationFilter(django_filters.FilterSet):
 
     class Meta:
         model = Application
-        fields = ['program_name', 'status', 'submitted_after', 'submitted_before']
\ No newline at end of file
+        fields = ['program_name', 'status', 'submitted_after', 'submitted_before']
+
+    def filter_program_name(self, queryset, name, value):
+        return search_applications(queryset, value, fields=['program_name'], rank=False)
\ No newline at end of file
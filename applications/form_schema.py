@@ -0,0 +1,143 @@
+"""
+Compiled per-program application form schemas.
+
+A program's FormField rows are read once, turned into plain field
+definitions and cached under a per-program version token. Saving or
+deleting a FormField or Program replaces the token, so every process
+picks up the change on its next request. Each process also keeps the
+compiled form class for the current version, so a warm apply page builds
+no form fields and makes no FormField queries.
+"""
+import uuid
+
+from django import forms
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import FormField
+
+VERSION_KEY = 'program_form_schema_version:{program_id}'
+SCHEMA_KEY = 'program_form_schema:{program_id}:{version}'
+
+# Compiled schemas of this process, keyed by (program_id, version)
+_compiled = {}
+_COMPILED_LIMIT = 256
+
+
+def parse_options(options):
+    """Normalise FormField.options to a list of strings"""
+    if not options:
+        return []
+    if isinstance(options, str):
+        options = options.replace('\n', ',').split(',')
+    elif isinstance(options, dict):
+        options = options.values()
+    return [str(option).strip() for option in options if str(option).strip()]
+
+
+class CompiledField:
+    """One program question, with the attributes the apply template renders"""
+
+    def __init__(self, id, label, field_type, is_required, help_text, options):
+        self.id = id
+        self.name = f'field_{id}'
+        self.label = label
+        self.field_type = field_type
+        self.is_required = is_required
+        self.help_text = help_text
+        self.options = options
+
+    @property
+    def choices(self):
+        return [(option, option) for option in self.options]
+
+    def form_field(self):
+        """The Django form field that validates this question"""
+        kwargs = {'required': self.is_required, 'label': self.label, 'help_text': self.help_text}
+        if self.field_type == 'textarea':
+            return forms.CharField(widget=forms.Textarea(attrs={'rows': 4}), **kwargs)
+        if self.field_type == 'number':
+            return forms.DecimalField(**kwargs)
+        if self.field_type == 'email':
+            return forms.EmailField(**kwargs)
+        if self.field_type == 'date':
+            return forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}), **kwargs)
+        if self.field_type == 'file':
+            return forms.FileField(**kwargs)
+        if self.field_type in ('select', 'radio') and self.options:
+            widget = forms.RadioSelect if self.field_type == 'radio' else forms.Select
+            return forms.ChoiceField(choices=self.choices, widget=widget, **kwargs)
+        if self.field_type == 'checkbox':
+            # The apply page renders every checkbox question as a single box
+            return forms.BooleanField(**kwargs)
+        return forms.CharField(**kwargs)
+
+
+class FormSchema:
+    """The compiled questions of one program, in display order"""
+
+    def __init__(self, program_id, version, definitions):
+        self.program_id = program_id
+        self.version = version
+        self.fields = [CompiledField(**definition) for definition in definitions]
+        self.form_class = type('ProgramQuestionsForm', (forms.Form,), {
+            field.name: field.form_field() for field in self.fields
+        })
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def bind(self, data=None, files=None):
+        """A form validating the program questions of a submission"""
+        return self.form_class(data, files)
+
+
+def _definitions(program_id):
+    return [
+        {
+            'id': field.id,
+            'label': field.label,
+            'field_type': field.field_type,
+            'is_required': field.is_required,
+            'help_text': field.help_text,
+            'options': parse_options(field.options),
+        }
+        for field in FormField.objects.filter(program_id=program_id).order_by('order', 'id')
+    ]
+
+
+def schema_version(program_id):
+    key = VERSION_KEY.format(program_id=program_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_form_schema(program_id):
+    """Make every process recompile the program's schema on its next use"""
+    cache.set(VERSION_KEY.format(program_id=program_id), uuid.uuid4().hex, None)
+
+
+def get_form_schema(program):
+    """Compiled form schema of ``program`` (a Program or its pk)"""
+    program_id = getattr(program, 'pk', program)
+    version = schema_version(program_id)
+    schema = _compiled.get((program_id, version))
+    if schema is not None:
+        return schema
+
+    key = SCHEMA_KEY.format(program_id=program_id, version=version)
+    definitions = cache.get(key)
+    if definitions is None:
+        definitions = _definitions(program_id)
+        cache.set(key, definitions, getattr(settings, 'FORM_SCHEMA_CACHE_TIMEOUT', 60 * 60 * 24))
+
+    if len(_compiled) >= _COMPILED_LIMIT:
+        _compiled.clear()
+    schema = _compiled[program_id, version] = FormSchema(program_id, version, definitions)
+    return schema
@@ -113,96 +113,6 @@ class ApplicationForm(forms.ModelForm):
             ),
         )
 
-class ApplicationDocumentForm(forms.ModelForm):
-    class Meta:
-        model = ApplicationDocument
-        fields = ['document_type', 'document']
-        labels = {
-            'document_type': 'Document Type',
-            'document': 'Document'
-        }
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.helper = FormHelper()
-        self.helper.form_tag = False
-        self.helper.layout = Layout(
-            Row(
-                Column('document_type', css_class='col-md-6'),
-                Column('document', css_class='col-md-6'),
-            )
-        )
-        
-        # Add custom validation for program-specific requirements
-        if self.program:
-            # Add any program-specific field validation here
-            pass
-        
-        # Dynamically add fields based on program's form fields
-        if self.program:
-            for field in self.program.form_fields.all():
-                field_kwargs = {
-                    'required': field.is_required,
-                    'help_text': field.help_text,
-                    'label': field.label
-                }
-                
-                if field.field_type == 'text':
-                    self.fields[f'field_{field.id}'] = forms.CharField(**field_kwargs)
-                elif field.field_type == 'textarea':
-                    self.fields[f'field_{field.id}'] = forms.CharField(
-                        widget=forms.Textarea(attrs={'rows': 4}),
-                        **field_kwargs
-                    )
-                elif field.field_type == 'number':
-                    self.fields[f'field_{field.id}'] = forms.IntegerField(**field_kwargs)
-                elif field.field_type == 'email':
-                    self.fields[f'field_{field.id}'] = forms.EmailField(**field_kwargs)
-                elif field.field_type == 'date':
-                    self.fields[f'field_{field.id}'] = forms.DateField(
-                        widget=forms.DateInput(attrs={'type': 'date'}),
-                        **field_kwargs
-                    )
-                elif field.field_type in ['select', 'radio']:
-                    # Handle options as a list
-                    if field.options:
-                        choices = [(option, option) for option in field.options]
-                        if field.field_type == 'select':
-                            self.fields[f'field_{field.id}'] = forms.ChoiceField(
-                                choices=choices,
-                                **field_kwargs
-                            )
-                        else:
-                            self.fields[f'field_{field.id}'] = forms.ChoiceField(
-                                widget=forms.RadioSelect,
-                                choices=choices,
-                                **field_kwargs
-                            )
-                elif field.field_type == 'checkbox':
-                    # Handle options as a list for checkboxes
-                    if field.options:
-                        self.fields[f'field_{field.id}'] = forms.MultipleChoiceField(
-                            widget=forms.CheckboxSelectMultiple,
-                            choices=[(option, option) for option in field.options],
-                            **field_kwargs
-                        )
-                    else:
-                        # Single checkbox
-                        self.fields[f'field_{field.id}'] = forms.BooleanField(**field_kwargs)
-
-    def clean(self):
-        cleaned_data = super().clean()
-        form_data = {}
-        
-        if self.program:
-            for field in self.program.form_fields.all():
-                field_key = f'field_{field.id}'
-                if field_key in cleaned_data:
-                    form_data[field.label] = cleaned_data[field_key]
-        
-        cleaned_data['form_data'] = form_data
-        return cleaned_data
-
 class ApplicationDocumentForm(forms.ModelForm):
     class Meta:
         model = ApplicationDocument
@@ -0,0 +1,66 @@
+"""
+Beneficiary CSV import.
+
+Uploads are queued as core ImportJobs and read one row at a time by the
+import worker; valid rows are inserted with ``bulk_create`` a chunk at a
+time, so memory use stays flat however long the file is. Program names
+are looked up once per distinct name.
+"""
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from core.imports import RowImporter
+
+from .models import Beneficiary, Program
+from .utils import beneficiaries_bulk_created
+
+IMPORT_COLUMNS = (
+    'type', 'full_name', 'gender', 'phone', 'email', 'address',
+    'guardian_name', 'guardian_phone', 'program', 'start_date',
+)
+
+# Foreign keys are resolved by the importer, not validated per row
+UNVALIDATED_FIELDS = ['program', 'user', 'application', 'created_by']
+
+
+class BeneficiaryImporter(RowImporter):
+    """Import beneficiaries from a CSV with the IMPORT_COLUMNS header"""
+    columns = IMPORT_COLUMNS
+
+    def __init__(self, job):
+        super().__init__(job)
+        self.today = timezone.now().date()
+        self.programs = {}
+
+    def program(self, name):
+        """The program matching ``name``, looked up once per distinct name"""
+        key = name.strip().lower()
+        if key not in self.programs:
+            self.programs[key] = Program.objects.filter(name__icontains=name.strip()).first()
+        if self.programs[key] is None:
+            raise ValidationError(f'No program matches "{name}".')
+        return self.programs[key]
+
+    def build(self, row):
+        """A validated, unsaved Beneficiary for one CSV row; raises ValidationError"""
+        program = self.program(row['program']) if (row.get('program') or '').strip() else None
+        beneficiary = Beneficiary(
+            beneficiary_type=(row.get('type') or 'education').strip().lower(),
+            program=program,
+            full_name=(row.get('full_name') or '').strip(),
+            gender=(row.get('gender') or 'male').strip().lower(),
+            phone_number=(row.get('phone') or '').strip(),
+            email=(row.get('email') or '').strip(),
+            address=row.get('address') or '',
+            guardian_name=(row.get('guardian_name') or '').strip(),
+            guardian_phone=(row.get('guardian_phone') or '').strip(),
+            status='active',
+            start_date=(row.get('start_date') or '').strip() or self.today,
+            created_by=self.job.requested_by,
+        )
+        beneficiary.full_clean(exclude=UNVALIDATED_FIELDS, validate_unique=False)
+        return beneficiary
+
+    def save_batch(self, objects):
+        Beneficiary.objects.bulk_create(objects)
+        beneficiaries_bulk_created(objects)
@@ -0,0 +1,125 @@
+import csv
+import gc
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+
+from applications.exports import EXPORT_HEADER, export_queryset, iter_export_rows, stream_csv, write_xlsx
+from applications.models import Application, Program
+from users.models import User
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Command(BaseCommand):
+    help = ('Benchmark time-to-first-byte and peak memory of the CSV application export. '
+            'Synthetic rows are created inside a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Row counts to benchmark (default: 10000 100000 1000000)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows per database read (default: EXPORT_CHUNK_SIZE)')
+        parser.add_argument('--skip-legacy', action='store_true',
+                            help='Only measure the streaming export, not the old build-a-list path')
+        parser.add_argument('--xlsx', action='store_true',
+                            help='Also measure the write-only Excel export')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>9} {'path':<10} {'ttfb (s)':>9} {'total (s)':>10} "
+                          f"{'peak heap (MB)':>15} {'max RSS (MB)':>13} {'size (MB)':>10}")
+
+        for row_count in sorted(options['rows']):
+            with transaction.atomic():
+                self.seed(row_count)
+                exported = export_queryset().count()
+
+                streaming = self.measure(
+                    lambda: stream_csv(iter_export_rows(export_queryset(), options['chunk_size']))
+                )
+                self.report(exported, 'streaming', streaming)
+
+                if options['xlsx']:
+                    self.report(exported, 'xlsx', self.measure(self.xlsx_export))
+
+                if not options['skip_legacy']:
+                    self.report(exported, 'legacy', self.measure(self.legacy_export))
+
+                transaction.set_rollback(True)
+
+        self.stdout.write('peak heap = Python allocations traced by tracemalloc (timings include its '
+                          'overhead); max RSS is the process high-water mark so far.')
+
+    def seed(self, row_count):
+        today = timezone.now().date()
+        program = Program.objects.create(
+            name='Benchmark Program', program_type='scholarship',
+            description='Benchmark', eligibility_criteria='Benchmark',
+            start_date=today, end_date=today,
+        )
+        applicants = User.objects.bulk_create([
+            User(email=f'benchmark{i}@example.com', username=f'benchmark{i}@example.com',
+                 first_name='Bench', last_name=f'Mark {i}')
+            for i in range(min(row_count, 1000))
+        ])
+        now = timezone.now()
+        batch = []
+        for i in range(row_count):
+            batch.append(Application(
+                program=program, applicant=applicants[i % len(applicants)], form_data={},
+                status='submitted', submitted_at=now, review_notes='Benchmark row',
+            ))
+            if len(batch) == 5000:
+                Application.objects.bulk_create(batch)
+                batch = []
+        Application.objects.bulk_create(batch)
+
+    def legacy_export(self):
+        """The export as it worked before streaming: build every row, then write"""
+        data = [EXPORT_HEADER]
+        for app in export_queryset().select_related('program', 'applicant', 'reviewed_by'):
+            data.append([
+                app.program.name,
+                app.applicant.get_full_name(),
+                app.get_status_display(),
+                app.submitted_at.strftime('%Y-%m-%d'),
+                app.review_notes or '',
+                app.reviewed_by.get_full_name() if app.reviewed_by else ''
+            ])
+        response = HttpResponse(content_type='text/csv')
+        csv.writer(response).writerows(data)
+        return iter([response.content])
+
+    def xlsx_export(self):
+        with tempfile.TemporaryFile() as output:
+            write_xlsx(output, export_queryset())
+            output.seek(0)
+            yield from iter(lambda: output.read(64 * 1024), b'')
+
+    def measure(self, make_chunks):
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        chunks = iter(make_chunks())
+        size = len(next(chunks))
+        ttfb = time.perf_counter() - started
+        for chunk in chunks:
+            size += len(chunk)
+        total = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else 0
+        return ttfb, total, peak / 2 ** 20, max_rss, size / 2 ** 20
+
+    def report(self, rows, path, result):
+        ttfb, total, peak, max_rss, size = result
+        self.stdout.write(f'{rows:>9} {path:<10} {ttfb:>9.3f} {total:>10.2f} '
+                          f'{peak:>15.1f} {max_rss:>13.1f} {size:>10.1f}')
@@ -0,0 +1,18 @@
+import time
+
+from applications.exports import claim_export_job, run_export_job
+from core.jobs import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = 'Render queued application exports, keeping at most EXPORT_MAX_CONCURRENT_JOBS running'
+    max_concurrent_setting = 'EXPORT_MAX_CONCURRENT_JOBS'
+
+    def process_one(self, options):
+        job = claim_export_job(max_running=options['max_concurrent'])
+        if not job:
+            return None
+        started = time.monotonic()
+        run_export_job(job)
+        self.stdout.write(f'{job}: {job.total_rows} rows in {time.monotonic() - started:.1f}s')
+        return {job.status: 1}
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from applications.models import Program
+from applications.utils import rebuild_program_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-program application counters from the applications table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--program', type=int, nargs='+', dest='program_ids',
+                            help='Only rebuild these program ids')
+        parser.add_argument('--chunk-size', type=int, default=100,
+                            help='Programs counted per transaction (default: 100)')
+
+    def handle(self, *args, **options):
+        program_ids = options['program_ids']
+        checked = len(program_ids) if program_ids else Program.objects.count()
+        fixed = rebuild_program_stats(program_ids, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} programs: {fixed} counter rows corrected'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from applications.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents of all applications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Applications indexed per batch (default: 1000)')
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} applications'))
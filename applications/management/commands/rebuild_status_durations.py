@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from applications.utils import rebuild_status_durations
+
+
+class Command(BaseCommand):
+    help = 'Recompute the time applications spent in each review status from the status history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Applications rebuilt per transaction (default: 500)')
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_status_durations(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Status durations rebuilt for {rebuilt} applications'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from applications.utils import refresh_impact_rollup
+
+
+class Command(BaseCommand):
+    help = 'Recompute the impact rollup cells of programs whose beneficiaries or support changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute every program, not only the changed ones')
+
+    def handle(self, *args, **options):
+        refreshed = refresh_impact_rollup(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Impact rollup refreshed for {refreshed} programs'))
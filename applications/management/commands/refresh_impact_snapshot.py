@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from applications.utils import refresh_impact_rollup, refresh_impact_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Apply queued impact rollup changes and recompute the figures shown on the public impact page'
+
+    def handle(self, *args, **options):
+        refresh_impact_rollup()
+        snapshot = refresh_impact_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f'Impact snapshot refreshed: {snapshot.total_beneficiaries} active beneficiaries, '
+            f'{snapshot.total_programs} active programs'
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from applications.utils import outbox_stats, send_queued_emails
+from core.jobs import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = 'Deliver queued emails from the outbox over a reused mail connection'
+    counters = ('sent', 'failed')
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Emails sent per connection (default: EMAIL_OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--max-attempts', type=int, default=None,
+                            help='Attempts before an email is marked failed (default: EMAIL_OUTBOX_MAX_ATTEMPTS)')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print queue depth and throughput counters and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, value in outbox_stats().items():
+                self.stdout.write(f'{name}: {value}')
+            return
+        super().handle(*args, **options)
+
+    def process_one(self, options):
+        started = time.monotonic()
+        sent, failed = send_queued_emails(
+            batch_size=options['batch_size'],
+            max_attempts=options['max_attempts'],
+        )
+        if not (sent or failed):
+            return None
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Batch: {sent} sent, {failed} failed '
+            f'({sent / elapsed if elapsed else 0:.1f} emails/s)'
+        )
+        return {'sent': sent, 'failed': failed}
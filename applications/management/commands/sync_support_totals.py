@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from applications.utils import support_total_mismatches, sync_support_totals
+
+
+class Command(BaseCommand):
+    help = 'Check, and by default repair, the stored total support amount of every beneficiary'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report beneficiaries whose stored total is wrong')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Beneficiaries compared per query (default: 1000)')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = 0
+            for pk, stored, actual in support_total_mismatches(options['chunk_size']):
+                mismatches += 1
+                self.stdout.write(f'Beneficiary {pk}: stored {stored}, support records sum to {actual}')
+            if mismatches:
+                self.stdout.write(self.style.WARNING(f'{mismatches} beneficiaries have a wrong total'))
+            else:
+                self.stdout.write(self.style.SUCCESS('All beneficiary totals match their support records'))
+            return
+
+        fixed = sync_support_totals(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated the total support of {fixed} beneficiaries'))
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_program_stats(apps, schema_editor):
+    Program = apps.get_model('applications', 'Program')
+    Application = apps.get_model('applications', 'Application')
+    ProgramStats = apps.get_model('applications', 'ProgramStats')
+
+    stats = {pk: ProgramStats(program_id=pk) for pk in Program.objects.values_list('pk', flat=True)}
+    counts = Application.objects.values('program_id', 'status').annotate(n=Count('id')).order_by()
+    for row in counts:
+        if row['program_id'] in stats and hasattr(stats[row['program_id']], row['status']):
+            setattr(stats[row['program_id']], row['status'], row['n'])
+    ProgramStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0009_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgramStats',
+            fields=[
+                ('program', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='applications.program')),
+                ('draft', models.IntegerField(default=0)),
+                ('submitted', models.IntegerField(default=0)),
+                ('under_review', models.IntegerField(default=0)),
+                ('additional_info', models.IntegerField(default=0)),
+                ('approved', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Program Statistics',
+                'verbose_name_plural': 'Program Statistics',
+            },
+        ),
+        migrations.RunPython(build_program_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:02
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_support_totals(apps, schema_editor):
+    Beneficiary = apps.get_model('applications', 'Beneficiary')
+    BeneficiarySupport = apps.get_model('applications', 'BeneficiarySupport')
+    totals = (BeneficiarySupport.objects.filter(beneficiary=OuterRef('pk'))
+              .order_by().values('beneficiary').annotate(total=Sum('amount')).values('total'))
+    Beneficiary.objects.update(
+        total_support_amount=Coalesce(Subquery(totals), Decimal('0'), output_field=models.DecimalField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0010_programstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beneficiary',
+            name='total_support_amount',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.RunPython(backfill_support_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+DOCUMENT_TABLE = 'applications_applicationsearchdocument'
+FTS_TABLE = 'applications_search_fts'
+
+FULLTEXT_SQL = {
+    'mysql': [
+        f'CREATE FULLTEXT INDEX applications_search_ft ON {DOCUMENT_TABLE} (program_name, applicant_name)',
+        f'CREATE FULLTEXT INDEX applications_search_program_ft ON {DOCUMENT_TABLE} (program_name)',
+    ],
+    'sqlite': [
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(program_name, applicant_name, "
+        f"content='{DOCUMENT_TABLE}', content_rowid='application_id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOCUMENT_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, program_name, applicant_name) "
+        f"VALUES (new.application_id, new.program_name, new.applicant_name); END",
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOCUMENT_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, program_name, applicant_name) "
+        f"VALUES ('delete', old.application_id, old.program_name, old.applicant_name); END",
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOCUMENT_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, program_name, applicant_name) "
+        f"VALUES ('delete', old.application_id, old.program_name, old.applicant_name); "
+        f"INSERT INTO {FTS_TABLE}(rowid, program_name, applicant_name) "
+        f"VALUES (new.application_id, new.program_name, new.applicant_name); END",
+    ],
+}
+
+DROP_FULLTEXT_SQL = {
+    'mysql': [
+        f'DROP INDEX applications_search_ft ON {DOCUMENT_TABLE}',
+        f'DROP INDEX applications_search_program_ft ON {DOCUMENT_TABLE}',
+    ],
+    'sqlite': [
+        f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+        f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+        f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+        f'DROP TABLE IF EXISTS {FTS_TABLE}',
+    ],
+}
+
+
+def create_fulltext_index(apps, schema_editor):
+    for statement in FULLTEXT_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    for statement in DROP_FULLTEXT_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def build_search_documents(apps, schema_editor):
+    Application = apps.get_model('applications', 'Application')
+    ApplicationSearchDocument = apps.get_model('applications', 'ApplicationSearchDocument')
+    rows = Application.objects.order_by('pk').values_list(
+        'pk', 'program__name', 'applicant__first_name', 'applicant__last_name'
+    )
+    documents = [
+        ApplicationSearchDocument(
+            application_id=pk, program_name=program_name or '',
+            applicant_name=f"{first_name or ''} {last_name or ''}".strip(),
+        )
+        for pk, program_name, first_name, last_name in rows.iterator()
+    ]
+    ApplicationSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0011_beneficiary_total_support_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationSearchDocument',
+            fields=[
+                ('application', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='applications.application')),
+                ('program_name', models.CharField(max_length=200)),
+                ('applicant_name', models.CharField(max_length=400)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Application Search Document',
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(build_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0012_applicationsearchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImpactSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_beneficiaries', models.PositiveIntegerField(default=0)),
+                ('total_programs', models.PositiveIntegerField(default=0)),
+                ('total_disbursed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('education_count', models.PositiveIntegerField(default=0)),
+                ('health_count', models.PositiveIntegerField(default=0)),
+                ('youth_count', models.PositiveIntegerField(default=0)),
+                ('housing_count', models.PositiveIntegerField(default=0)),
+                ('male_count', models.PositiveIntegerField(default=0)),
+                ('female_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('program_beneficiaries', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Impact Snapshot',
+                'verbose_name_plural': 'Impact Snapshot',
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def queue_all_programs(apps, schema_editor):
+    # The first refresh_impact_rollup run then builds every program's cells
+    Program = apps.get_model('applications', 'Program')
+    ImpactRollupChange = apps.get_model('applications', 'ImpactRollupChange')
+    program_ids = [*Program.objects.values_list('pk', flat=True), None]
+    ImpactRollupChange.objects.bulk_create([ImpactRollupChange(program_id=pk) for pk in program_ids])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0013_impactsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImpactRollupChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('program_id', models.BigIntegerField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImpactRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('beneficiary_type', models.CharField(choices=[('education', 'Education/Scholarship'), ('health', 'Healthcare'), ('youth', 'Youth Empowerment'), ('housing', 'Housing Support')], max_length=20)),
+                ('state', models.CharField(blank=True, max_length=100)),
+                ('lga', models.CharField(blank=True, max_length=100, verbose_name='LGA')),
+                ('gender', models.CharField(choices=[('male', 'Male'), ('female', 'Female')], max_length=10)),
+                ('month', models.DateField()),
+                ('beneficiaries', models.PositiveIntegerField(default=0)),
+                ('active_beneficiaries', models.PositiveIntegerField(default=0)),
+                ('completed_beneficiaries', models.PositiveIntegerField(default=0)),
+                ('supports', models.PositiveIntegerField(default=0)),
+                ('amount_disbursed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('program', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='applications.program')),
+            ],
+            options={
+                'verbose_name': 'Impact Rollup Cell',
+                'verbose_name_plural': 'Impact Rollup',
+                'indexes': [models.Index(fields=['program', 'month'], name='application_program_c4ff92_idx'), models.Index(fields=['beneficiary_type', 'month'], name='application_benefic_7db99e_idx'), models.Index(fields=['state', 'lga'], name='application_state_2186e2_idx')],
+            },
+        ),
+        migrations.RunPython(queue_all_programs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+TRACKED_STATUSES = ('submitted', 'under_review', 'additional_info')
+
+
+def build_status_durations(apps, schema_editor):
+    # Same walk as applications.utils.record_status_changes, over the whole history
+    Application = apps.get_model('applications', 'Application')
+    ApplicationStatus = apps.get_model('applications', 'ApplicationStatus')
+    StatusDuration = apps.get_model('applications', 'StatusDuration')
+
+    programs = dict(Application.objects.values_list('pk', 'program_id'))
+    history = ApplicationStatus.objects.order_by('application_id', 'created_at', 'pk').values_list(
+        'application_id', 'status', 'created_at', 'created_by_id'
+    )
+    durations, current = [], {}
+    for application_id, status, created_at, created_by_id in history.iterator():
+        open_duration = current.get(application_id)
+        if open_duration is not None:
+            if open_duration.status == status:
+                continue
+            open_duration.ended_at = created_at
+            open_duration.seconds = max(int((created_at - open_duration.started_at).total_seconds()), 0)
+            open_duration.reviewer_id = created_by_id
+            del current[application_id]
+        if status in TRACKED_STATUSES:
+            current[application_id] = StatusDuration(
+                application_id=application_id, program_id=programs[application_id],
+                status=status, started_at=created_at,
+            )
+            durations.append(current[application_id])
+    StatusDuration.objects.bulk_create(durations, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0014_impactrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusDuration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('submitted', 'Submitted'), ('under_review', 'Under Review'), ('additional_info', 'Additional Information Required'), ('approved', 'Approved'), ('rejected', 'Rejected')], max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('seconds', models.PositiveIntegerField(blank=True, null=True)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_durations', to='applications.application')),
+                ('program', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='applications.program')),
+                ('reviewer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'seconds'], name='application_status_46c91b_idx'), models.Index(fields=['status', 'program', 'seconds'], name='application_status_425dd7_idx'), models.Index(fields=['status', 'reviewer', 'seconds'], name='application_status_3d3544_idx'), models.Index(fields=['application', 'ended_at'], name='application_applica_a592f6_idx')],
+            },
+        ),
+        migrations.RunPython(build_status_durations, migrations.RunPython.noop),
+    ]
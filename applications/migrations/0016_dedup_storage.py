@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:07
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0015_statusduration'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='applicationdocument',
+            name='document',
+            field=models.FileField(storage=core.storage.dedup_storage, upload_to='application_documents/'),
+        ),
+        migrations.AlterField(
+            model_name='beneficiarysupport',
+            name='receipt',
+            field=models.FileField(blank=True, null=True, storage=core.storage.dedup_storage, upload_to='support_receipts/'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0016_dedup_storage'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='impactsnapshot',
+            name='program_beneficiaries',
+        ),
+        migrations.AddField(
+            model_name='impactsnapshot',
+            name='active_programs',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='impactsnapshot',
+            name='recent_beneficiaries',
+            field=models.JSONField(default=list),
+        ),
+    ]
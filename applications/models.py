@@ -1,10 +1,18 @@
+from datetime import timedelta
+
 from django.db import models
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils import timezone
 from ckeditor_uploader.fields import RichTextUploadingField
 
+from core.models import ChangeTrackingMixin
+from core.storage import dedup_storage
+
 from users.models import User
 
-class Program(models.Model):
+class Program(ChangeTrackingMixin, models.Model):
     PROGRAM_TYPES = (
         ('scholarship', 'Scholarship'),
         ('healthcare', 'Healthcare Assistance'),
@@ -65,7 +73,7 @@ class FormField(models.Model):
         ordering = ['order']
 
 
-class Application(models.Model):
+class Application(ChangeTrackingMixin, models.Model):
     STATUS_CHOICES = (
         ('draft', 'Draft'),
         ('submitted', 'Submitted'),
@@ -92,9 +100,69 @@ class Application(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
 
+class ProgramStats(models.Model):
+    """
+    Per-program application counts by status.
+
+    Kept current by applying deltas from the application signals and
+    ``bulk_update_status``; ``rebuild_program_stats`` recomputes it.
+    """
+    program = models.OneToOneField(Program, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    draft = models.IntegerField(default=0)
+    submitted = models.IntegerField(default=0)
+    under_review = models.IntegerField(default=0)
+    additional_info = models.IntegerField(default=0)
+    approved = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    STATUS_FIELDS = tuple(status for status, label in Application.STATUS_CHOICES)
+
+    class Meta:
+        verbose_name = "Program Statistics"
+        verbose_name_plural = "Program Statistics"
+
+    def __str__(self):
+        return f"Statistics for {self.program}"
+
+    @property
+    def total_applications(self):
+        return sum(getattr(self, status) for status in self.STATUS_FIELDS)
+
+    @property
+    def pending_applications(self):
+        return self.submitted + self.under_review
+
+    @property
+    def success_rate(self):
+        total = self.total_applications
+        return self.approved * 100.0 / total if total else 0
+
+
+class ApplicationSearchDocument(models.Model):
+    """
+    Denormalised search text of one application.
+
+    Maintained by applications.search; the full-text index over it is a
+    FULLTEXT index on MySQL and an FTS5 table on SQLite.
+    """
+    application = models.OneToOneField(
+        Application, on_delete=models.CASCADE, primary_key=True, related_name='search_document'
+    )
+    program_name = models.CharField(max_length=200)
+    applicant_name = models.CharField(max_length=400)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Application Search Document"
+
+    def __str__(self):
+        return f"{self.applicant_name} - {self.program_name}"
+
+
 class ApplicationDocument(models.Model):
     application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name='documents')
-    document = models.FileField(upload_to='application_documents/')
+    document = models.FileField(upload_to='application_documents/', storage=dedup_storage)
     document_type = models.CharField(max_length=100)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
@@ -117,6 +185,39 @@ class ApplicationStatus(models.Model):
 
     
 
+class StatusDuration(models.Model):
+    """
+    One stretch of time an application spent in a review status.
+
+    Built from the ApplicationStatus history: each history row closes the
+    application's open stretch and, for a tracked status, opens the next
+    one. ``reviewer`` is who moved the application on.
+    """
+    TRACKED_STATUSES = ('submitted', 'under_review', 'additional_info')
+
+    application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name='status_durations')
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=20, choices=Application.STATUS_CHOICES)
+    reviewer = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField(null=True, blank=True)
+    # Whole seconds between started_at and ended_at; null while the application is still in the status
+    seconds = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'seconds']),
+            models.Index(fields=['status', 'program', 'seconds']),
+            models.Index(fields=['status', 'reviewer', 'seconds']),
+            models.Index(fields=['application', 'ended_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.application_id} in {self.status} from {self.started_at:%Y-%m-%d %H:%M}"
+
+
 class NotificationPreference(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     email_on_status_change = models.BooleanField(default=True)
@@ -130,7 +231,7 @@ class NotificationPreference(models.Model):
         verbose_name_plural = "Notification Preferences"
 
 
-class Beneficiary(models.Model):
+class Beneficiary(ChangeTrackingMixin, models.Model):
     """Universal beneficiary model for all program types"""
     BENEFICIARY_TYPES = (
         ('education', 'Education/Scholarship'),
@@ -197,6 +298,9 @@ class Beneficiary(models.Model):
     # Privacy
     show_on_website = models.BooleanField(default=True, help_text="Display this beneficiary on public pages")
 
+    # Running total of support_records, kept in step by the BeneficiarySupport signals
+    total_support_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, db_index=True)
+
     # Audit
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -224,14 +328,14 @@ class Beneficiary(models.Model):
             )
         return None
 
-    @property
-    def total_support_amount(self):
+    def recalculate_support_amount(self):
+        """Sum of the support records, ignoring the stored running total"""
         return self.support_records.aggregate(
             total=models.Sum('amount')
         )['total'] or 0
 
 
-class BeneficiarySupport(models.Model):
+class BeneficiarySupport(ChangeTrackingMixin, models.Model):
     """Track individual support/disbursements to beneficiaries"""
     SUPPORT_TYPES = (
         ('payment', 'Cash Payment'),
@@ -253,7 +357,7 @@ class BeneficiarySupport(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     description = models.TextField()
     date = models.DateField()
-    receipt = models.FileField(upload_to='support_receipts/', null=True, blank=True)
+    receipt = models.FileField(upload_to='support_receipts/', storage=dedup_storage, null=True, blank=True)
 
     # Audit
     created_by = models.ForeignKey(
@@ -270,6 +374,15 @@ class BeneficiarySupport(models.Model):
     def __str__(self):
         return f"{self.beneficiary.full_name} - {self.get_support_type_display()} - ₦{self.amount}"
 
+    def save(self, *args, **kwargs):
+        # The beneficiary's running total is adjusted by signals inside the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
 
 class EducationProfile(models.Model):
     """Education-specific details for scholarship beneficiaries"""
@@ -510,4 +623,209 @@ class HousingProfile(models.Model):
 
     @property
     def total_rent_covered(self):
-        return self.rent_amount_monthly * self.rent_duration_months
\ No newline at end of file
+        return self.rent_amount_monthly * self.rent_duration_months
+
+class ImpactSnapshot(models.Model):
+    """
+    Everything the public impact page shows, computed together.
+
+    A single row, refreshed by the refresh_impact_snapshot command, or by
+    the page itself once it is older than IMPACT_SNAPSHOT_MAX_AGE. The lists
+    hold plain values, so showing them needs no further queries; saving or
+    deleting a listed beneficiary updates its entry at once.
+    """
+    total_beneficiaries = models.PositiveIntegerField(default=0)
+    total_programs = models.PositiveIntegerField(default=0)
+    total_disbursed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    education_count = models.PositiveIntegerField(default=0)
+    health_count = models.PositiveIntegerField(default=0)
+    youth_count = models.PositiveIntegerField(default=0)
+    housing_count = models.PositiveIntegerField(default=0)
+    male_count = models.PositiveIntegerField(default=0)
+    female_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    # The first active programs, each with its number of active beneficiaries
+    active_programs = models.JSONField(default=list)
+    # The latest active beneficiaries shown on the website
+    recent_beneficiaries = models.JSONField(default=list)
+    computed_at = models.DateTimeField()
+
+    FIGURES = (
+        'total_beneficiaries', 'total_programs', 'total_disbursed',
+        'education_count', 'health_count', 'youth_count', 'housing_count',
+        'male_count', 'female_count', 'completed_count',
+    )
+
+    class Meta:
+        verbose_name = "Impact Snapshot"
+        verbose_name_plural = "Impact Snapshot"
+
+    def __str__(self):
+        return f"Impact snapshot of {self.computed_at:%Y-%m-%d %H:%M}"
+
+    def figures(self):
+        return {name: getattr(self, name) for name in self.FIGURES}
+
+    def is_fresh(self, max_age):
+        return self.computed_at >= timezone.now() - timedelta(seconds=max_age)
+
+
+class ImpactRollupQuerySet(models.QuerySet):
+    def totals(self, *dimensions):
+        """
+        Sum the measures of the selected cells, grouped by ``dimensions``.
+
+        Without dimensions returns one dict of totals, otherwise a list of
+        dicts with the dimension values and their totals, e.g.
+        ``ImpactRollup.objects.filter(month__year=2025).totals('state')``.
+        """
+        sums = {measure: models.Sum(measure, default=0) for measure in ImpactRollup.MEASURES}
+        if not dimensions:
+            return self.order_by().aggregate(**sums)
+        return list(self.order_by().values(*dimensions).annotate(**sums).order_by(*dimensions))
+
+
+class ImpactRollup(models.Model):
+    """
+    One cell of the beneficiary and disbursement cube.
+
+    Beneficiaries are counted in the month they started and support in the
+    month it was given. A program's cells are recomputed by
+    ``refresh_impact_rollup`` after an ImpactRollupChange names it.
+    """
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, null=True, related_name='+')
+    beneficiary_type = models.CharField(max_length=20, choices=Beneficiary.BENEFICIARY_TYPES)
+    state = models.CharField(max_length=100, blank=True)
+    lga = models.CharField(max_length=100, blank=True, verbose_name="LGA")
+    gender = models.CharField(max_length=10, choices=Beneficiary.GENDER_CHOICES)
+    month = models.DateField()
+
+    beneficiaries = models.PositiveIntegerField(default=0)
+    active_beneficiaries = models.PositiveIntegerField(default=0)
+    completed_beneficiaries = models.PositiveIntegerField(default=0)
+    supports = models.PositiveIntegerField(default=0)
+    amount_disbursed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    DIMENSIONS = ('program', 'beneficiary_type', 'state', 'lga', 'gender', 'month')
+    MEASURES = ('beneficiaries', 'active_beneficiaries', 'completed_beneficiaries', 'supports', 'amount_disbursed')
+
+    objects = ImpactRollupQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Impact Rollup Cell"
+        verbose_name_plural = "Impact Rollup"
+        indexes = [
+            models.Index(fields=['program', 'month']),
+            models.Index(fields=['beneficiary_type', 'month']),
+            models.Index(fields=['state', 'lga']),
+        ]
+
+    def __str__(self):
+        return f"{self.program_id} / {self.beneficiary_type} / {self.state} / {self.month:%Y-%m}"
+
+
+class ImpactRollupChange(models.Model):
+    """A program whose rollup cells are out of date; None stands for beneficiaries without a program"""
+    program_id = models.BigIntegerField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Rollup change for program {self.program_id}"
+
+
+class OutboundEmail(models.Model):
+    """Queued outgoing email, delivered by the ``send_queued_email`` worker"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Emails"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['status', 'sent_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+
+def export_storage():
+    """Finished exports live outside MEDIA_ROOT and are only served through the staff download view"""
+    return FileSystemStorage(location=getattr(settings, 'EXPORT_ROOT', settings.BASE_DIR / 'private' / 'exports'))
+
+
+class ExportJob(models.Model):
+    """Application export rendered in the background by the ``process_export_jobs`` worker"""
+    FORMAT_CHOICES = (
+        ('pdf', 'PDF'),
+    )
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    export_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='pdf')
+    params = models.JSONField(default=dict, blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='export_jobs')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    file = models.FileField(storage=export_storage, upload_to='%Y/%m/', blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Export Job"
+        verbose_name_plural = "Export Jobs"
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_export_format_display()} export #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def progress(self):
+        """Percentage of rows rendered so far"""
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, self.processed_rows * 100 // self.total_rows)
+
+    @property
+    def filename(self):
+        date_from, date_to = self.params.get('date_from'), self.params.get('date_to')
+        if date_from and date_to:
+            return f'applications_{date_from}_{date_to}.{self.export_format}'
+        return f'applications.{self.export_format}'
@@ -0,0 +1,187 @@
+"""
+Full-text search over applications.
+
+Every application has an ApplicationSearchDocument row holding its program
+and applicant names. The database's own full-text index is queried through
+one interface: MySQL uses FULLTEXT indexes with MATCH ... AGAINST, SQLite
+an FTS5 table kept in step with the document table by triggers, and any
+other database falls back to ``icontains`` on the document table. The
+indexes are created by migration 0012.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Application, ApplicationSearchDocument
+
+DOCUMENT_TABLE = ApplicationSearchDocument._meta.db_table
+FTS_TABLE = 'applications_search_fts'
+SEARCH_FIELDS = ('program_name', 'applicant_name')
+
+# InnoDB's default full-text stopwords (INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD)
+MYSQL_STOPWORDS = frozenset({
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how', 'i', 'in',
+    'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'who',
+    'will', 'with', 'und', 'www',
+})
+
+
+def search_terms(query):
+    """Words of a user query, lower-cased, without any search operators"""
+    return re.findall(r'\w+', query.lower())
+
+
+class SearchBackend:
+    """Fallback for databases without a supported full-text index"""
+
+    def filter(self, queryset, terms, fields):
+        for term in terms:
+            match = Q()
+            for field in fields:
+                match |= Q(**{f'search_document__{field}__icontains': term})
+            queryset = queryset.filter(match)
+        return queryset
+
+    def rank(self, terms, fields):
+        return Value(0.0, output_field=FloatField())
+
+
+class MySQLSearchBackend(SearchBackend):
+    """
+    FULLTEXT indexes queried in boolean mode; every word is required and may be a prefix.
+
+    InnoDB leaves words shorter than innodb_ft_min_token_size (mirrored by
+    the SEARCH_MYSQL_MIN_TOKEN_SIZE setting) and stopwords out of the index,
+    so names like "Li" or "Ng" are matched with ``icontains`` instead.
+    """
+
+    def split_terms(self, terms):
+        """``(indexed, unindexed)`` terms"""
+        min_size = getattr(settings, 'SEARCH_MYSQL_MIN_TOKEN_SIZE', 3)
+        indexed = [term for term in terms if len(term) >= min_size and term not in MYSQL_STOPWORDS]
+        return indexed, [term for term in terms if term not in indexed]
+
+    def against(self, terms, fields):
+        columns = ', '.join(fields)
+        return f'MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)', ' '.join(f'+{term}*' for term in terms)
+
+    def filter(self, queryset, terms, fields):
+        indexed, unindexed = self.split_terms(terms)
+        if indexed:
+            match, query = self.against(indexed, fields)
+            queryset = queryset.filter(pk__in=RawSQL(
+                f'SELECT application_id FROM {DOCUMENT_TABLE} WHERE {match}', [query]
+            ))
+        return super().filter(queryset, unindexed, fields)
+
+    def rank(self, terms, fields):
+        indexed, _unindexed = self.split_terms(terms)
+        if not indexed:
+            return super().rank(terms, fields)
+        match, query = self.against(indexed, fields)
+        return RawSQL(
+            f'SELECT {match} FROM {DOCUMENT_TABLE} '
+            f'WHERE {DOCUMENT_TABLE}.application_id = {Application._meta.db_table}.id',
+            [query], output_field=FloatField()
+        )
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 table ranked with bm25(); every word is required and may be a prefix"""
+
+    def match(self, terms, fields):
+        query = ' '.join(f'"{term}"*' for term in terms)
+        if tuple(fields) != SEARCH_FIELDS:
+            query = '{%s} : (%s)' % (' '.join(fields), query)
+        return query
+
+    def filter(self, queryset, terms, fields):
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [self.match(terms, fields)]
+        ))
+
+    def rank(self, terms, fields):
+        # bm25() is lower for better matches
+        return RawSQL(
+            f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = {Application._meta.db_table}.id',
+            [self.match(terms, fields)], output_field=FloatField()
+        )
+
+
+BACKENDS = {
+    'mysql': MySQLSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, SearchBackend)()
+
+
+def search_applications(queryset, query, fields=SEARCH_FIELDS, rank=True):
+    """
+    Limit an Application queryset to matches of ``query``.
+
+    With ``rank`` the results are annotated with ``search_rank`` and ordered
+    by it, best match first. ``fields`` picks the document columns to search.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    backend = get_backend()
+    queryset = backend.filter(queryset, terms, fields)
+    if rank:
+        queryset = queryset.annotate(search_rank=backend.rank(terms, fields)).order_by('-search_rank', '-pk')
+    return queryset
+
+
+def _full_name(first_name, last_name):
+    return f"{first_name or ''} {last_name or ''}".strip()
+
+
+def index_applications(application_ids):
+    """Create or refresh the search documents of the given applications"""
+    rows = Application.objects.filter(pk__in=list(application_ids)).values_list(
+        'pk', 'program__name', 'applicant__first_name', 'applicant__last_name'
+    )
+    documents = [
+        ApplicationSearchDocument(
+            application_id=pk, program_name=program_name or '',
+            applicant_name=_full_name(first_name, last_name),
+        )
+        for pk, program_name, first_name, last_name in rows
+    ]
+    unique_fields = ['application'] if connection.features.supports_update_conflicts_with_target else None
+    ApplicationSearchDocument.objects.bulk_create(
+        documents, batch_size=500, update_conflicts=True,
+        unique_fields=unique_fields, update_fields=['program_name', 'applicant_name', 'updated_at'],
+    )
+    return len(documents)
+
+
+def rename_program(program_id, name):
+    """Update the program name on all of a program's search documents in one statement"""
+    ApplicationSearchDocument.objects.filter(application__program_id=program_id).update(program_name=name)
+
+
+def rename_applicant(user):
+    """Update the applicant name on all of a user's search documents in one statement"""
+    ApplicationSearchDocument.objects.filter(application__applicant=user).update(
+        applicant_name=_full_name(user.first_name, user.last_name)
+    )
+
+
+def rebuild_search_index(chunk_size=1000):
+    """Re-index every application ``chunk_size`` at a time; returns the number indexed"""
+    indexed = 0
+    last_pk = 0
+    while True:
+        ids = list(Application.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return indexed
+        indexed += index_applications(ids)
+        last_pk = ids[-1]
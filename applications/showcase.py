@@ -0,0 +1,112 @@
+"""
+Caching of the public beneficiary showcase pages.
+
+Every beneficiary type has a version stamp in the cache, plus one for
+'all' types. Cached pages, the rendered grids of the list pages and
+template fragments include the stamp in their key, and saving or deleting
+a beneficiary, one of its profiles or a program rename replaces the stamps
+involved, so stale entries are never read again and simply expire. A
+detail page is keyed on its beneficiary's own type, remembered in the
+cache until the beneficiary is saved or deleted.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+
+from .models import Beneficiary
+
+VERSION_KEY = 'beneficiary_showcase_version:{beneficiary_type}'
+PAGE_KEY = 'beneficiary_showcase_{part}:{scope}:{version}:{digest}'
+TYPE_KEY = 'beneficiary_showcase_type:{pk}'
+ALL_TYPES = 'all'
+
+# Query parameters that change what a showcase page shows
+PAGE_PARAMS = ('cursor', 'search')
+
+
+def showcase_cache_timeout():
+    return getattr(settings, 'SHOWCASE_CACHE_TIMEOUT', 60 * 15)
+
+
+def showcase_version(beneficiary_type=None):
+    key = VERSION_KEY.format(beneficiary_type=beneficiary_type or ALL_TYPES)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_showcase_version(*beneficiary_types):
+    """Invalidate the cached pages of the given types and of the 'all' pages"""
+    types = {beneficiary_type for beneficiary_type in beneficiary_types if beneficiary_type}
+    types.add(ALL_TYPES)
+    cache.set_many({VERSION_KEY.format(beneficiary_type=t): uuid.uuid4().hex for t in types}, None)
+
+
+def beneficiary_showcase_type(pk):
+    """The type of beneficiary ``pk``, or None if there is none"""
+    key = TYPE_KEY.format(pk=pk)
+    beneficiary_type = cache.get(key)
+    if beneficiary_type is None:
+        beneficiary_type = Beneficiary.objects.filter(pk=pk).values_list('beneficiary_type', flat=True).first()
+        if beneficiary_type is not None:
+            cache.set(key, beneficiary_type, None)
+    return beneficiary_type
+
+
+def forget_beneficiary_type(pk):
+    cache.delete(TYPE_KEY.format(pk=pk))
+
+
+def is_cacheable(request):
+    """Only anonymous GETs without pending messages get the shared page"""
+    if request.method != 'GET' or request.user.is_authenticated:
+        return False
+    return not len(get_messages(request))
+
+
+def page_cache_key(request, scope, beneficiary_type=None, part='page'):
+    params = '&'.join(f'{name}={request.GET.get(name, "")}' for name in PAGE_PARAMS)
+    digest = hashlib.md5(f'{request.path}?{params}'.encode()).hexdigest()
+    return PAGE_KEY.format(part=part, scope=scope, version=showcase_version(beneficiary_type), digest=digest)
+
+
+class ShowcaseCacheMixin:
+    """
+    Serve anonymous requests from a full-page cache.
+
+    The rendered response is cached whole, headers included, as Django's
+    UpdateCacheMiddleware does. It is kept under the version stamp of
+    ``get_showcase_type()`` and ``get_showcase_scope()`` tells apart the
+    views sharing a stamp.
+    """
+
+    def get_showcase_type(self):
+        return self.kwargs.get('beneficiary_type')
+
+    def get_showcase_scope(self):
+        return self.get_showcase_type() or ALL_TYPES
+
+    def get(self, request, *args, **kwargs):
+        if not is_cacheable(request):
+            return super().get(request, *args, **kwargs)
+
+        key = page_cache_key(request, self.get_showcase_scope(), self.get_showcase_type())
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = super().get(request, *args, **kwargs)
+
+        def store(response):
+            # A page that set a cookie or handed out a CSRF token is specific to this visitor
+            if (response.status_code == 200 and not response.cookies
+                    and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+                cache.set(key, response, showcase_cache_timeout())
+
+        response.add_post_render_callback(store)
+        return response
@@ -1,28 +1,45 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from django.utils import timezone
 
-from .models import Application, ApplicationStatus, Beneficiary, BeneficiarySupport
+from users.models import User
+
+from .form_schema import invalidate_form_schema
+from .models import (
+    Application, ApplicationStatus, Beneficiary, BeneficiarySupport, EducationProfile, FormField,
+    HealthProfile, HousingProfile, Program, ProgramStats, YouthProfile
+)
+from .search import index_applications, rename_applicant, rename_program
+from .showcase import bump_showcase_version, forget_beneficiary_type
 from .utils import (
+    adjust_program_stats,
+    adjust_support_total,
+    build_beneficiary,
+    mark_rollup_changed,
+    mark_rollup_changed_for_beneficiaries,
+    record_status_changes,
     send_application_submitted,
     send_new_application_to_admin,
     send_application_status_update,
     send_beneficiary_welcome,
     send_support_notification,
+    update_impact_beneficiary,
 )
 
 
 @receiver(pre_save, sender=Application)
 def track_application_status_change(sender, instance, **kwargs):
     """Track if the application status has changed"""
-    if instance.pk:
-        try:
-            old_instance = Application.objects.get(pk=instance.pk)
-            instance._old_status = old_instance.status
-        except Application.DoesNotExist:
-            instance._old_status = None
-    else:
-        instance._old_status = None
+    instance._old_status = None
+    instance._old_program_id = None
+    try:
+        # Loaded from the database, so the previous values are already known
+        instance._old_status = instance.loaded_value('status')
+        instance._old_program_id = instance.loaded_value('program')
+    except KeyError:
+        if instance.pk:
+            old = Application.objects.filter(pk=instance.pk).values_list('status', 'program_id').first()
+            if old:
+                instance._old_status, instance._old_program_id = old
 
 
 @receiver(post_save, sender=Application)
@@ -46,6 +63,68 @@ def application_post_save(sender, instance, created, **kwargs):
                 send_application_status_update(instance)
 
 
+@receiver(post_save, sender=Application)
+def update_program_stats(sender, instance, created, **kwargs):
+    """Apply the application's create or status change to ProgramStats"""
+    old_status = getattr(instance, '_old_status', None)
+    old_program_id = getattr(instance, '_old_program_id', None)
+    if created or old_status is None:
+        adjust_program_stats(instance.program_id, {instance.status: 1})
+    elif old_status != instance.status or old_program_id != instance.program_id:
+        if old_program_id == instance.program_id:
+            adjust_program_stats(instance.program_id, {old_status: -1, instance.status: 1})
+        else:
+            adjust_program_stats(old_program_id, {old_status: -1})
+            adjust_program_stats(instance.program_id, {instance.status: 1})
+
+
+@receiver(post_save, sender=Application)
+def update_search_document(sender, instance, created, **kwargs):
+    """Index new applications and ones that moved to another program or applicant"""
+    if (created or not instance.is_tracking_changes
+            or instance.has_changed('program') or instance.has_changed('applicant')):
+        index_applications([instance.pk])
+
+
+@receiver(post_save, sender=Program)
+def program_renamed(sender, instance, created, **kwargs):
+    if not created and instance.has_changed('name'):
+        rename_program(instance.pk, instance.name)
+
+
+@receiver(post_save, sender=User)
+def applicant_renamed(sender, instance, created, **kwargs):
+    if not created and (instance.has_changed('first_name') or instance.has_changed('last_name')):
+        rename_applicant(instance)
+
+
+@receiver(post_delete, sender=Application)
+def application_deleted(sender, instance, **kwargs):
+    """Remove a deleted application from ProgramStats"""
+    # The stats row may already be gone when the program itself is being deleted
+    adjust_program_stats(instance.program_id, {instance.status: -1}, rebuild_missing=False)
+
+
+@receiver(post_save, sender=Program)
+def program_created(sender, instance, created, **kwargs):
+    """Start every program with an empty ProgramStats row"""
+    if created:
+        ProgramStats.objects.get_or_create(program=instance)
+
+
+@receiver(post_save, sender=Program)
+@receiver(post_delete, sender=Program)
+def program_form_changed(sender, instance, **kwargs):
+    invalidate_form_schema(instance.pk)
+
+
+@receiver(post_save, sender=FormField)
+@receiver(post_delete, sender=FormField)
+def form_field_changed(sender, instance, **kwargs):
+    """Recompile the program's application form after its questions change"""
+    invalidate_form_schema(instance.program_id)
+
+
 @receiver(post_save, sender=ApplicationStatus)
 def application_status_update_created(sender, instance, created, **kwargs):
     """Send notification when a new ApplicationStatus is created"""
@@ -60,6 +139,13 @@ def application_status_update_created(sender, instance, created, **kwargs):
         send_application_status_update(instance)
 
 
+@receiver(post_save, sender=ApplicationStatus)
+def status_duration_update(sender, instance, created, **kwargs):
+    """Close the application's current StatusDuration and open the next one"""
+    if created:
+        record_status_changes([instance])
+
+
 @receiver(post_save, sender=Beneficiary)
 def beneficiary_created(sender, instance, created, **kwargs):
     """Send welcome email when a new beneficiary is created"""
@@ -67,6 +153,137 @@ def beneficiary_created(sender, instance, created, **kwargs):
         send_beneficiary_welcome(instance)
 
 
+@receiver(post_save, sender=Beneficiary)
+@receiver(post_delete, sender=Beneficiary)
+def beneficiary_showcase_changed(sender, instance, **kwargs):
+    """Invalidate the cached showcase pages of the beneficiary's type"""
+    types = [instance.beneficiary_type]
+    try:
+        # A type change also removes it from its old type's pages
+        types.append(instance.loaded_value('beneficiary_type'))
+    except KeyError:
+        pass
+    bump_showcase_version(*types)
+    forget_beneficiary_type(instance.pk)
+
+
+@receiver(post_save, sender=Beneficiary)
+@receiver(post_delete, sender=Beneficiary)
+def beneficiary_impact_entry_changed(sender, instance, signal, **kwargs):
+    """The impact page lists recent beneficiaries; hiding one removes them at once"""
+    update_impact_beneficiary(instance, deleted=signal is post_delete)
+
+
+ROLLUP_FIELDS = ('program', 'beneficiary_type', 'state', 'lga', 'gender', 'start_date', 'status')
+
+
+@receiver(post_save, sender=Beneficiary)
+def beneficiary_rollup_changed(sender, instance, created, **kwargs):
+    """Queue the impact rollup of the beneficiary's program, and of its old one after a move"""
+    if not created and instance.is_tracking_changes and not any(map(instance.has_changed, ROLLUP_FIELDS)):
+        return
+    programs = [instance.program_id]
+    try:
+        programs.append(instance.loaded_value('program'))
+    except KeyError:
+        pass
+    mark_rollup_changed(programs)
+
+
+@receiver(post_delete, sender=Beneficiary)
+def beneficiary_rollup_deleted(sender, instance, **kwargs):
+    mark_rollup_changed([instance.program_id])
+
+
+PROFILE_TYPES = {
+    EducationProfile: 'education',
+    HealthProfile: 'health',
+    YouthProfile: 'youth',
+    HousingProfile: 'housing',
+}
+
+
+@receiver(post_save, sender=EducationProfile)
+@receiver(post_save, sender=HealthProfile)
+@receiver(post_save, sender=YouthProfile)
+@receiver(post_save, sender=HousingProfile)
+@receiver(post_delete, sender=EducationProfile)
+@receiver(post_delete, sender=HealthProfile)
+@receiver(post_delete, sender=YouthProfile)
+@receiver(post_delete, sender=HousingProfile)
+def profile_showcase_changed(sender, instance, **kwargs):
+    bump_showcase_version(PROFILE_TYPES[sender])
+
+
+@receiver(post_save, sender=Program)
+def program_showcase_renamed(sender, instance, created, **kwargs):
+    """Program names appear on the showcase cards of every type"""
+    if not created and (not instance.is_tracking_changes or instance.has_changed('name')):
+        bump_showcase_version(*dict(Beneficiary.BENEFICIARY_TYPES))
+
+
+@receiver(post_delete, sender=Program)
+def program_showcase_deleted(sender, instance, **kwargs):
+    bump_showcase_version(*dict(Beneficiary.BENEFICIARY_TYPES))
+
+
+@receiver(post_delete, sender=Program)
+def program_rollup_deleted(sender, instance, **kwargs):
+    """The program's cells are gone with it and its beneficiaries now have no program"""
+    mark_rollup_changed([None])
+
+
+@receiver(pre_save, sender=BeneficiarySupport)
+def track_support_amount_change(sender, instance, **kwargs):
+    """Remember the stored amount and beneficiary so post_save can apply the difference"""
+    instance._old_support = None
+    try:
+        instance._old_support = (instance.loaded_value('beneficiary'), instance.loaded_value('amount'))
+    except KeyError:
+        if instance.pk:
+            instance._old_support = BeneficiarySupport.objects.filter(pk=instance.pk).values_list(
+                'beneficiary_id', 'amount'
+            ).first()
+
+
+@receiver(post_save, sender=BeneficiarySupport)
+def update_support_total(sender, instance, created, **kwargs):
+    """Keep Beneficiary.total_support_amount equal to the sum of its support records"""
+    old = getattr(instance, '_old_support', None)
+    if old is None:
+        adjust_support_total(instance.beneficiary_id, instance.amount)
+    elif old != (instance.beneficiary_id, instance.amount):
+        adjust_support_total(old[0], -old[1])
+        adjust_support_total(instance.beneficiary_id, instance.amount)
+    refresh_cached_support_total(instance)
+
+
+@receiver(post_delete, sender=BeneficiarySupport)
+def support_deleted(sender, instance, **kwargs):
+    adjust_support_total(instance.beneficiary_id, -instance.amount)
+    refresh_cached_support_total(instance)
+
+
+@receiver(post_save, sender=BeneficiarySupport)
+def support_rollup_changed(sender, instance, created, **kwargs):
+    old = getattr(instance, '_old_support', None)
+    if old != (instance.beneficiary_id, instance.amount) or instance.has_changed('date'):
+        mark_rollup_changed_for_beneficiaries([instance.beneficiary_id, *(old[:1] if old else [])])
+
+
+@receiver(post_delete, sender=BeneficiarySupport)
+def support_rollup_deleted(sender, instance, **kwargs):
+    mark_rollup_changed_for_beneficiaries([instance.beneficiary_id])
+
+
+def refresh_cached_support_total(support):
+    """Bring an already loaded beneficiary in line with the updated database total"""
+    if BeneficiarySupport.beneficiary.is_cached(support):
+        total = Beneficiary.objects.filter(pk=support.beneficiary_id).values_list('total_support_amount', flat=True).first()
+        if total is not None:
+            support.beneficiary.total_support_amount = total
+
+
 @receiver(post_save, sender=BeneficiarySupport)
 def support_created(sender, instance, created, **kwargs):
     """Send notification when support is disbursed"""
@@ -86,42 +303,6 @@ def create_beneficiary_from_application(application, beneficiary_type, created_b
     Returns:
         The created Beneficiary instance
     """
-    # Map program types to beneficiary types
-    program_type_mapping = {
-        'scholarship': 'education',
-        'healthcare': 'health',
-        'youth': 'youth',
-        'housing': 'housing',
-        'other': 'education',  # Default
-    }
-
-    if not beneficiary_type:
-        beneficiary_type = program_type_mapping.get(
-            application.program.program_type,
-            'education'
-        )
-
-    # Get applicant info
-    applicant = application.applicant
-    form_data = application.form_data or {}
-
-    # Create beneficiary
-    beneficiary = Beneficiary.objects.create(
-        beneficiary_type=beneficiary_type,
-        application=application,
-        program=application.program,
-        user=applicant,
-        full_name=applicant.get_full_name() or form_data.get('full_name', applicant.email),
-        date_of_birth=applicant.date_of_birth,
-        gender=form_data.get('gender', 'male'),
-        phone_number=applicant.phone_number or form_data.get('phone_number', ''),
-        email=applicant.email,
-        address=applicant.address or form_data.get('address', ''),
-        guardian_name=form_data.get('guardian_name', ''),
-        guardian_phone=form_data.get('guardian_phone', ''),
-        status='active',
-        start_date=timezone.now().date(),
-        created_by=created_by,
-    )
-
+    beneficiary = build_beneficiary(application, beneficiary_type, created_by)
+    beneficiary.save()
     return beneficiary
@@ -1,11 +1,47 @@
-from django.test import TestCase, Client
+import csv
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from openpyxl import load_workbook
 from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import Program, Application, ApplicationDocument, NotificationPreference
-from datetime import datetime, timedelta
+from core.imports import claim_import_job, queue_import_job, run_import_job
+from core.models import ImportJob
+from .models import (
+    Program, Application, ApplicationDocument, ApplicationStatus,
+    NotificationPreference, OutboundEmail, ExportJob, ProgramStats, Beneficiary, BeneficiarySupport,
+    FormField, ApplicationSearchDocument, EducationProfile, HealthProfile, ImpactSnapshot, ImpactRollup,
+    ImpactRollupChange, StatusDuration
+)
+from .exports import (
+    EXPORT_HEADER, HISTORY_HEADER, XLSX_CONTENT_TYPE, claim_export_job, export_queryset,
+    iter_export_rows, render_pdf, run_export_job, sheet_title
+)
+from .utils import (
+    send_welcome_email, send_queued_emails, outbox_stats, bulk_update_status, rebuild_program_stats,
+    support_total_mismatches, compute_impact_figures, get_impact_snapshot, refresh_impact_rollup, sync_support_totals,
+    rebuild_status_durations, turnaround_percentiles, approve_applications
+)
+from .form_schema import get_form_schema
+from .showcase import showcase_version
+from .search import SEARCH_FIELDS, MySQLSearchBackend, rebuild_search_index, search_applications
+from .views import ApplicationListView, BeneficiaryShowcaseView, DashboardView
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
 User = get_user_model()
 
@@ -132,10 +168,10 @@ class ApplicationViewTests(TestCase):
         self.assertEqual(response['Content-Type'], 
                         'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
 
-        # Test PDF export
+        # Test PDF export is queued as a background job
         response = self.client.get(export_url, {'format': 'pdf'})
-        self.assertEqual(response.status_code, 200)
-        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ExportJob.objects.get().export_format, 'pdf')
 
     def test_bulk_application_review(self):
         bulk_review_url = reverse('applications:bulk_application_review')
@@ -197,4 +233,1214 @@ class ApplicationViewTests(TestCase):
         # Test context data
         self.assertIn('monthly_applications', response.context)
         self.assertIn('program_success_rates', response.context)
-        self.assertIn('avg_processing_time', response.context)
\ No newline at end of file
+        self.assertIn('avg_processing_time', response.context)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='outbox@example.com',
+            password='testpass123'
+        )
+
+    def test_helpers_queue_instead_of_sending(self):
+        send_welcome_email(self.user)
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.recipients, ['outbox@example.com'])
+        self.assertTrue(email.html_body)
+
+    def test_worker_delivers_batch(self):
+        send_welcome_email(self.user)
+        send_welcome_email(self.user)
+
+        sent, failed = send_queued_emails()
+
+        self.assertEqual((sent, failed), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_DELAY=60)
+    def test_failed_send_is_retried_with_backoff(self):
+        send_welcome_email(self.user)
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=OSError('connection reset')
+        ):
+            self.assertEqual(send_queued_emails(), (0, 1))
+            email = OutboundEmail.objects.get()
+            self.assertEqual(email.status, 'pending')
+            self.assertEqual(email.attempts, 1)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertEqual(email.last_error, 'connection reset')
+
+            # Not due yet, so the worker leaves it alone
+            self.assertEqual(send_queued_emails(), (0, 0))
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(send_queued_emails(), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'failed')
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_outbox_stats(self):
+        send_welcome_email(self.user)
+        send_welcome_email(self.user)
+        send_queued_emails(batch_size=1)
+
+        stats = outbox_stats()
+        self.assertEqual(stats['pending'], 1)
+        self.assertEqual(stats['sent_last_hour'], 1)
+        self.assertEqual(stats['failed'], 0)
+
+
+class BulkStatusUpdateTests(TestCase):
+    def setUp(self):
+        self.staff_user = User.objects.create_user(
+            email='reviewer@example.com',
+            password='staffpass123',
+            is_staff=True
+        )
+        self.program = Program.objects.create(
+            name='Bulk Program',
+            program_type='scholarship',
+            description='Test Description',
+            eligibility_criteria='Test Criteria',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+
+    def create_applications(self, count):
+        start = Application.objects.count()
+        for i in range(start, start + count):
+            applicant = User.objects.create_user(email=f'applicant{i}@example.com', password='x')
+            Application.objects.create(
+                program=self.program,
+                applicant=applicant,
+                form_data={},
+                status='submitted',
+                submitted_at=timezone.now()
+            )
+        OutboundEmail.objects.all().delete()
+
+    def test_query_count_does_not_grow_with_selection(self):
+        self.create_applications(2)
+        with CaptureQueriesContext(connection) as small:
+            bulk_update_status(Application.objects.all(), 'under_review', self.staff_user)
+
+        self.create_applications(8)
+        with CaptureQueriesContext(connection) as large:
+            bulk_update_status(Application.objects.filter(status='submitted'), 'under_review', self.staff_user)
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_history_and_notifications(self):
+        self.create_applications(3)
+        opted_out = Application.objects.first().applicant
+        NotificationPreference.objects.create(user=opted_out, email_on_status_change=False)
+
+        changed = bulk_update_status(Application.objects.all(), 'approved', self.staff_user, notes='Bulk approve')
+
+        self.assertEqual(len(changed), 3)
+        self.assertEqual(Application.objects.filter(status='approved', reviewed_by=self.staff_user).count(), 3)
+        self.assertEqual(ApplicationStatus.objects.filter(status='approved', notes='Bulk approve').count(), 3)
+        recipients = [email.recipients[0] for email in OutboundEmail.objects.all()]
+        self.assertEqual(len(recipients), 2)
+        self.assertNotIn(opted_out.email, recipients)
+
+    def test_unchanged_applications_are_skipped(self):
+        self.create_applications(2)
+        bulk_update_status(Application.objects.all(), 'rejected', self.staff_user)
+        self.assertEqual(bulk_update_status(Application.objects.all(), 'rejected', self.staff_user), [])
+        self.assertEqual(ApplicationStatus.objects.count(), 2)
+
+
+
+class ApproveApplicationsTests(TestCase):
+    def setUp(self):
+        self.staff_user = User.objects.create_user(
+            email='approver@example.com', password='x', is_staff=True, is_superuser=True
+        )
+        self.scholarships = self.create_program('Scholarships', 'scholarship')
+        self.clinics = self.create_program('Clinics', 'healthcare')
+
+    def create_program(self, name, program_type):
+        return Program.objects.create(
+            name=name, program_type=program_type, description='d', eligibility_criteria='c',
+            start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=30),
+        )
+
+    def create_applications(self, program, count):
+        start = Application.objects.count()
+        for i in range(start, start + count):
+            applicant = User.objects.create_user(
+                email=f'cohort{i}@example.com', password='x', first_name='Cohort', last_name=str(i)
+            )
+            Application.objects.create(
+                program=program, applicant=applicant, form_data={'gender': 'female'},
+                status='submitted', submitted_at=timezone.now()
+            )
+        OutboundEmail.objects.all().delete()
+
+    def test_creates_beneficiaries_profiles_and_welcome_emails(self):
+        self.create_applications(self.scholarships, 2)
+        self.create_applications(self.clinics, 1)
+        ImpactRollupChange.objects.all().delete()
+        version = showcase_version('health')
+
+        approved, beneficiaries = approve_applications(Application.objects.all(), self.staff_user)
+
+        self.assertEqual(len(approved), 3)
+        self.assertEqual(len(beneficiaries), 3)
+        self.assertTrue(all(beneficiary.pk for beneficiary in beneficiaries))
+        self.assertEqual(Beneficiary.objects.filter(beneficiary_type='education', gender='female').count(), 2)
+        self.assertEqual(EducationProfile.objects.count(), 2)
+        health = HealthProfile.objects.get()
+        self.assertEqual(health.beneficiary.program, self.clinics)
+        self.assertEqual(health.treatment_start_date, timezone.now().date())
+        welcome = OutboundEmail.objects.filter(subject__startswith='Welcome to')
+        self.assertEqual(welcome.count(), 3)
+        self.assertNotEqual(showcase_version('health'), version)
+        self.assertEqual(
+            set(ImpactRollupChange.objects.values_list('program_id', flat=True)),
+            {self.scholarships.pk, self.clinics.pk}
+        )
+
+    def test_query_count_does_not_grow_with_selection(self):
+        self.create_applications(self.scholarships, 2)
+        with CaptureQueriesContext(connection) as small:
+            approve_applications(Application.objects.all(), self.staff_user)
+
+        self.create_applications(self.scholarships, 8)
+        with CaptureQueriesContext(connection) as large:
+            approve_applications(Application.objects.filter(status='submitted'), self.staff_user)
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(Beneficiary.objects.count(), 10)
+
+    def test_existing_beneficiaries_are_skipped(self):
+        self.create_applications(self.scholarships, 2)
+        application = Application.objects.first()
+        Beneficiary.objects.create(
+            beneficiary_type='education', application=application, program=self.scholarships,
+            full_name='Existing', gender='male', start_date=timezone.now().date()
+        )
+
+        approved, beneficiaries = approve_applications(Application.objects.all(), self.staff_user)
+
+        self.assertEqual(len(approved), 2)
+        self.assertEqual(len(beneficiaries), 1)
+        self.assertEqual(Beneficiary.objects.count(), 2)
+
+    def test_admin_action(self):
+        self.create_applications(self.scholarships, 3)
+        self.client.force_login(self.staff_user)
+
+        response = self.client.post(reverse('admin:applications_application_changelist'), {
+            'action': 'approve_and_create_beneficiary',
+            '_selected_action': list(Application.objects.values_list('pk', flat=True)),
+        }, follow=True)
+
+        self.assertContains(response, '3 applications approved, 3 beneficiaries created.')
+        self.assertEqual(Application.objects.filter(status='approved').count(), 3)
+
+class ExportFixtureMixin:
+    def setUp(self):
+        self.staff_user = User.objects.create_user(
+            email='exporter@example.com',
+            password='staffpass123',
+            is_staff=True,
+            first_name='Staff',
+            last_name='Member'
+        )
+        self.program = Program.objects.create(
+            name='Export Program',
+            program_type='scholarship',
+            description='Test Description',
+            eligibility_criteria='Test Criteria',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+        for i in range(5):
+            applicant = User.objects.create_user(
+                email=f'exported{i}@example.com', password='x',
+                first_name='Applicant', last_name=str(i)
+            )
+            Application.objects.create(
+                program=self.program,
+                applicant=applicant,
+                form_data={},
+                status='submitted',
+                submitted_at=timezone.now(),
+                reviewed_by=self.staff_user if i % 2 else None,
+                review_notes='Line one\nline, two' if i == 0 else ''
+            )
+        self.client.force_login(self.staff_user)
+
+
+class ApplicationExportTests(ExportFixtureMixin, TestCase):
+    def test_csv_export_is_streamed(self):
+        response = self.client.get(reverse('applications:export_applications'), {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], EXPORT_HEADER)
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][1], 'Applicant 0')
+        self.assertEqual(rows[1][4], 'Line one\nline, two')
+        self.assertEqual(rows[2][5], 'Staff Member')
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_rows_are_read_in_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(iter_export_rows(export_queryset()))
+        self.assertEqual(len(rows), 5)
+        # 2 + 2 + 1 rows; the short chunk ends the scan
+        self.assertEqual(len(queries), 3)
+
+    def read_workbook(self, params):
+        response = self.client.get(reverse('applications:export_applications'), {'format': 'excel', **params})
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        return load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_excel_export(self):
+        wb = self.read_workbook({})
+        self.assertEqual(wb.sheetnames, ['Applications'])
+        rows = list(wb.active.values)
+        self.assertEqual(list(rows[0]), EXPORT_HEADER)
+        self.assertEqual(len(rows), 6)
+
+    def test_excel_export_sheet_per_program_with_history(self):
+        other = Program.objects.create(
+            name='Health/Support: [2025]',
+            program_type='health',
+            description='Test Description',
+            eligibility_criteria='Test Criteria',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+        application = Application.objects.create(
+            program=other,
+            applicant=self.staff_user,
+            form_data={},
+            status='submitted',
+            submitted_at=timezone.now()
+        )
+        ApplicationStatus.objects.create(application=application, status='submitted', created_by=self.staff_user)
+
+        wb = self.read_workbook({'sheets': 'program', 'history': '1'})
+        self.assertEqual(wb.sheetnames, ['Export Program', 'Health Support   2025', 'Status History'])
+        self.assertEqual(len(list(wb['Export Program'].values)), 6)
+        self.assertEqual(len(list(wb['Health Support   2025'].values)), 2)
+        history = list(wb['Status History'].values)
+        self.assertEqual(list(history[0]), HISTORY_HEADER)
+        self.assertEqual(history[1][0], application.pk)
+        self.assertEqual(history[1][5], 'Staff Member')
+
+    def test_sheet_titles_are_unique_and_short(self):
+        used = set()
+        first = sheet_title('A very long program name that exceeds the limit', used)
+        second = sheet_title('A very long program name that exceeds the limit too', used)
+        self.assertEqual(len(first), 31)
+        self.assertLessEqual(len(second), 31)
+        self.assertNotEqual(first.lower(), second.lower())
+
+
+@override_settings(EXPORT_PDF_ROWS_PER_TABLE=2)
+class ExportJobTests(ExportFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_root)
+        storage = mock.patch.object(ExportJob._meta.get_field('file'), 'storage', FileSystemStorage(export_root))
+        storage.start()
+        self.addCleanup(storage.stop)
+
+    def queue_pdf(self):
+        response = self.client.get(reverse('applications:export_applications'), {'format': 'pdf'})
+        job = ExportJob.objects.latest('pk')
+        self.assertRedirects(response, reverse('applications:export_job_detail', args=[job.pk]))
+        return job
+
+    def test_pdf_export_is_rendered_by_worker(self):
+        job = self.queue_pdf()
+        status_url = reverse('applications:export_job_status', args=[job.pk])
+        self.assertEqual(self.client.get(status_url).json()['status'], 'queued')
+
+        self.assertEqual(claim_export_job(), job)
+        job = run_export_job(ExportJob.objects.get(pk=job.pk))
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.total_rows, 5)
+
+        data = self.client.get(status_url).json()
+        self.assertEqual(data['progress'], 100)
+        response = self.client.get(data['download_url'])
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    def test_pdf_tables_are_built_as_the_layout_reaches_them(self):
+        read = []
+
+        def rows(queryset, chunk_size=None):
+            for row in iter_export_rows(queryset, chunk_size):
+                read.append(row)
+                yield row
+
+        drawn = []
+        with mock.patch('applications.exports.iter_export_rows', rows):
+            render_pdf(io.BytesIO(), export_queryset(), lambda done: drawn.append((done, len(read))))
+        # When the first table is drawn only its own rows have been read
+        self.assertEqual(drawn, [(2, 2), (4, 4), (5, 5)])
+
+    def test_admin_serves_the_private_file(self):
+        job = run_export_job(ExportJob.objects.get(pk=self.queue_pdf().pk))
+        self.client.force_login(User.objects.create_superuser(email='admin@example.com', password='x'))
+        response = self.client.get(reverse('admin:applications_exportjob_change', args=[job.pk]))
+        download_url = reverse('admin:applications_exportjob_download', args=[job.pk])
+        self.assertContains(response, f'href="{download_url}"')
+
+        response = self.client.get(download_url)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        # Staff without the view permission get nothing
+        self.client.force_login(self.staff_user)
+        self.assertEqual(self.client.get(download_url).status_code, 403)
+
+    def test_identical_export_in_progress_is_reused(self):
+        self.assertEqual(self.queue_pdf(), self.queue_pdf())
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+    def test_concurrent_jobs_are_capped(self):
+        ExportJob.objects.create(requested_by=self.staff_user, status='running')
+        self.queue_pdf()
+        self.assertIsNone(claim_export_job(max_running=1))
+        self.assertIsNotNone(claim_export_job(max_running=2))
+
+    def test_stalled_jobs_release_their_slot(self):
+        stalled = ExportJob.objects.create(requested_by=self.staff_user, status='running')
+        ExportJob.objects.filter(pk=stalled.pk).update(updated_at=timezone.now() - timedelta(hours=2))
+        queued = self.queue_pdf()
+        self.assertEqual(claim_export_job(max_running=1), queued)
+        self.assertEqual(ExportJob.objects.get(pk=stalled.pk).status, 'failed')
+
+    def test_status_requires_staff(self):
+        job = self.queue_pdf()
+        user = User.objects.create_user(email='applicant@example.com', password='x')
+        self.client.force_login(user)
+        response = self.client.get(reverse('applications:export_job_status', args=[job.pk]))
+        self.assertEqual(response.status_code, 403)
+
+
+class ProgramStatsTests(TestCase):
+    def setUp(self):
+        self.staff_user = User.objects.create_user(
+            email='stats@example.com',
+            password='staffpass123',
+            is_staff=True
+        )
+        self.program = Program.objects.create(
+            name='Stats Program',
+            program_type='scholarship',
+            description='Test Description',
+            eligibility_criteria='Test Criteria',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+
+    def create_application(self, status='submitted'):
+        applicant = User.objects.create_user(
+            email=f'stats{Application.objects.count()}@example.com', password='x'
+        )
+        return Application.objects.create(
+            program=self.program, applicant=applicant, form_data={}, status=status
+        )
+
+    def stats(self):
+        return ProgramStats.objects.get(program=self.program)
+
+    def test_counters_follow_application_lifecycle(self):
+        self.assertEqual(self.stats().total_applications, 0)
+
+        application = self.create_application()
+        self.create_application(status='draft')
+        self.assertEqual((self.stats().submitted, self.stats().draft), (1, 1))
+
+        application.status = 'approved'
+        application.save()
+        stats = self.stats()
+        self.assertEqual((stats.submitted, stats.approved, stats.total_applications), (0, 1, 2))
+
+        application.delete()
+        self.assertEqual((self.stats().approved, self.stats().total_applications), (0, 1))
+
+    def test_bulk_update_adjusts_counters(self):
+        for _ in range(3):
+            self.create_application()
+        bulk_update_status(Application.objects.all(), 'rejected', self.staff_user)
+        stats = self.stats()
+        self.assertEqual((stats.submitted, stats.rejected), (0, 3))
+
+    def test_rebuild_corrects_drift(self):
+        self.create_application()
+        ProgramStats.objects.filter(program=self.program).update(submitted=7, approved=2)
+        ProgramStats.objects.filter(program=self.program).delete()
+        other = Program.objects.create(
+            name='Other Program',
+            program_type='youth',
+            description='Test Description',
+            eligibility_criteria='Test Criteria',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+        ProgramStats.objects.filter(program=other).update(approved=4)
+
+        self.assertEqual(rebuild_program_stats(chunk_size=1), 2)
+        self.assertEqual((self.stats().submitted, self.stats().approved), (1, 0))
+        self.assertEqual(ProgramStats.objects.get(program=other).approved, 0)
+        self.assertEqual(rebuild_program_stats(), 0)
+
+    def test_dashboards_read_counters(self):
+        self.create_application()
+        request = RequestFactory().get('/')
+        request.user = self.staff_user
+        context = DashboardView(request=request).get_context_data()
+        self.assertEqual(context['total_applications'], 1)
+        self.assertEqual(context['pending_applications'], 1)
+        self.assertEqual([stats.program for stats in context['program_stats']], [self.program])
+
+        self.client.force_login(self.staff_user)
+        response = self.client.get(reverse('applications:analytics'))
+        self.assertEqual(response.context['program_success_rates'], [self.stats()])
+
+
+class BeneficiarySupportTotalTests(TestCase):
+    def setUp(self):
+        self.beneficiary = self.create_beneficiary('Ada Obi')
+
+    def create_beneficiary(self, name):
+        return Beneficiary.objects.create(
+            beneficiary_type='education', full_name=name, gender='female',
+            start_date=timezone.now().date()
+        )
+
+    def add_support(self, amount, beneficiary=None):
+        return BeneficiarySupport.objects.create(
+            beneficiary=beneficiary or self.beneficiary, support_type='tuition',
+            amount=Decimal(amount), description='Fees', date=timezone.now().date()
+        )
+
+    def total(self, beneficiary=None):
+        return Beneficiary.objects.get(pk=(beneficiary or self.beneficiary).pk).total_support_amount
+
+    def test_total_follows_support_records(self):
+        first = self.add_support('1000.00')
+        second = self.add_support('250.50')
+        self.assertEqual(self.total(), Decimal('1250.50'))
+
+        first.amount = Decimal('400.00')
+        first.save()
+        self.assertEqual(self.total(), Decimal('650.50'))
+
+        other = self.create_beneficiary('Chidi Eze')
+        second.beneficiary = other
+        second.save()
+        self.assertEqual((self.total(), self.total(other)), (Decimal('400.00'), Decimal('250.50')))
+
+        first.delete()
+        BeneficiarySupport.objects.filter(beneficiary=other).delete()
+        self.assertEqual((self.total(), self.total(other)), (0, 0))
+
+    def test_loaded_beneficiary_is_refreshed(self):
+        support = self.add_support('300.00')
+        self.assertEqual(support.beneficiary.total_support_amount, Decimal('300.00'))
+
+    def test_sync_repairs_drift(self):
+        self.add_support('500.00')
+        drifted = self.create_beneficiary('Ngozi Nwosu')
+        Beneficiary.objects.filter(pk=drifted.pk).update(total_support_amount=Decimal('75.00'))
+        Beneficiary.objects.filter(pk=self.beneficiary.pk).update(total_support_amount=0)
+
+        self.assertEqual(
+            sorted(support_total_mismatches(chunk_size=1)),
+            [(self.beneficiary.pk, 0, Decimal('500.00')), (drifted.pk, Decimal('75.00'), 0)]
+        )
+        self.assertEqual(sync_support_totals(), 2)
+        self.assertEqual(list(support_total_mismatches()), [])
+        self.assertEqual(self.total(), Decimal('500.00'))
+
+    def test_admin_changelist_sorts_without_per_row_queries(self):
+        admin_user = User.objects.create_superuser(email='admin@example.com', password='x')
+        self.client.force_login(admin_user)
+        url = reverse('admin:applications_beneficiary_changelist')
+        for i in range(3):
+            self.add_support(f'{i + 1}00.00', self.create_beneficiary(f'Student {i}'))
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url, {'o': '-6'})
+        for i in range(3, 9):
+            self.add_support(f'{i + 1}00.00', self.create_beneficiary(f'Student {i}'))
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url, {'o': '-6', 'total_support': '100k_500k'})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(many), len(few))
+
+
+class FormSchemaTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='schema@example.com', password='x')
+        self.program = Program.objects.create(
+            name='Schema Program',
+            program_type='scholarship',
+            description='Test Description',
+            eligibility_criteria='Test Criteria',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+        self.school = FormField.objects.create(
+            program=self.program, label='School', field_type='text', order=1
+        )
+        self.level = FormField.objects.create(
+            program=self.program, label='Level', field_type='select', order=2,
+            options='Primary, Secondary'
+        )
+        self.started = FormField.objects.create(
+            program=self.program, label='Start date', field_type='date', order=3, is_required=False
+        )
+        self.url = reverse('applications:application_create', args=[self.program.pk])
+        self.client.force_login(self.user)
+
+    def submission(self, **answers):
+        return {
+            'first_name': 'Ada', 'last_name': 'Obi', 'email': 'schema@example.com',
+            'form-TOTAL_FORMS': '0', 'form-INITIAL_FORMS': '0',
+            'form-MIN_NUM_FORMS': '0', 'form-MAX_NUM_FORMS': '1000',
+            **answers,
+        }
+
+    def formfield_queries(self, queries):
+        return [q['sql'] for q in queries if 'applications_formfield' in q['sql']]
+
+    def test_schema_is_compiled_and_cached(self):
+        schema = get_form_schema(self.program)
+        self.assertEqual([field.label for field in schema], ['School', 'Level', 'Start date'])
+        self.assertEqual(schema.fields[1].options, ['Primary', 'Secondary'])
+        self.assertIs(get_form_schema(self.program.pk), schema)
+
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'name="field_%d"' % self.school.pk)
+        self.assertEqual(self.formfield_queries(queries), [])
+
+    def test_form_field_changes_invalidate_schema(self):
+        schema = get_form_schema(self.program)
+        self.school.label = 'School name'
+        self.school.save()
+        updated = get_form_schema(self.program)
+        self.assertNotEqual(updated.version, schema.version)
+        self.assertEqual(updated.fields[0].label, 'School name')
+
+        self.started.delete()
+        self.assertEqual(len(get_form_schema(self.program)), 2)
+
+    def test_submission_is_validated_against_schema(self):
+        get_form_schema(self.program)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.submission(**{
+                f'field_{self.school.pk}': 'Unity College',
+                f'field_{self.level.pk}': 'University',
+            }))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Application.objects.exists())
+        self.assertEqual(self.formfield_queries(queries), [])
+
+        response = self.client.post(self.url, self.submission(**{
+            f'field_{self.school.pk}': 'Unity College',
+            f'field_{self.level.pk}': 'Secondary',
+            f'field_{self.started.pk}': '2025-09-01',
+        }))
+        application = Application.objects.get()
+        self.assertRedirects(response, reverse('applications:application_detail', args=[application.pk]),
+                             fetch_redirect_response=False)
+        form_data = json.loads(application.form_data)
+        self.assertEqual(form_data[f'field_{self.level.pk}'], 'Secondary')
+        self.assertEqual(form_data[f'field_{self.started.pk}'], '2025-09-01')
+
+
+class ApplicationSearchTests(TestCase):
+    def setUp(self):
+        self.staff_user = User.objects.create_user(
+            email='searcher@example.com', password='x', is_staff=True
+        )
+        self.youth = self.create_program('Youth Training')
+        self.health = self.create_program('Health Support')
+        self.ada_youth = self.create_application(self.youth, 'Ada', 'Youthful')
+        self.ada_obi = self.create_application(self.youth, 'Ada', 'Obi')
+        self.chidi = self.create_application(self.health, 'Chidi', 'Eze')
+
+    def create_program(self, name):
+        return Program.objects.create(
+            name=name,
+            program_type='youth',
+            description='Test Description',
+            eligibility_criteria='Test Criteria',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+
+    def create_application(self, program, first_name, last_name):
+        applicant = User.objects.create_user(
+            email=f'{first_name}.{last_name}@example.com'.lower(), password='x',
+            first_name=first_name, last_name=last_name
+        )
+        return Application.objects.create(
+            program=program, applicant=applicant, form_data={}, status='submitted'
+        )
+
+    def search(self, query, **kwargs):
+        return list(search_applications(Application.objects.all(), query, **kwargs))
+
+    def test_prefix_match_ranked_by_relevance(self):
+        self.assertEqual(self.search('ada youth'), [self.ada_youth, self.ada_obi])
+        self.assertEqual(self.search('eze'), [self.chidi])
+        self.assertEqual(self.search('nobody'), [])
+
+    def test_field_restricted_search(self):
+        self.assertEqual(self.search('youth', fields=['applicant_name']), [self.ada_youth])
+        self.assertEqual(
+            set(self.search('youth', fields=['program_name'], rank=False)), {self.ada_youth, self.ada_obi}
+        )
+
+    def test_short_names_and_stopwords(self):
+        li = self.create_application(self.health, 'Li', 'Na')
+        self.assertEqual(self.search('li'), [li])
+        self.assertEqual(self.search('na health'), [li])
+
+        # MySQL's FULLTEXT index leaves these words out, so they are matched with icontains
+        backend = MySQLSearchBackend()
+        self.assertEqual(backend.split_terms(['li', 'ada', 'the', 'obi']), (['ada', 'obi'], ['li', 'the']))
+        queryset = backend.filter(Application.objects.all(), ['li', 'ada'], SEARCH_FIELDS)
+        sql, params = queryset.query.sql_with_params()
+        self.assertIn('AGAINST (%s IN BOOLEAN MODE)', sql)
+        self.assertIn('+ada*', params)
+        self.assertIn('%li%', params)
+        self.assertNotIn('+li*', params)
+
+    def test_index_follows_lifecycle(self):
+        self.health.name = 'Wellness Support'
+        self.health.save()
+        self.assertEqual(self.search('wellness'), [self.chidi])
+
+        applicant = self.ada_obi.applicant
+        applicant.last_name = 'Okafor'
+        applicant.save()
+        self.assertEqual(self.search('okafor'), [self.ada_obi])
+
+        self.ada_obi.program = self.health
+        self.ada_obi.save()
+        self.assertEqual(set(self.search('wellness')), {self.chidi, self.ada_obi})
+
+        self.chidi.delete()
+        self.assertEqual(self.search('wellness'), [self.ada_obi])
+
+        ApplicationSearchDocument.objects.all().delete()
+        self.assertEqual(rebuild_search_index(chunk_size=2), 2)
+        self.assertEqual(self.search('okafor'), [self.ada_obi])
+
+    def test_list_view_search_and_filter(self):
+        self.client.force_login(self.staff_user)
+        url = reverse('applications:application_list')
+        response = self.client.get(url, {'search': 'ada'})
+        self.assertEqual(list(response.context['applications']), [self.ada_obi, self.ada_youth])
+        response = self.client.get(url, {'program_name': 'health'})
+        self.assertEqual(list(response.context['applications']), [self.chidi])
+
+    def test_list_view_pages_by_cursor(self):
+        self.client.force_login(self.staff_user)
+        url = reverse('applications:application_list')
+        for params, expected in [
+            ({}, [self.chidi, self.ada_obi, self.ada_youth]),
+            ({'search': 'ada youth'}, [self.ada_youth, self.ada_obi]),
+        ]:
+            seen = []
+            with mock.patch.object(ApplicationListView, 'paginate_by', 2):
+                response = self.client.get(url, params)
+                seen += response.context['applications']
+                page = response.context['page_obj']
+                if page.has_next():
+                    response = self.client.get(url, {**params, 'cursor': page.next_cursor})
+                    seen += response.context['applications']
+                    self.assertTrue(response.context['page_obj'].has_previous())
+            self.assertEqual(seen, expected)
+        self.assertEqual(self.client.get(url, {'cursor': 'bogus'}).status_code, 404)
+
+
+class ShowcaseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.program = Program.objects.create(
+            name='Scholars Fund',
+            program_type='scholarship',
+            description='Test Description',
+            eligibility_criteria='Test Criteria',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+        self.scholar = self.create_beneficiary('Ada Scholar', 'education')
+        self.trainee = self.create_beneficiary('Chidi Trainee', 'youth')
+        self.education_url = reverse('applications:education_showcase')
+        self.youth_url = reverse('applications:youth_showcase')
+
+    def create_beneficiary(self, name, beneficiary_type):
+        return Beneficiary.objects.create(
+            beneficiary_type=beneficiary_type, full_name=name, gender='female', program=self.program,
+            start_date=timezone.now().date(), show_on_website=True, status='active'
+        )
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        self.assertContains(self.client.get(self.education_url), 'Ada Scholar')
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(self.education_url), 'Ada Scholar')
+        # Search terms and cursors have their own entries
+        self.assertNotContains(self.client.get(self.education_url, {'search': 'nobody'}), 'Ada Scholar')
+
+    def test_changes_replace_only_affected_pages(self):
+        self.client.get(self.education_url)
+        self.client.get(self.youth_url)
+
+        self.scholar.full_name = 'Ada Renamed'
+        self.scholar.save()
+        self.assertContains(self.client.get(self.education_url), 'Ada Renamed')
+        with self.assertNumQueries(0):
+            self.client.get(self.youth_url)
+
+        self.trainee.beneficiary_type = 'education'
+        self.trainee.save()
+        self.assertNotContains(self.client.get(self.youth_url), 'Chidi Trainee')
+        self.assertContains(self.client.get(self.education_url), 'Chidi Trainee')
+
+        self.program.name = 'Futures Fund'
+        self.program.save()
+        self.assertContains(self.client.get(self.education_url), 'Futures Fund')
+
+        self.scholar.delete()
+        self.assertNotContains(self.client.get(self.education_url), 'Ada Renamed')
+
+    def test_detail_page_follows_profile_changes(self):
+        url = reverse('applications:beneficiary_detail', args=[self.scholar.pk])
+        self.client.get(url)
+        EducationProfile.objects.create(
+            beneficiary=self.scholar, institution_type='university', school_name='Unity College',
+            current_class='year_1'
+        )
+        self.assertContains(self.client.get(url), 'Unity College')
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        # Only changes to its own type replace it
+        self.trainee.full_name = 'Chidi Renamed'
+        self.trainee.save()
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_cached_page_keeps_its_headers(self):
+        render_to_response = BeneficiaryShowcaseView.render_to_response
+
+        def with_header(view, context, **kwargs):
+            response = render_to_response(view, context, **kwargs)
+            response['X-Showcase'] = 'education'
+            return response
+
+        with mock.patch.object(BeneficiaryShowcaseView, 'render_to_response', with_header):
+            self.client.get(self.education_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.education_url)
+        self.assertEqual(response['X-Showcase'], 'education')
+
+    def test_signed_in_users_get_a_fresh_page(self):
+        self.client.get(self.education_url)
+        user = User.objects.create_user(email='visitor@example.com', password='x')
+        self.client.force_login(user)
+        response = self.client.get(self.education_url)
+        self.assertContains(response, 'visitor@example.com')
+
+        # The beneficiary grid is still reused, so it is neither paged nor counted again
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.education_url)
+        self.assertContains(response, 'Ada Scholar')
+        self.assertContains(response, '1 Beneficiaries')
+        self.assertFalse([query for query in queries if 'applications_beneficiary' in query['sql']])
+
+
+class ImpactSnapshotTests(TestCase):
+    def setUp(self):
+        self.program = Program.objects.create(
+            name='Impact Program',
+            program_type='scholarship',
+            description='Test Description',
+            eligibility_criteria='Test Criteria',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30),
+            is_active=True,
+        )
+        Program.objects.create(
+            name='Closed Program', program_type='health', description='d', eligibility_criteria='c',
+            start_date=timezone.now().date(), end_date=timezone.now().date(), is_active=False,
+        )
+        people = [
+            ('education', 'female', 'active'),
+            ('education', 'male', 'active'),
+            ('health', 'female', 'active'),
+            ('youth', 'male', 'completed'),
+        ]
+        for i, (beneficiary_type, gender, status) in enumerate(people):
+            beneficiary = Beneficiary.objects.create(
+                beneficiary_type=beneficiary_type, full_name=f'Person {i}', gender=gender, status=status,
+                program=self.program, start_date=timezone.now().date(), show_on_website=True,
+            )
+            BeneficiarySupport.objects.create(
+                beneficiary=beneficiary, support_type='tuition', amount=Decimal('100.50'),
+                description='Fees', date=timezone.now().date()
+            )
+        refresh_impact_rollup()
+
+    def test_figures_match_individual_counts(self):
+        with CaptureQueriesContext(connection) as queries:
+            figures = compute_impact_figures()
+        # Read from the rollup, not the beneficiary and support tables
+        self.assertFalse([q['sql'] for q in queries if 'FROM "applications_beneficiary' in q['sql']])
+        self.assertEqual(figures['total_beneficiaries'], 3)
+        self.assertEqual(figures['total_programs'], 1)
+        self.assertEqual(figures['total_disbursed'], Decimal('402.00'))
+        self.assertEqual(
+            [figures[f'{t}_count'] for t in ('education', 'health', 'youth', 'housing')], [2, 1, 0, 0]
+        )
+        self.assertEqual((figures['male_count'], figures['female_count']), (1, 2))
+        self.assertEqual(figures['completed_count'], 1)
+        self.assertEqual(
+            [(program['pk'], program['beneficiary_count']) for program in figures['active_programs']],
+            [(self.program.pk, 3)],
+        )
+
+    def test_snapshot_is_reused_until_stale(self):
+        snapshot = get_impact_snapshot()
+        completed = Beneficiary.objects.get(status='completed')
+        completed.status = 'active'
+        completed.save()
+        Program.objects.create(
+            name='New Program', program_type='youth', description='d', eligibility_criteria='c',
+            start_date=timezone.now().date(), end_date=timezone.now().date(), is_active=True,
+        )
+        self.assertEqual(get_impact_snapshot().total_programs, 1)
+
+        # A stale snapshot is recomputed, from the rollup as the command last refreshed it
+        ImpactSnapshot.objects.update(computed_at=snapshot.computed_at - timedelta(hours=1))
+        stale_refreshed = get_impact_snapshot()
+        self.assertGreater(stale_refreshed.computed_at, snapshot.computed_at)
+        self.assertEqual((stale_refreshed.total_programs, stale_refreshed.total_beneficiaries), (2, 3))
+        self.assertTrue(ImpactRollupChange.objects.exists())
+
+        call_command('refresh_impact_snapshot', stdout=io.StringIO())
+        self.assertFalse(ImpactRollupChange.objects.exists())
+        self.assertEqual(get_impact_snapshot().total_beneficiaries, 4)
+        self.assertEqual(ImpactSnapshot.objects.count(), 1)
+
+    def test_listed_beneficiaries_follow_their_changes_at_once(self):
+        get_impact_snapshot()
+        hidden, renamed, deleted = Beneficiary.objects.filter(status='active').order_by('full_name')
+
+        hidden.show_on_website = False
+        hidden.save()
+        renamed.full_name = 'Person Renamed'
+        renamed.save()
+        deleted.delete()
+
+        self.assertEqual(
+            [entry['full_name'] for entry in get_impact_snapshot().recent_beneficiaries], ['Person Renamed']
+        )
+
+    def test_dashboard_reads_the_snapshot(self):
+        get_impact_snapshot()
+        url = reverse('applications:impact_dashboard')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(
+            [q['sql'] for q in queries if 'applications_' in q['sql'] and 'applications_impactsnapshot' not in q['sql']],
+            [],
+        )
+        self.assertEqual(response.context['total_beneficiaries'], 3)
+        self.assertEqual(response.context['active_programs'][0]['beneficiary_count'], 3)
+        self.assertEqual(
+            [beneficiary['full_name'] for beneficiary in response.context['recent_beneficiaries']],
+            ['Person 2', 'Person 1', 'Person 0'],
+        )
+        self.assertContains(response, 'Impact Program')
+
+
+class ImpactRollupTests(TestCase):
+    def setUp(self):
+        self.scholarships = self.create_program('Scholarships')
+        self.clinics = self.create_program('Clinics')
+        self.ada = self.create_beneficiary('Ada', self.scholarships, 'Enugu', 'Nsukka', 'female', 'education')
+        self.obi = self.create_beneficiary('Obi', self.scholarships, 'Enugu', 'Udi', 'male', 'education')
+        self.eze = self.create_beneficiary('Eze', self.clinics, 'Lagos', 'Ikeja', 'male', 'health')
+        self.support(self.ada, '100.00', date(2025, 1, 15))
+        self.support(self.ada, '50.00', date(2025, 2, 1))
+        self.support(self.eze, '25.00', date(2025, 2, 3))
+        refresh_impact_rollup()
+
+    def create_program(self, name):
+        return Program.objects.create(
+            name=name, program_type='scholarship', description='d', eligibility_criteria='c',
+            start_date=timezone.now().date(), end_date=timezone.now().date(),
+        )
+
+    def create_beneficiary(self, name, program, state, lga, gender, beneficiary_type):
+        return Beneficiary.objects.create(
+            full_name=name, program=program, state=state, lga=lga, gender=gender,
+            beneficiary_type=beneficiary_type, start_date=date(2025, 1, 10), status='active',
+        )
+
+    def support(self, beneficiary, amount, day):
+        return BeneficiarySupport.objects.create(
+            beneficiary=beneficiary, support_type='tuition', amount=Decimal(amount), description='Fees', date=day
+        )
+
+    def by(self, *dimensions, **filters):
+        return ImpactRollup.objects.filter(**filters).totals(*dimensions)
+
+    def assertMatchesFullRebuild(self):
+        incremental = set(ImpactRollup.objects.values_list(*ImpactRollup.DIMENSIONS, *ImpactRollup.MEASURES))
+        refresh_impact_rollup(full=True)
+        full = set(ImpactRollup.objects.values_list(*ImpactRollup.DIMENSIONS, *ImpactRollup.MEASURES))
+        self.assertEqual(incremental, full)
+
+    def test_slices(self):
+        totals = self.by()
+        self.assertEqual((totals['beneficiaries'], totals['supports']), (3, 3))
+        self.assertEqual(totals['amount_disbursed'], Decimal('175.00'))
+        self.assertEqual(
+            [(row['state'], row['beneficiaries'], row['amount_disbursed']) for row in self.by('state')],
+            [('Enugu', 2, Decimal('150.00')), ('Lagos', 1, Decimal('25.00'))],
+        )
+        february = self.by('lga', month=date(2025, 2, 1))
+        self.assertEqual([(row['lga'], row['amount_disbursed']) for row in february],
+                         [('Ikeja', Decimal('25.00')), ('Nsukka', Decimal('50.00'))])
+        self.assertEqual(self.by(gender='male')['beneficiaries'], 2)
+
+    def test_incremental_refresh_only_touches_changed_programs(self):
+        self.obi.state = 'Anambra'
+        self.obi.save()
+        self.assertEqual(
+            set(ImpactRollupChange.objects.values_list('program_id', flat=True)), {self.scholarships.pk}
+        )
+        clinic_cells = set(ImpactRollup.objects.filter(program=self.clinics).values_list('pk', flat=True))
+        self.assertEqual(refresh_impact_rollup(), 1)
+        self.assertEqual(set(ImpactRollup.objects.filter(program=self.clinics).values_list('pk', flat=True)),
+                         clinic_cells)
+        self.assertEqual(self.by(state='Anambra')['beneficiaries'], 1)
+        self.assertFalse(ImpactRollupChange.objects.exists())
+        self.assertEqual(refresh_impact_rollup(), 0)
+
+        # Status changes and unrelated edits
+        self.obi.notes = 'Visited'
+        self.obi.save()
+        self.assertFalse(ImpactRollupChange.objects.exists())
+        self.obi.status = 'completed'
+        self.obi.save()
+        refresh_impact_rollup()
+        self.assertEqual(self.by()['completed_beneficiaries'], 1)
+        self.assertMatchesFullRebuild()
+
+    def test_moves_and_deletes(self):
+        self.ada.program = self.clinics
+        self.ada.save()
+        refresh_impact_rollup()
+        self.assertEqual(self.by(program=self.clinics)['amount_disbursed'], Decimal('175.00'))
+        self.assertEqual(self.by(program=self.scholarships)['amount_disbursed'], 0)
+
+        support = BeneficiarySupport.objects.get(amount=Decimal('25.00'))
+        support.date = date(2025, 3, 1)
+        support.save()
+        refresh_impact_rollup()
+        self.assertEqual(self.by(month=date(2025, 3, 1))['supports'], 1)
+
+        support.delete()
+        self.eze.delete()
+        self.clinics.delete()
+        refresh_impact_rollup()
+        self.assertEqual(self.by()['beneficiaries'], 2)
+        self.assertEqual(self.by(program=None)['amount_disbursed'], Decimal('150.00'))
+        self.assertMatchesFullRebuild()
+
+
+class StatusDurationTests(TestCase):
+    def setUp(self):
+        self.reviewer = User.objects.create_user(email='turnaround@example.com', password='x', is_staff=True)
+        self.program = Program.objects.create(
+            name='Turnaround Program', program_type='scholarship', description='d', eligibility_criteria='c',
+            start_date=timezone.now().date(), end_date=timezone.now().date(),
+        )
+        self.start = timezone.make_aware(datetime(2025, 3, 1, 9, 0))
+
+    def create_application(self, index=0):
+        applicant = User.objects.create_user(email=f'turnaround{index}@example.com', password='x')
+        return Application.objects.create(
+            program=self.program, applicant=applicant, form_data={}, status='submitted', submitted_at=self.start
+        )
+
+    def change_status(self, application, status, hours):
+        with mock.patch('django.utils.timezone.now', return_value=self.start + timedelta(hours=hours)):
+            return ApplicationStatus.objects.create(application=application, status=status, created_by=self.reviewer)
+
+    def test_history_closes_and_opens_durations(self):
+        application = self.create_application()
+        self.change_status(application, 'submitted', 0)
+        self.change_status(application, 'under_review', 5)
+        self.change_status(application, 'approved', 53)
+
+        submitted, under_review = application.status_durations.order_by('started_at')
+        self.assertEqual((submitted.status, submitted.seconds), ('submitted', 5 * 3600))
+        self.assertEqual(submitted.reviewer, self.reviewer)
+        self.assertEqual((under_review.status, under_review.seconds), ('under_review', 48 * 3600))
+        self.assertEqual(under_review.ended_at, self.start + timedelta(hours=53))
+        self.assertEqual(application.status_durations.filter(ended_at__isnull=True).count(), 0)
+
+    def test_repeated_status_does_not_split_duration(self):
+        application = self.create_application()
+        self.change_status(application, 'under_review', 0)
+        self.change_status(application, 'under_review', 2)
+        self.change_status(application, 'rejected', 10)
+
+        self.assertEqual(
+            list(application.status_durations.values_list('status', 'seconds')), [('under_review', 10 * 3600)]
+        )
+
+    def test_bulk_update_status_records_durations(self):
+        applications = [self.create_application(i) for i in range(3)]
+        for application in applications:
+            self.change_status(application, 'submitted', 0)
+
+        bulk_update_status(Application.objects.all(), 'under_review', self.reviewer)
+
+        self.assertEqual(StatusDuration.objects.filter(status='submitted', seconds__isnull=False).count(), 3)
+        self.assertEqual(StatusDuration.objects.filter(status='under_review', ended_at__isnull=True).count(), 3)
+
+    def test_percentiles(self):
+        for i, hours in enumerate([1, 2, 3, 4, 100]):
+            application = self.create_application(i)
+            self.change_status(application, 'under_review', 0)
+            self.change_status(application, 'approved', hours)
+
+        result = turnaround_percentiles('under_review')
+        self.assertEqual(result['count'], 5)
+        self.assertEqual(result['p50'], timedelta(hours=3))
+        self.assertEqual(result['p90'], timedelta(hours=100))
+        self.assertEqual(turnaround_percentiles('additional_info'), {'count': 0, 'p50': None, 'p90': None, 'p99': None})
+        self.assertEqual(turnaround_percentiles('under_review', reviewer=self.reviewer)['count'], 5)
+
+    def test_rebuild_matches_incremental_durations(self):
+        for i in range(3):
+            application = self.create_application(i)
+            self.change_status(application, 'submitted', 0)
+            self.change_status(application, 'additional_info', i + 1)
+            self.change_status(application, 'under_review', i + 5)
+        fields = ('application', 'program', 'status', 'reviewer', 'started_at', 'ended_at', 'seconds')
+        incremental = set(StatusDuration.objects.values_list(*fields))
+
+        self.assertEqual(rebuild_status_durations(chunk_size=2), 3)
+        self.assertEqual(set(StatusDuration.objects.values_list(*fields)), incremental)
+
+    def test_analytics_view_reports_turnaround(self):
+        application = self.create_application()
+        self.change_status(application, 'submitted', 0)
+        self.change_status(application, 'under_review', 4)
+        self.change_status(application, 'approved', 10)
+        self.client.force_login(self.reviewer)
+
+        response = self.client.get(reverse('applications:analytics'))
+
+        self.assertEqual(response.status_code, 200)
+        turnaround = {row['status']: row for row in response.context['turnaround']}
+        self.assertEqual(turnaround['Submitted']['p50'], timedelta(hours=4))
+        self.assertEqual(turnaround['Under Review']['p50'], timedelta(hours=6))
+        self.assertEqual(response.context['avg_processing_time']['avg_time'], timedelta(hours=10))
+
+
+class BeneficiaryImportTests(TestCase):
+    HEADER = 'type,full_name,gender,phone,email,address,guardian_name,guardian_phone,program,start_date\n'
+
+    def setUp(self):
+        import_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, import_root)
+        storage = mock.patch.object(ImportJob._meta.get_field('file'), 'storage', FileSystemStorage(import_root))
+        storage.start()
+        self.addCleanup(storage.stop)
+        self.staff_user = User.objects.create_user(
+            email='importer@example.com', password='x', is_staff=True, is_superuser=True
+        )
+        self.program = Program.objects.create(
+            name='Scholarship 2024', program_type='scholarship', description='d', eligibility_criteria='c',
+            start_date=timezone.now().date(), end_date=timezone.now().date(),
+        )
+
+    def upload(self, rows):
+        return SimpleUploadedFile('beneficiaries.csv', ('\ufeff' + self.HEADER + rows).encode('utf-8'))
+
+    def run_import(self, rows, batch_size=2):
+        queue_import_job(self.staff_user, 'beneficiary', self.upload(rows))
+        return run_import_job(claim_import_job(), batch_size=batch_size)
+
+    def test_imports_valid_rows_in_batches(self):
+        rows = ''.join(
+            f'education,Student {i},female,080,s{i}@example.com,,,,scholarship 2024,2024-01-15\n' for i in range(5)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            job = self.run_import(rows)
+
+        self.assertEqual((job.status, job.total_rows, job.created_rows, job.failed_rows), ('completed', 5, 5, 0))
+        self.assertEqual(Beneficiary.objects.filter(program=self.program, start_date=date(2024, 1, 15)).count(), 5)
+        self.assertEqual(OutboundEmail.objects.filter(subject__startswith='Welcome to').count(), 5)
+        program_lookups = [q for q in queries.captured_queries if 'FROM "applications_program"' in q['sql']]
+        self.assertEqual(len(program_lookups), 1)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "applications_beneficiary"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_rejected_rows_are_reported(self):
+        rows = (
+            'education,Good Row,male,,,,,,,\n'
+            'education,,male,,,,,,,\n'
+            'education,Bad Gender,other,,,,,,,\n'
+            'health,Unknown Program,female,,,,,,Nursing,\n'
+            'education,Bad Date,male,,,,,,,15/01/2024\n'
+        )
+        job = self.run_import(rows)
+
+        self.assertEqual((job.created_rows, job.failed_rows), (1, 4))
+        self.assertEqual(Beneficiary.objects.get().full_name, 'Good Row')
+        row_errors = list(job.row_errors.all())
+        self.assertEqual([error.row for error in row_errors], [3, 4, 5, 6])
+        self.assertIn('full_name', row_errors[0].message)
+        self.assertIn('No program matches "Nursing"', row_errors[2].message)
+        self.assertEqual(row_errors[1].values['full_name'], 'Bad Gender')
+
+    def test_admin_upload_queues_job_and_reports_progress(self):
+        self.client.force_login(self.staff_user)
+        rows = 'education,Ada,female,,,,,,,\neducation,,female,,,,,,,\n'
+
+        response = self.client.post(reverse('admin:beneficiary_bulk_upload'), {'csv_file': self.upload(rows)})
+
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, f"{reverse('admin:beneficiary_bulk_upload')}?job={job.pk}")
+        self.assertEqual((job.kind, job.status, job.original_name), ('beneficiary', 'queued', 'beneficiaries.csv'))
+        self.assertEqual(Beneficiary.objects.count(), 0)
+
+        run_import_job(claim_import_job())
+        page = self.client.get(reverse('admin:beneficiary_bulk_upload'), {'job': job.pk})
+        self.assertEqual(page.context['job_status']['created_rows'], 1)
+        report = self.client.get(page.context['job_status']['error_report_url'])
+        self.assertIn('This field cannot be blank.', b''.join(report.streaming_content).decode())
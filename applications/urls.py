@@ -13,6 +13,9 @@ urlpatterns = [
     path('applications/<int:pk>/', views.application_detail, name='application_detail'),
     path('applications/<int:pk>/review/', views.application_review, name='application_review'),
     path('applications/export/', views.export_applications, name='export_applications'),
+    path('applications/export/jobs/<int:pk>/', views.export_job_detail, name='export_job_detail'),
+    path('applications/export/jobs/<int:pk>/status/', views.export_job_status, name='export_job_status'),
+    path('applications/export/jobs/<int:pk>/download/', views.export_job_download, name='export_job_download'),
 
     # Dashboard
     path('dashboard/', views.user_dashboard, name='user_dashboard'),
@@ -1,7 +1,44 @@
+import logging
+import math
+import socket
+import uuid
+from collections import Counter
+from datetime import timedelta
+
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncMonth
 from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Application, ApplicationStatus, Beneficiary, BeneficiarySupport, EducationProfile, HealthProfile,
+    HousingProfile, NotificationPreference, OutboundEmail, ImpactRollup, ImpactRollupChange, ImpactSnapshot,
+    Program, ProgramStats, StatusDuration, YouthProfile
+)
+from .showcase import bump_showcase_version
+
+logger = logging.getLogger(__name__)
+
+
+def queue_mail(subject, message, from_email, recipient_list, html_message=None):
+    """
+    Store an email in the outbox instead of talking to the mail server.
+
+    Takes the same arguments as ``send_mail``; the ``send_queued_email``
+    management command delivers the row later.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
 
 
 def send_welcome_email(user, verification_token=None):
@@ -22,13 +59,12 @@ def send_welcome_email(user, verification_token=None):
     subject = f'Welcome to {getattr(settings, "SITE_NAME", "HEO Eziokwu Foundation")}'
     html_message = render_to_string('users/emails/welcome.html', context)
 
-    send_mail(
+    queue_mail(
         subject=subject,
         message=f"Welcome to HEO Eziokwu Foundation! Please verify your email at {verification_url}",
         from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@heoeziokwufoundation.org'),
         recipient_list=[user.email],
         html_message=html_message,
-        fail_silently=True,
     )
 
 
@@ -45,13 +81,12 @@ def send_verification_email(user, verification_token):
     subject = 'Verify Your Email Address'
     html_message = render_to_string('users/emails/verify_email.html', context)
 
-    send_mail(
+    queue_mail(
         subject=subject,
         message=f"Please verify your email at {verification_url}",
         from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@heoeziokwufoundation.org'),
         recipient_list=[user.email],
         html_message=html_message,
-        fail_silently=True,
     )
 
 
@@ -67,13 +102,12 @@ def send_application_submitted(application):
     subject = f'Application Received: {application.program.name}'
     html_message = render_to_string('applications/emails/application_submitted.html', context)
 
-    send_mail(
+    queue_mail(
         subject=subject,
         message=f"Your application for {application.program.name} has been received. Application ID: #{application.id}",
         from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@heoeziokwufoundation.org'),
         recipient_list=[application.applicant.email],
         html_message=html_message,
-        fail_silently=True,
     )
 
 
@@ -90,21 +124,17 @@ def send_new_application_to_admin(application):
     subject = f'New Application: {application.program.name} - #{application.id}'
     html_message = render_to_string('applications/emails/new_application_admin.html', context)
 
-    send_mail(
+    queue_mail(
         subject=subject,
         message=f"New application received for {application.program.name} from {application.applicant.email}. Application ID: #{application.id}",
         from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@heoeziokwufoundation.org'),
         recipient_list=[admin_email],
         html_message=html_message,
-        fail_silently=True,
     )
 
 
-def send_beneficiary_welcome(beneficiary):
-    """Send welcome email to new beneficiary"""
-    if not beneficiary.email:
-        return
-
+def build_beneficiary_welcome_email(beneficiary):
+    """Render the welcome email of a new beneficiary as an unsaved outbox row"""
     context = {
         'beneficiary': beneficiary,
     }
@@ -112,16 +142,22 @@ def send_beneficiary_welcome(beneficiary):
     subject = f'Welcome to {beneficiary.program.name} - HEO Eziokwu Foundation'
     html_message = render_to_string('applications/emails/beneficiary_welcome.html', context)
 
-    send_mail(
+    return OutboundEmail(
         subject=subject,
-        message=f"Congratulations! You have been accepted as a beneficiary of the {beneficiary.program.name} program.",
+        body=f"Congratulations! You have been accepted as a beneficiary of the {beneficiary.program.name} program.",
+        html_body=html_message,
         from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@heoeziokwufoundation.org'),
-        recipient_list=[beneficiary.email],
-        html_message=html_message,
-        fail_silently=True,
+        recipients=[beneficiary.email],
     )
 
 
+def send_beneficiary_welcome(beneficiary):
+    """Send welcome email to new beneficiary"""
+    if not beneficiary.email:
+        return
+    build_beneficiary_welcome_email(beneficiary).save()
+
+
 def send_support_notification(support):
     """Notify beneficiary of support disbursement"""
     beneficiary = support.beneficiary
@@ -135,13 +171,12 @@ def send_support_notification(support):
     subject = f'Support Disbursement: {support.get_support_type_display()}'
     html_message = render_to_string('applications/emails/support_notification.html', context)
 
-    send_mail(
+    queue_mail(
         subject=subject,
         message=f"Support has been disbursed on your behalf. Type: {support.get_support_type_display()}, Amount: ₦{support.amount}",
         from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@heoeziokwufoundation.org'),
         recipient_list=[beneficiary.email],
         html_message=html_message,
-        fail_silently=True,
     )
 
 def send_application_status_update(status_update):
@@ -168,13 +203,20 @@ def send_application_status_update(status_update):
     
     # Check if the user has enabled email notifications for status changes
     try:
-        preferences = applicant.notification_preference
+        preferences = applicant.notificationpreference
         if not preferences.email_on_status_change:
             return  # User has disabled notifications for status changes
-    except:
+    except NotificationPreference.DoesNotExist:
         # If preferences don't exist, proceed with sending email
         pass
-    
+
+    build_status_update_email(application, status, notes).save()
+
+
+def build_status_update_email(application, status, notes):
+    """Render the status update email for an application as an unsaved outbox row"""
+    applicant = application.applicant
+
     # Get the site URL from settings, with a fallback
     site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
     
@@ -190,13 +232,700 @@ def send_application_status_update(status_update):
     subject = f'Update on your application for {application.program.name}'
     html_message = render_to_string('applications/emails/status_update.html', context)
     plain_message = render_to_string('applications/emails/status_update_plain.html', context)
-    
-    # Send the email
-    send_mail(
+
+    return OutboundEmail(
         subject=subject,
-        message=plain_message,
+        body=plain_message,
+        html_body=html_message,
         from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[applicant.email],
-        html_message=html_message,
-        fail_silently=True,
-    )
\ No newline at end of file
+        recipients=[applicant.email],
+    )
+
+
+def bulk_update_status(applications, status, user, notes=''):
+    """
+    Move a queryset of applications to ``status`` with a fixed number of queries.
+
+    Runs one UPDATE on the applications, one bulk INSERT of ApplicationStatus
+    history rows (plus the matching StatusDuration writes) and one bulk INSERT
+    into the email outbox, regardless of how many applications are selected.
+    Model save signals are not fired. Applications already in ``status`` are
+    left untouched.
+
+    Returns the list of applications that changed status.
+    """
+    with transaction.atomic():
+        changed = list(
+            applications.exclude(status=status).select_related('program', 'applicant')
+        )
+        if not changed:
+            return []
+
+        Application.objects.filter(pk__in=[app.pk for app in changed]).update(
+            status=status,
+            reviewed_by=user,
+            updated_at=timezone.now(),
+        )
+
+        history = ApplicationStatus.objects.bulk_create([
+            ApplicationStatus(application=app, status=status, notes=notes, created_by=user)
+            for app in changed
+        ], batch_size=500)
+        record_status_changes(history)
+
+        deltas = Counter()
+        for app in changed:
+            deltas[app.program_id, app.status] -= 1
+            deltas[app.program_id, status] += 1
+            app.status = status
+            app.reviewed_by = user
+        for program_id in {program_id for program_id, _ in deltas}:
+            adjust_program_stats(program_id, {
+                app_status: delta for (pid, app_status), delta in deltas.items() if pid == program_id
+            })
+
+        queue_status_update_emails(changed, status, notes)
+
+    return changed
+
+
+# Beneficiary type of the applicants of each program type
+PROGRAM_BENEFICIARY_TYPES = {
+    'scholarship': 'education',
+    'healthcare': 'health',
+    'youth': 'youth',
+    'housing': 'housing',
+    'other': 'education',  # Default
+}
+
+# Empty type-specific profile of a new beneficiary, filled in by staff later
+PROFILE_STUBS = {
+    'education': lambda beneficiary: EducationProfile(beneficiary=beneficiary),
+    'health': lambda beneficiary: HealthProfile(beneficiary=beneficiary, treatment_start_date=beneficiary.start_date),
+    'youth': lambda beneficiary: YouthProfile(beneficiary=beneficiary, training_start_date=beneficiary.start_date),
+    'housing': lambda beneficiary: HousingProfile(beneficiary=beneficiary),
+}
+
+
+def build_beneficiary(application, beneficiary_type, created_by):
+    """An unsaved Beneficiary for an approved application, with its program and applicant fetched"""
+    if not beneficiary_type:
+        beneficiary_type = PROGRAM_BENEFICIARY_TYPES.get(application.program.program_type, 'education')
+
+    applicant = application.applicant
+    form_data = application.form_data or {}
+
+    return Beneficiary(
+        beneficiary_type=beneficiary_type,
+        application=application,
+        program=application.program,
+        user=applicant,
+        full_name=applicant.get_full_name() or form_data.get('full_name', applicant.email),
+        date_of_birth=applicant.date_of_birth,
+        gender=form_data.get('gender', 'male'),
+        phone_number=applicant.phone_number or form_data.get('phone_number', ''),
+        email=applicant.email,
+        address=applicant.address or form_data.get('address', ''),
+        guardian_name=form_data.get('guardian_name', ''),
+        guardian_phone=form_data.get('guardian_phone', ''),
+        status='active',
+        start_date=timezone.now().date(),
+        created_by=created_by,
+    )
+
+
+def beneficiaries_bulk_created(beneficiaries):
+    """
+    What the Beneficiary save signals do, for rows inserted with bulk_create.
+
+    Queues the welcome emails in one INSERT, invalidates the showcase pages
+    of the types involved and queues the impact rollup of their programs.
+    """
+    OutboundEmail.objects.bulk_create([
+        build_beneficiary_welcome_email(beneficiary)
+        for beneficiary in beneficiaries
+        if beneficiary.email and beneficiary.program_id
+    ], batch_size=500)
+    bump_showcase_version(*{beneficiary.beneficiary_type for beneficiary in beneficiaries})
+    mark_rollup_changed({beneficiary.program_id for beneficiary in beneficiaries})
+
+
+def create_beneficiaries(applications, created_by, beneficiary_type=None):
+    """
+    Create the beneficiaries of approved applications with bulk INSERTs.
+
+    ``applications`` should have ``program`` and ``applicant`` fetched.
+    Applications that already have a beneficiary are skipped. Each new
+    beneficiary gets a profile stub for its type. Save signals are not
+    fired; ``beneficiaries_bulk_created`` does their work once for the
+    whole batch. Returns the new beneficiaries.
+    """
+    applications = list(applications)
+    existing = set(
+        Beneficiary.objects.filter(application_id__in=[app.pk for app in applications])
+        .values_list('application_id', flat=True)
+    )
+    beneficiaries = [
+        build_beneficiary(app, beneficiary_type, created_by)
+        for app in applications
+        if app.pk not in existing
+    ]
+    if not beneficiaries:
+        return []
+
+    with transaction.atomic():
+        Beneficiary.objects.bulk_create(beneficiaries, batch_size=500)
+        if beneficiaries[0].pk is None:
+            # MySQL does not return the new keys; the application link is unique
+            pks = dict(
+                Beneficiary.objects.filter(application_id__in=[b.application_id for b in beneficiaries])
+                .values_list('application_id', 'pk')
+            )
+            for beneficiary in beneficiaries:
+                beneficiary.pk = pks[beneficiary.application_id]
+                beneficiary._state.adding = False
+
+        profiles = {}
+        for beneficiary in beneficiaries:
+            profile = PROFILE_STUBS[beneficiary.beneficiary_type](beneficiary)
+            profiles.setdefault(type(profile), []).append(profile)
+        for model, stubs in profiles.items():
+            model.objects.bulk_create(stubs, batch_size=500)
+
+        beneficiaries_bulk_created(beneficiaries)
+
+    return beneficiaries
+
+
+def approve_applications(applications, user, notes='', beneficiary_type=None):
+    """
+    Approve a queryset of applications and create their beneficiaries in one transaction.
+
+    Returns the ``(approved, beneficiaries)`` lists.
+    """
+    with transaction.atomic():
+        approved = bulk_update_status(applications, 'approved', user, notes=notes)
+        beneficiaries = create_beneficiaries(approved, user, beneficiary_type)
+    return approved, beneficiaries
+
+
+def adjust_program_stats(program_id, deltas, rebuild_missing=True):
+    """
+    Add ``deltas`` (``{status: change}``) to a program's ProgramStats row.
+
+    The counters are updated with ``F()`` expressions so concurrent changes
+    do not overwrite each other. A missing row is rebuilt from the
+    applications table unless ``rebuild_missing`` is False.
+    """
+    updates = {status: F(status) + delta for status, delta in deltas.items() if delta}
+    if not updates:
+        return
+    if not ProgramStats.objects.filter(program_id=program_id).update(updated_at=timezone.now(), **updates):
+        if rebuild_missing:
+            rebuild_program_stats([program_id])
+
+
+def rebuild_program_stats(program_ids=None, chunk_size=100):
+    """
+    Recompute ProgramStats from the applications table, ``chunk_size`` programs at a time.
+
+    Each chunk locks its stats rows while it counts, so deltas applied in the
+    meantime wait instead of being lost. Returns the number of rows that were
+    missing or wrong.
+    """
+    if program_ids is None:
+        program_ids = Program.objects.order_by('pk').values_list('pk', flat=True)
+    program_ids = list(program_ids)
+
+    fixed = 0
+    for start in range(0, len(program_ids), chunk_size):
+        chunk = program_ids[start:start + chunk_size]
+        with transaction.atomic():
+            existing = ProgramStats.objects.select_for_update().in_bulk(chunk)
+            fresh = {pk: ProgramStats(program_id=pk) for pk in chunk}
+            counts = (Application.objects.filter(program_id__in=chunk)
+                      .values('program_id', 'status').annotate(n=Count('id')).order_by())
+            for row in counts:
+                if row['status'] in ProgramStats.STATUS_FIELDS:
+                    setattr(fresh[row['program_id']], row['status'], row['n'])
+
+            now = timezone.now()
+            stale, missing = [], []
+            for pk, stats in fresh.items():
+                stats.updated_at = now
+                current = existing.get(pk)
+                if current is None:
+                    missing.append(stats)
+                elif any(getattr(current, f) != getattr(stats, f) for f in ProgramStats.STATUS_FIELDS):
+                    stale.append(stats)
+            if stale:
+                ProgramStats.objects.bulk_update(stale, [*ProgramStats.STATUS_FIELDS, 'updated_at'])
+            if missing:
+                # Skip programs deleted since the ids were read
+                live = set(Program.objects.filter(pk__in=[m.program_id for m in missing]).values_list('pk', flat=True))
+                missing = [m for m in missing if m.program_id in live]
+                ProgramStats.objects.bulk_create(missing, ignore_conflicts=True)
+            fixed += len(stale) + len(missing)
+    return fixed
+
+
+def program_stats_totals():
+    """Application counts by status summed over all programs, plus ``total`` and ``pending``"""
+    totals = ProgramStats.objects.aggregate(**{status: Sum(status) for status in ProgramStats.STATUS_FIELDS})
+    totals = {status: count or 0 for status, count in totals.items()}
+    totals['total'] = sum(totals.values())
+    totals['pending'] = totals['submitted'] + totals['under_review']
+    return totals
+
+
+def adjust_support_total(beneficiary_id, delta):
+    """Add ``delta`` to a beneficiary's stored total_support_amount in the database"""
+    if beneficiary_id and delta:
+        Beneficiary.objects.filter(pk=beneficiary_id).update(
+            total_support_amount=F('total_support_amount') + delta
+        )
+
+
+def support_total_mismatches(chunk_size=1000):
+    """
+    Yield ``(beneficiary_id, stored, actual)`` for every beneficiary whose
+    stored total_support_amount differs from the sum of its support records.
+
+    Beneficiaries are compared ``chunk_size`` at a time in primary-key order.
+    """
+    totals = (BeneficiarySupport.objects.filter(beneficiary=OuterRef('pk'))
+              .order_by().values('beneficiary').annotate(total=Sum('amount')).values('total'))
+    beneficiaries = Beneficiary.objects.order_by('pk').annotate(actual=Subquery(totals))
+    last_pk = 0
+    while True:
+        chunk = list(beneficiaries.filter(pk__gt=last_pk).values_list('pk', 'total_support_amount', 'actual')[:chunk_size])
+        for pk, stored, actual in chunk:
+            actual = actual or 0
+            if stored != actual:
+                yield pk, stored, actual
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1][0]
+
+
+def sync_support_totals(chunk_size=1000):
+    """Recompute every wrong total_support_amount; returns the number of beneficiaries fixed"""
+    fixed = 0
+    for pk, stored, actual in list(support_total_mismatches(chunk_size)):
+        with transaction.atomic():
+            # Lock the row and recount so a concurrent delta is not overwritten
+            beneficiary = Beneficiary.objects.select_for_update().get(pk=pk)
+            Beneficiary.objects.filter(pk=pk).update(total_support_amount=beneficiary.recalculate_support_amount())
+        fixed += 1
+    return fixed
+
+
+def record_status_changes(status_updates):
+    """
+    Apply new ApplicationStatus rows to the StatusDuration table.
+
+    Each row closes its application's open stretch (unless the status is
+    unchanged) and opens one for a tracked status. Runs a fixed number of
+    queries however many rows are given.
+    """
+    status_updates = sorted(status_updates, key=lambda update: (update.created_at, update.pk or 0))
+    if not status_updates:
+        return
+    application_ids = {update.application_id for update in status_updates}
+    open_durations = {
+        duration.application_id: duration
+        for duration in StatusDuration.objects.filter(application_id__in=application_ids, ended_at__isnull=True)
+    }
+    programs = dict(Application.objects.filter(pk__in=application_ids).values_list('pk', 'program_id'))
+
+    closed, opened = [], []
+    for update in status_updates:
+        current = open_durations.get(update.application_id)
+        if current is not None:
+            if current.status == update.status:
+                continue
+            current.ended_at = update.created_at
+            current.seconds = max(int((update.created_at - current.started_at).total_seconds()), 0)
+            current.reviewer_id = update.created_by_id
+            del open_durations[update.application_id]
+            if current.pk:
+                closed.append(current)
+        if update.status in StatusDuration.TRACKED_STATUSES and update.application_id in programs:
+            duration = StatusDuration(
+                application_id=update.application_id, program_id=programs[update.application_id],
+                status=update.status, started_at=update.created_at,
+            )
+            open_durations[update.application_id] = duration
+            opened.append(duration)
+
+    if closed:
+        StatusDuration.objects.bulk_update(closed, ['ended_at', 'seconds', 'reviewer'])
+    if opened:
+        StatusDuration.objects.bulk_create(opened, batch_size=500)
+
+
+def rebuild_status_durations(chunk_size=500):
+    """Recompute StatusDuration from the full status history, ``chunk_size`` applications at a time"""
+    rebuilt = 0
+    last_pk = 0
+    while True:
+        ids = list(Application.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return rebuilt
+        with transaction.atomic():
+            StatusDuration.objects.filter(application_id__in=ids).delete()
+            record_status_changes(ApplicationStatus.objects.filter(application_id__in=ids).order_by())
+        rebuilt += len(ids)
+        last_pk = ids[-1]
+
+
+def turnaround_percentiles(status, percentiles=(50, 90, 99), **filters):
+    """
+    Nearest-rank percentiles of the completed time spent in ``status``.
+
+    ``filters`` narrow the stretches, e.g. ``program=...`` or
+    ``reviewer=...``. Returns ``{'count': n, 'p50': timedelta, ...}``; each
+    percentile is one indexed lookup.
+    """
+    durations = StatusDuration.objects.filter(status=status, seconds__isnull=False, **filters)
+    count = durations.count()
+    ordered = durations.order_by('seconds').values_list('seconds', flat=True)
+    result = {'count': count}
+    for percentile in percentiles:
+        rank = max(math.ceil(percentile * count / 100), 1)
+        result[f'p{percentile}'] = timedelta(seconds=ordered[rank - 1]) if count else None
+    return result
+
+
+def mark_rollup_changed(program_ids):
+    """Queue the rollup cells of these programs (None for no program) for recomputation"""
+    ImpactRollupChange.objects.bulk_create(
+        [ImpactRollupChange(program_id=program_id) for program_id in set(program_ids)]
+    )
+
+
+def mark_rollup_changed_for_beneficiaries(beneficiary_ids):
+    mark_rollup_changed(
+        Beneficiary.objects.filter(pk__in=set(beneficiary_ids)).values_list('program_id', flat=True)
+    )
+
+
+def rollup_cells(program_id):
+    """Freshly computed ImpactRollup cells of one program (None for no program)"""
+    dimensions = ('beneficiary_type', 'state', 'lga', 'gender')
+    cells = {}
+
+    def cell(row, prefix=''):
+        key = tuple(row[prefix + d] for d in dimensions) + (row['month'],)
+        if key not in cells:
+            cells[key] = ImpactRollup(program_id=program_id, month=row['month'], **{
+                d: row[prefix + d] for d in dimensions
+            })
+        return cells[key]
+
+    beneficiaries = (
+        Beneficiary.objects.filter(program_id=program_id).order_by()
+        .annotate(month=TruncMonth('start_date')).values(*dimensions, 'month')
+        .annotate(
+            n=Count('pk'),
+            active=Count('pk', filter=Q(status='active')),
+            completed=Count('pk', filter=Q(status='completed')),
+        )
+    )
+    for row in beneficiaries:
+        rollup = cell(row)
+        rollup.beneficiaries = row['n']
+        rollup.active_beneficiaries = row['active']
+        rollup.completed_beneficiaries = row['completed']
+
+    supports = (
+        BeneficiarySupport.objects.filter(beneficiary__program_id=program_id).order_by()
+        .annotate(month=TruncMonth('date')).values(*[f'beneficiary__{d}' for d in dimensions], 'month')
+        .annotate(n=Count('pk'), amount=Sum('amount'))
+    )
+    for row in supports:
+        rollup = cell(row, prefix='beneficiary__')
+        rollup.supports = row['n']
+        rollup.amount_disbursed = row['amount']
+
+    return list(cells.values())
+
+
+def refresh_impact_rollup(full=False):
+    """
+    Recompute the rollup cells of the programs changed since the last refresh.
+
+    The highest queued change id is the watermark: the programs named up to
+    it are recomputed and those changes removed, while changes queued in
+    the meantime wait for the next run. With ``full`` every program is
+    recomputed. Returns the number of programs refreshed.
+
+    Run by the ``refresh_impact_rollup`` command, never in a request.
+    """
+    with transaction.atomic():
+        watermark = ImpactRollupChange.objects.aggregate(Max('pk'))['pk__max']
+        if watermark is not None:
+            # An overlapping run waits here until this one has removed the changes
+            list(ImpactRollupChange.objects.select_for_update().filter(pk__lte=watermark).values_list('pk'))
+        if full:
+            program_ids = [*Program.objects.values_list('pk', flat=True), None]
+            ImpactRollup.objects.all().delete()
+        elif watermark is None:
+            return 0
+        else:
+            program_ids = set(
+                ImpactRollupChange.objects.filter(pk__lte=watermark).values_list('program_id', flat=True)
+            )
+
+        for program_id in program_ids:
+            cells = rollup_cells(program_id)
+            if not full:
+                ImpactRollup.objects.filter(program_id=program_id).delete()
+            ImpactRollup.objects.bulk_create(cells, batch_size=500)
+
+        if watermark is not None:
+            ImpactRollupChange.objects.filter(pk__lte=watermark).delete()
+    return len(program_ids)
+
+
+# Entries of the impact page lists kept in the snapshot
+IMPACT_PROGRAMS_SHOWN = 6
+IMPACT_RECENT_BENEFICIARIES = 8
+
+# Held while a request recomputes a stale snapshot, so others keep serving the old one
+IMPACT_REFRESH_LOCK = 'impact_snapshot_refresh'
+
+
+def compute_impact_figures():
+    """
+    The impact page figures, read from the rollup as last refreshed: one
+    conditional aggregation over the cells plus the active programs.
+    """
+    by_type = {
+        f'{beneficiary_type}_count': Sum('active_beneficiaries', filter=Q(beneficiary_type=beneficiary_type), default=0)
+        for beneficiary_type, label in Beneficiary.BENEFICIARY_TYPES
+    }
+    figures = ImpactRollup.objects.aggregate(
+        total_beneficiaries=Sum('active_beneficiaries', default=0),
+        completed_count=Sum('completed_beneficiaries', default=0),
+        total_disbursed=Sum('amount_disbursed', default=0),
+        male_count=Sum('active_beneficiaries', filter=Q(gender='male'), default=0),
+        female_count=Sum('active_beneficiaries', filter=Q(gender='female'), default=0),
+        **by_type,
+    )
+
+    programs = list(Program.objects.filter(is_active=True).values('pk', 'name', 'program_type', 'description'))
+    counts = {
+        row['program']: row['active_beneficiaries']
+        for row in ImpactRollup.objects.filter(program__is_active=True).totals('program')
+    }
+    program_types = dict(Program.PROGRAM_TYPES)
+    figures['total_programs'] = len(programs)
+    figures['active_programs'] = [
+        {
+            **program,
+            'program_type_display': program_types.get(program['program_type'], program['program_type']),
+            'beneficiary_count': counts.get(program['pk'], 0),
+        }
+        for program in programs[:IMPACT_PROGRAMS_SHOWN]
+    ]
+    return figures
+
+
+def recent_impact_beneficiaries():
+    """The latest active beneficiaries shown on the website, as the impact page lists them"""
+    beneficiaries = Beneficiary.objects.filter(
+        show_on_website=True, status='active'
+    ).select_related('program').order_by('-created_at')[:IMPACT_RECENT_BENEFICIARIES]
+    return [impact_beneficiary_entry(beneficiary) for beneficiary in beneficiaries]
+
+
+def impact_beneficiary_entry(beneficiary):
+    return {
+        'pk': beneficiary.pk,
+        'full_name': beneficiary.full_name,
+        'photo_url': beneficiary.photo.url if beneficiary.photo else '',
+        'program_name': beneficiary.program.name if beneficiary.program else '',
+        'beneficiary_type': beneficiary.beneficiary_type,
+        'beneficiary_type_display': beneficiary.get_beneficiary_type_display(),
+    }
+
+
+def update_impact_beneficiary(beneficiary, deleted=False):
+    """
+    Bring the snapshot's entry for ``beneficiary``, if it has one, up to date.
+
+    Personal details are not left to the next refresh: an entry is removed
+    as soon as the beneficiary is deleted, hidden from the website or no
+    longer active, and otherwise rewritten with their current details.
+    """
+    with transaction.atomic():
+        snapshot = ImpactSnapshot.objects.select_for_update().filter(pk=1).first()
+        if snapshot is None or not any(entry['pk'] == beneficiary.pk for entry in snapshot.recent_beneficiaries):
+            return
+        shown = not deleted and beneficiary.show_on_website and beneficiary.status == 'active'
+        snapshot.recent_beneficiaries = [
+            impact_beneficiary_entry(beneficiary) if entry['pk'] == beneficiary.pk else entry
+            for entry in snapshot.recent_beneficiaries
+            if shown or entry['pk'] != beneficiary.pk
+        ]
+        snapshot.save(update_fields=['recent_beneficiaries'])
+
+
+def refresh_impact_snapshot():
+    """Recompute the impact page contents and store them as the current snapshot"""
+    figures = compute_impact_figures()
+    snapshot, created = ImpactSnapshot.objects.update_or_create(pk=1, defaults={
+        **figures, 'recent_beneficiaries': recent_impact_beneficiaries(), 'computed_at': timezone.now(),
+    })
+    return snapshot
+
+
+def get_impact_snapshot(max_age=None):
+    """
+    The current impact snapshot, recomputed first if it is older than
+    ``max_age`` seconds (IMPACT_SNAPSHOT_MAX_AGE by default).
+
+    Only one request recomputes a stale snapshot at a time; the others serve
+    it as it is meanwhile. The rollup it reads is refreshed by the command.
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'IMPACT_SNAPSHOT_MAX_AGE', 60 * 10)
+    snapshot = ImpactSnapshot.objects.filter(pk=1).first()
+    if snapshot is None:
+        return refresh_impact_snapshot()
+    if not snapshot.is_fresh(max_age) and cache.add(IMPACT_REFRESH_LOCK, True, 60):
+        try:
+            snapshot = refresh_impact_snapshot()
+        finally:
+            cache.delete(IMPACT_REFRESH_LOCK)
+    return snapshot
+
+
+def queue_status_update_emails(applications, status, notes):
+    """Queue status update emails for many applications in one INSERT"""
+    opted_out = set(
+        NotificationPreference.objects.filter(
+            user_id__in={app.applicant_id for app in applications},
+            email_on_status_change=False,
+        ).values_list('user_id', flat=True)
+    )
+    OutboundEmail.objects.bulk_create([
+        build_status_update_email(app, status, notes)
+        for app in applications
+        if app.applicant_id not in opted_out
+    ], batch_size=500)
+
+
+def claim_queued_emails(batch_size=None):
+    """
+    Reserve a batch of due outbox rows for this worker.
+
+    Rows stuck in ``sending`` for longer than EMAIL_OUTBOX_CLAIM_TIMEOUT
+    (a worker died mid-batch) are put back in the queue first.
+    """
+    batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+    claim_timeout = getattr(settings, 'EMAIL_OUTBOX_CLAIM_TIMEOUT', 600)
+    now = timezone.now()
+
+    OutboundEmail.objects.filter(
+        status='sending',
+        claimed_at__lt=now - timedelta(seconds=claim_timeout)
+    ).update(status='pending', claimed_by='')
+
+    due_ids = list(
+        OutboundEmail.objects.filter(status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not due_ids:
+        return []
+
+    # The status check in the UPDATE makes the claim safe when several
+    # workers race for the same rows: each row ends up with one token.
+    token = f"{socket.gethostname()}:{uuid.uuid4().hex[:12]}"[:64]
+    OutboundEmail.objects.filter(id__in=due_ids, status='pending').update(
+        status='sending', claimed_by=token, claimed_at=now
+    )
+    return list(OutboundEmail.objects.filter(claimed_by=token, status='sending'))
+
+
+def send_queued_emails(batch_size=None, max_attempts=None, connection=None):
+    """
+    Deliver one batch of queued emails over a single mail connection.
+
+    Failed messages are retried with exponential backoff
+    (EMAIL_OUTBOX_RETRY_DELAY * 2 ** attempts seconds) until
+    EMAIL_OUTBOX_MAX_ATTEMPTS is reached, then marked ``failed``.
+    Returns a ``(sent, failed)`` tuple for the batch.
+    """
+    max_attempts = max_attempts or getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    batch = claim_queued_emails(batch_size)
+    if not batch:
+        return 0, 0
+
+    connection = connection or get_connection()
+    sent_ids = []
+    failures = []
+
+    try:
+        connection.open()
+    except Exception as e:
+        # Server unreachable: the whole batch goes back with backoff
+        failures = [(email, e) for email in batch]
+    else:
+        try:
+            for email in batch:
+                message = EmailMultiAlternatives(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email,
+                    to=email.recipients,
+                    connection=connection,
+                )
+                if email.html_body:
+                    message.attach_alternative(email.html_body, 'text/html')
+                try:
+                    message.send()
+                except Exception as e:
+                    failures.append((email, e))
+                else:
+                    sent_ids.append(email.pk)
+        finally:
+            connection.close()
+
+    now = timezone.now()
+    if sent_ids:
+        OutboundEmail.objects.filter(pk__in=sent_ids).update(
+            status='sent', sent_at=now, attempts=F('attempts') + 1,
+            last_error='', claimed_by='',
+        )
+
+    retry_delay = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+    for email, error in failures:
+        attempts = email.attempts + 1
+        if attempts >= max_attempts:
+            status, next_attempt_at = 'failed', email.next_attempt_at
+        else:
+            status = 'pending'
+            next_attempt_at = now + timedelta(seconds=retry_delay * 2 ** (attempts - 1))
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            status=status, attempts=attempts, last_error=str(error),
+            next_attempt_at=next_attempt_at, claimed_by='',
+        )
+        logger.warning("Email %s failed (attempt %s): %s", email.pk, attempts, error)
+
+    return len(sent_ids), len(failures)
+
+
+def outbox_stats():
+    """Queue depth and throughput counters for the email outbox"""
+    now = timezone.now()
+    return OutboundEmail.objects.aggregate(
+        pending=Count('id', filter=Q(status='pending')),
+        due=Count('id', filter=Q(status='pending', next_attempt_at__lte=now)),
+        sending=Count('id', filter=Q(status='sending')),
+        failed=Count('id', filter=Q(status='failed')),
+        sent_last_hour=Count('id', filter=Q(status='sent', sent_at__gte=now - timedelta(hours=1))),
+        sent_last_day=Count('id', filter=Q(status='sent', sent_at__gte=now - timedelta(days=1))),
+    )
@@ -4,29 +4,39 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django_filters.views import FilterView
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from .filters import ApplicationFilter
-import csv
-from openpyxl import Workbook
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
-import io
-from django.http import HttpResponse
+from core.pagination import KeysetPaginationMixin
+import tempfile
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.generic import ListView, DetailView, TemplateView
 from django.views.generic.edit import CreateView
 from django.contrib import messages
 from django.utils import timezone
+from django.core.cache import cache
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.forms import modelformset_factory
 import json
+from datetime import date, datetime, timedelta
 from django.db.models.functions import TruncMonth
-from django.db.models import Count, Avg, Q, F, FloatField, DurationField, ExpressionWrapper
+from django.db.models import Count, Q, Sum
 from .models import (
     Program, Application, ApplicationDocument, NotificationPreference,
-    ApplicationStatus, FormField, Beneficiary, BeneficiarySupport,
+    ApplicationStatus, ExportJob, ProgramStats, StatusDuration, Beneficiary,
     EducationProfile, HealthProfile, YouthProfile, HousingProfile
 )
 from .forms import ApplicationForm, ApplicationDocumentForm, ApplicationReviewForm
-from .utils import send_application_status_update
+from .form_schema import get_form_schema
+from .search import search_applications
+from .showcase import (
+    ShowcaseCacheMixin, beneficiary_showcase_type, page_cache_key, showcase_cache_timeout, showcase_version
+)
+from .utils import (
+    send_application_status_update, bulk_update_status, get_impact_snapshot, program_stats_totals,
+    turnaround_percentiles,
+)
+from .exports import (
+    XLSX_CONTENT_TYPE, export_queryset, iter_export_rows, queue_export_job, stream_csv, write_xlsx
+)
 
 
 class ProgramListView(ListView):
@@ -73,8 +83,8 @@ class ApplicationCreateView(LoginRequiredMixin, CreateView):
         context = super().get_context_data(**kwargs)
         context['program'] = self.program
         
-        # Add form fields specific to this program
-        context['form_fields'] = FormField.objects.filter(program=self.program).order_by('order')
+        # Program questions come from the cached, compiled form schema
+        context['form_fields'] = self.get_form_schema().fields
         
         # Add document formset
         DocumentFormSet = modelformset_factory(
@@ -95,6 +105,11 @@ class ApplicationCreateView(LoginRequiredMixin, CreateView):
             
         return context
 
+    def get_form_schema(self):
+        if not hasattr(self, 'form_schema'):
+            self.form_schema = get_form_schema(self.program)
+        return self.form_schema
+
     def form_valid(self, form):
         # Get the document formset from context
         context = self.get_context_data()
@@ -107,6 +122,16 @@ class ApplicationCreateView(LoginRequiredMixin, CreateView):
                 for field, message in error.items():
                     form.add_error(None, f"Document error: {message}")
             return self.form_invalid(form)
+
+        # Validate the program-specific questions
+        schema = self.get_form_schema()
+        questions = schema.bind(self.request.POST, self.request.FILES)
+        if not questions.is_valid():
+            for name, errors in questions.errors.items():
+                label = questions.fields[name].label if name in questions.fields else ''
+                for message in errors:
+                    form.add_error(None, f"{label}: {message}" if label else message)
+            return self.form_invalid(form)
         
         # Process form data from dynamic fields
         form_data = {}
@@ -131,21 +156,13 @@ class ApplicationCreateView(LoginRequiredMixin, CreateView):
         
         form_data.update(personal_info)
         
-        # Add program-specific fields
-        for field in FormField.objects.filter(program=self.program):
-            field_name = f'field_{field.id}'
-            if field_name in self.request.POST:
-                value = self.request.POST.get(field_name)
-                # Handle potential date fields in program-specific fields
-                if field.field_type == 'date' and value:
-                    try:
-                        # Try to parse the date and convert to ISO format
-                        parsed_date = datetime.strptime(value, '%Y-%m-%d').date()
-                        value = parsed_date.isoformat()
-                    except ValueError:
-                        # If parsing fails, keep the original value
-                        pass
-                form_data[field_name] = value
+        # Add program-specific fields, stored as submitted (dates in ISO format)
+        for field in schema:
+            if field.name in self.request.POST:
+                value = self.request.POST.get(field.name)
+                if field.field_type == 'date' and questions.cleaned_data.get(field.name):
+                    value = questions.cleaned_data[field.name].isoformat()
+                form_data[field.name] = value
         
         # Set application properties
         form.instance.form_data = json.dumps(form_data, default=json_serial)
@@ -313,22 +330,11 @@ class DashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get overall statistics
-        context['total_applications'] = Application.objects.count()
-        context['pending_applications'] = Application.objects.filter(
-            status__in=['submitted', 'under_review']
-        ).count()
-        
-        # Get program-wise statistics
-        context['program_stats'] = Program.objects.annotate(
-            total_applications=Count('application'),
-            pending_applications=Count('application', 
-                filter=Q(application__status__in=['submitted', 'under_review'])),
-            approved_applications=Count('application', 
-                filter=Q(application__status='approved')),
-            rejected_applications=Count('application', 
-                filter=Q(application__status='rejected'))
-        )
+        # Overall and program-wise statistics come from the ProgramStats counters
+        totals = program_stats_totals()
+        context['total_applications'] = totals['total']
+        context['pending_applications'] = totals['pending']
+        context['program_stats'] = ProgramStats.objects.select_related('program').order_by('program__name')
         
         # Get recent applications
         context['recent_applications'] = Application.objects.select_related(
@@ -338,12 +344,18 @@ class DashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
         return context
 
     
-class ApplicationListView(LoginRequiredMixin, FilterView):
+class ApplicationListView(LoginRequiredMixin, KeysetPaginationMixin, FilterView):
     model = Application
     template_name = 'applications/application_list.html'
     context_object_name = 'applications'
     filterset_class = ApplicationFilter
     paginate_by = 10
+    keyset_ordering = ('-submitted_at', '-id')
+
+    def get_keyset_ordering(self, queryset):
+        if 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', '-id')
+        return self.keyset_ordering
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -352,11 +364,8 @@ class ApplicationListView(LoginRequiredMixin, FilterView):
         
         search_query = self.request.GET.get('search')
         if search_query:
-            queryset = queryset.filter(
-                Q(program__name__icontains=search_query) |
-                Q(applicant__first_name__icontains=search_query) |
-                Q(applicant__last_name__icontains=search_query)
-            )
+            # Full-text match on program and applicant names, best match first
+            queryset = search_applications(queryset, search_query)
         return queryset
 
 
@@ -371,87 +380,81 @@ def export_applications(request):
     date_to = request.GET.get('date_to')
     export_format = request.GET.get('format', 'csv')
 
-    applications = Application.objects.select_related(
-        'program', 'applicant', 'reviewed_by'
-    )
-
-    if date_from and date_to:
-        applications = applications.filter(
-            submitted_at__date__range=[date_from, date_to]
-        )
-
-    data = [['Program', 'Applicant', 'Status', 'Submitted Date', 'Review Notes', 'Reviewed By']]
-    for app in applications:
-        data.append([
-            app.program.name,
-            app.applicant.get_full_name(),
-            app.get_status_display(),
-            app.submitted_at.strftime('%Y-%m-%d'),
-            app.review_notes or '',
-            app.reviewed_by.get_full_name() if app.reviewed_by else ''
-        ])
-
     if export_format == 'csv':
-        response = HttpResponse(content_type='text/csv')
+        rows = iter_export_rows(export_queryset(date_from, date_to))
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
         filename = f'applications_{date_from}_{date_to}.csv' if date_from and date_to else 'applications.csv'
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        writer = csv.writer(response)
-        writer.writerows(data)
-        
         return response
 
     elif export_format == 'excel':
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Applications"
-        
-        for row in data:
-            ws.append(row)
-
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        # Built in a temporary file that FileResponse closes once it is sent
+        output = tempfile.TemporaryFile()
+        write_xlsx(
+            output,
+            export_queryset(date_from, date_to),
+            per_program=request.GET.get('sheets') == 'program',
+            include_history=bool(request.GET.get('history')),
+        )
+        output.seek(0)
         filename = f'applications_{date_from}_{date_to}.xlsx' if date_from and date_to else 'applications.xlsx'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        wb.save(response)
-        return response
+        return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
 
     elif export_format == 'pdf':
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(table)
-        
-        doc.build(elements)
-        
-        response = HttpResponse(content_type='application/pdf')
-        filename = f'applications_{date_from}_{date_to}.pdf' if date_from and date_to else 'applications.pdf'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        pdf = buffer.getvalue()
-        buffer.close()
-        response.write(pdf)
-        
-        return response
+        # Rendered by the process_export_jobs worker; the job page polls for progress
+        job = queue_export_job(request.user, 'pdf', date_from, date_to)
+        messages.info(request, 'Your PDF export has been queued.')
+        return redirect('applications:export_job_detail', pk=job.pk)
 
     return HttpResponse('Invalid export format specified.', status=400)  
 
 
+def export_job_status_data(job):
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'processed_rows': job.processed_rows,
+        'total_rows': job.total_rows,
+        'error': job.error,
+        'download_url': reverse('applications:export_job_download', args=[job.pk])
+                        if job.status == 'completed' else None,
+    }
+
+
+@login_required
+def export_job_detail(request, pk):
+    if not request.user.is_staff:
+        messages.error(request, 'You do not have permission to export applications.')
+        return redirect('applications:application_list')
+
+    job = get_object_or_404(ExportJob, pk=pk)
+    return render(request, 'applications/export_job_detail.html', {
+        'job': job,
+        'job_status': export_job_status_data(job),
+    })
+
+
+@login_required
+def export_job_status(request, pk):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    job = get_object_or_404(ExportJob, pk=pk)
+    return JsonResponse(export_job_status_data(job))
+
+
+@login_required
+def export_job_download(request, pk):
+    if not request.user.is_staff:
+        messages.error(request, 'You do not have permission to export applications.')
+        return redirect('applications:application_list')
+
+    job = get_object_or_404(ExportJob, pk=pk, status='completed')
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.filename)
+
+
 @login_required
 def bulk_application_review(request):
     if not request.user.is_staff:
@@ -468,21 +471,14 @@ def bulk_application_review(request):
         'review': 'under_review'
     }
     status = status_map.get(action, action)
+    if status not in dict(Application.STATUS_CHOICES):
+        messages.error(request, 'Invalid bulk action.')
+        return redirect('applications:application_list')
 
     applications = Application.objects.filter(id__in=application_ids)
-    
-    for application in applications:
-        application.status = status
-        application.save()
-        
-        ApplicationStatus.objects.create(
-            application=application,
-            status=status,
-            created_by=request.user,
-            notes=f'Bulk {action} action'
-        )
+    changed = bulk_update_status(applications, status, request.user, notes=f'Bulk {action} action')
 
-    messages.success(request, f'Successfully processed selected applications.')
+    messages.success(request, f'Successfully processed {len(changed)} selected applications.')
     return redirect('applications:application_list')
 
 class AnalyticsView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
@@ -502,24 +498,24 @@ class AnalyticsView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
         ).order_by('month')
         
         # Program success rates
-        context['program_success_rates'] = Program.objects.annotate(
-            total_apps=Count('application'),
-            approved_apps=Count('application', filter=Q(application__status='approved')),
-            success_rate=ExpressionWrapper(
-                F('approved_apps') * 100.0 / F('total_apps'),
-                output_field=FloatField()
-            )
-        ).filter(total_apps__gt=0)
+        context['program_success_rates'] = [
+            stats for stats in ProgramStats.objects.select_related('program').order_by('program__name')
+            if stats.total_applications
+        ]
         
-        # Processing time analytics
-        context['avg_processing_time'] = Application.objects.exclude(
-            reviewed_by__isnull=True
-        ).annotate(
-            processing_time=ExpressionWrapper(
-                F('updated_at') - F('submitted_at'),
-                output_field=DurationField()
-            )
-        ).aggregate(avg_time=Avg('processing_time'))
+        # Processing time analytics from the precomputed status durations
+        labels = dict(Application.STATUS_CHOICES)
+        context['turnaround'] = [
+            {'status': labels[status], **turnaround_percentiles(status)}
+            for status in StatusDuration.TRACKED_STATUSES
+        ]
+        totals = StatusDuration.objects.filter(seconds__isnull=False).aggregate(
+            seconds=Sum('seconds'), applications=Count('application', distinct=True)
+        )
+        context['avg_processing_time'] = {
+            'avg_time': timedelta(seconds=totals['seconds'] // totals['applications'])
+            if totals['applications'] else None
+        }
         
         return context
 
@@ -572,12 +568,16 @@ def user_dashboard(request):
 
 # Public Beneficiary Showcase Views
 
-class BeneficiaryShowcaseView(ListView):
+class BeneficiaryShowcaseView(ShowcaseCacheMixin, KeysetPaginationMixin, ListView):
     """Generic beneficiary showcase view"""
     model = Beneficiary
     template_name = 'applications/beneficiary_showcase.html'
     context_object_name = 'beneficiaries'
     paginate_by = 12
+    keyset_ordering = ('-start_date', '-id')
+    keyset_count = True
+    grid_template_name = 'applications/includes/beneficiary_grid.html'
+    cached_grid = None
 
     def get_queryset(self):
         queryset = Beneficiary.objects.filter(
@@ -598,9 +598,16 @@ class BeneficiaryShowcaseView(ListView):
                 Q(program__name__icontains=search)
             )
 
-        return queryset.order_by('-start_date')
+        return queryset
+
+    def get_paginate_by(self, queryset):
+        # A cached grid needs no page of beneficiaries
+        return None if self.cached_grid is not None else self.paginate_by
 
     def get_context_data(self, **kwargs):
+        # The grid and the total, rendered once per version stamp, search and cursor
+        grid_key = page_cache_key(self.request, self.get_showcase_scope(), self.get_showcase_type(), part='grid')
+        self.cached_grid = cache.get(grid_key)
         context = super().get_context_data(**kwargs)
         beneficiary_type = self.kwargs.get('beneficiary_type')
 
@@ -636,17 +643,28 @@ class BeneficiaryShowcaseView(ListView):
             context['icon'] = 'fa-hands-helping'
 
         context['beneficiary_type'] = beneficiary_type
-        context['total_count'] = self.get_queryset().count()
+        if self.cached_grid is None:
+            self.cached_grid = (
+                render_to_string(self.grid_template_name, context, self.request), context['paginator'].count
+            )
+            cache.set(grid_key, self.cached_grid, showcase_cache_timeout())
+        context['grid'], context['total_count'] = self.cached_grid
 
         return context
 
 
-class BeneficiaryDetailView(DetailView):
+class BeneficiaryDetailView(ShowcaseCacheMixin, DetailView):
     """Public beneficiary detail page"""
     model = Beneficiary
     template_name = 'applications/beneficiary_detail.html'
     context_object_name = 'beneficiary'
 
+    def get_showcase_type(self):
+        return beneficiary_showcase_type(self.kwargs['pk'])
+
+    def get_showcase_scope(self):
+        return f"beneficiary:{self.kwargs['pk']}"
+
     def get_queryset(self):
         return Beneficiary.objects.filter(show_on_website=True).select_related('program')
 
@@ -664,12 +682,14 @@ class BeneficiaryDetailView(DetailView):
         elif beneficiary.beneficiary_type == 'housing':
             context['profile'] = getattr(beneficiary, 'housing_profile', None)
 
-        # Get related beneficiaries
+        # Get related beneficiaries; only queried if the template fragment is not cached
         context['related_beneficiaries'] = Beneficiary.objects.filter(
             beneficiary_type=beneficiary.beneficiary_type,
             show_on_website=True,
             status='active'
         ).exclude(pk=beneficiary.pk)[:4]
+        context['showcase_version'] = showcase_version(beneficiary.beneficiary_type)
+        context['showcase_cache_timeout'] = showcase_cache_timeout()
 
         return context
 
@@ -681,53 +701,11 @@ class ImpactDashboardView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Overall statistics
-        context['total_beneficiaries'] = Beneficiary.objects.filter(status='active').count()
-        context['total_programs'] = Program.objects.filter(is_active=True).count()
-
-        # Total disbursed
-        from django.db.models import Sum
-        context['total_disbursed'] = BeneficiarySupport.objects.aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-
-        # By type statistics
-        context['education_count'] = Beneficiary.objects.filter(
-            beneficiary_type='education', status='active'
-        ).count()
-        context['health_count'] = Beneficiary.objects.filter(
-            beneficiary_type='health', status='active'
-        ).count()
-        context['youth_count'] = Beneficiary.objects.filter(
-            beneficiary_type='youth', status='active'
-        ).count()
-        context['housing_count'] = Beneficiary.objects.filter(
-            beneficiary_type='housing', status='active'
-        ).count()
-
-        # Recent beneficiaries
-        context['recent_beneficiaries'] = Beneficiary.objects.filter(
-            show_on_website=True,
-            status='active'
-        ).order_by('-created_at')[:8]
-
-        # Active programs
-        context['active_programs'] = Program.objects.filter(
-            is_active=True
-        ).annotate(
-            beneficiary_count=Count('beneficiaries', filter=Q(beneficiaries__status='active'))
-        )[:6]
-
-        # Gender distribution
-        context['male_count'] = Beneficiary.objects.filter(
-            gender='male', status='active'
-        ).count()
-        context['female_count'] = Beneficiary.objects.filter(
-            gender='female', status='active'
-        ).count()
-
-        # Completed beneficiaries (success stories potential)
-        context['completed_count'] = Beneficiary.objects.filter(status='completed').count()
+        # Figures and lists all come from the snapshot the refresh_impact_snapshot command keeps
+        snapshot = get_impact_snapshot()
+        context.update(snapshot.figures())
+        context['recent_beneficiaries'] = snapshot.recent_beneficiaries
+        context['active_programs'] = snapshot.active_programs
 
         return context
 
@@ -1,5 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
+
+from core.renditions import rendition_url
+
 from .models import Page, Media, ImpactStory, Announcement, BlogPost, Category
 
 
@@ -25,23 +28,23 @@ class PageAdmin(admin.ModelAdmin):
 
 @admin.register(Media)
 class MediaAdmin(admin.ModelAdmin):
-    list_display = ('title', 'file_preview', 'uploaded_at', 'uploaded_by')
-    list_filter = ('uploaded_at', 'uploaded_by')
+    list_display = ('title', 'file_preview', 'processing_status', 'uploaded_at', 'uploaded_by')
+    list_filter = ('processing_status', 'uploaded_at', 'uploaded_by')
     search_fields = ('title', 'alt_text')
-    readonly_fields = ('file_preview',)
+    readonly_fields = ('file_preview', 'processing_status', 'processing_error', 'processed_at')
     fieldsets = (
         (None, {
             'fields': ('title', 'file', 'alt_text', 'file_preview')
         }),
         ('Upload Information', {
-            'fields': ('uploaded_by',),
+            'fields': ('uploaded_by', 'processing_status', 'processing_error', 'processed_at'),
             'classes': ('collapse',)
         }),
     )
     
     def file_preview(self, obj):
         if obj.file and obj.get_file_extension() in ['jpg', 'jpeg', 'png', 'gif']:
-            return format_html('<img src="{}" style="max-height: 100px; max-width: 300px;" />', obj.file.url)
+            return format_html('<img src="{}" style="max-height: 100px; max-width: 300px;" />', rendition_url(obj.file))
         elif obj.file:
             return format_html('<a href="{}" target="_blank">{}</a>', obj.file.url, obj.get_file_extension().upper())
         return "No file"
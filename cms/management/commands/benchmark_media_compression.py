@@ -0,0 +1,106 @@
+import os
+import random
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw, ImageFilter
+
+from core.images import compress_to_size, image_max_dimension, image_target_bytes, load_image
+
+# name, size, format of the generated sample uploads
+SAMPLES = [
+    ('phone photo', (4032, 3024), 'JPEG'),
+    ('camera photo', (6000, 4000), 'JPEG'),
+    ('web photo', (1600, 1067), 'JPEG'),
+    ('png graphic', (2400, 1200), 'PNG'),
+]
+
+
+class Command(BaseCommand):
+    help = ('Benchmark Media image compression: the bounded quality search against the old '
+            'step-down-by-5 loop, on generated sample photos or the files given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('photos', nargs='*', help='Image files to use instead of the generated samples')
+        parser.add_argument('--repeat', type=int, default=1, help='Runs per image; the fastest is reported')
+        parser.add_argument('--skip-legacy', action='store_true', help='Only measure the quality search')
+
+    def handle(self, *args, **options):
+        if options['photos']:
+            samples = [(os.path.basename(path), self.read(path)) for path in options['photos']]
+        else:
+            samples = [(name, self.sample(size, image_format)) for name, size, image_format in SAMPLES]
+
+        self.stdout.write(f"{'image':<16} {'path':<8} {'wall (s)':>9} {'cpu (s)':>8} {'encodes':>8} "
+                          f"{'quality':>8} {'output (KB)':>12} {'size':>11}")
+        for name, data in samples:
+            self.report(name, 'search', self.measure(self.search, data, options['repeat']))
+            if not options['skip_legacy']:
+                self.report(name, 'legacy', self.measure(self.legacy, data, options['repeat']))
+
+        self.stdout.write(f'target {image_target_bytes() // 1024} KB, longest side bounded to '
+                          f'{image_max_dimension()} px (the legacy loop never downscales).')
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def sample(self, size, image_format):
+        """A noisy gradient with shapes: compresses about as badly as a real photo"""
+        rng = random.Random(size[0])
+        width, height = size
+        small = Image.linear_gradient('L').resize((width // 8, height // 8)).convert('RGB')
+        draw = ImageDraw.Draw(small)
+        for _ in range(60):
+            x, y = rng.randrange(small.width), rng.randrange(small.height)
+            r = rng.randrange(5, max(small.width // 6, 6))
+            draw.ellipse((x - r, y - r, x + r, y + r),
+                         fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        img = small.resize(size, Image.BICUBIC).filter(ImageFilter.GaussianBlur(2))
+        noise = Image.effect_noise(size, 40).convert('RGB')
+        img = Image.blend(img, noise, 0.15)
+
+        output = BytesIO()
+        if image_format == 'PNG':
+            img.putalpha(255)
+            img.save(output, format='PNG')
+        else:
+            img.save(output, format='JPEG', quality=92)
+        return output.getvalue()
+
+    def search(self, data):
+        img = load_image(BytesIO(data))
+        output, quality, encodes = compress_to_size(img)
+        return output, quality, encodes, img.size
+
+    def legacy(self, data):
+        """Media.compress_image as it worked before the quality search"""
+        img = Image.open(BytesIO(data))
+        if img.mode in ('RGBA', 'P'):
+            img = img.convert('RGB')
+        img_io = BytesIO()
+        quality = 95
+        img.save(img_io, format='JPEG', quality=quality, optimize=True)
+        encodes = 1
+        while img_io.tell() > 200 * 1024 and quality > 10:
+            img_io = BytesIO()
+            quality -= 5
+            img.save(img_io, format='JPEG', quality=quality, optimize=True)
+            encodes += 1
+        return img_io.getvalue(), quality, encodes, img.size
+
+    def measure(self, compress, data, repeat):
+        best = None
+        for _ in range(max(repeat, 1)):
+            wall, cpu = time.perf_counter(), time.process_time()
+            output, quality, encodes, size = compress(data)
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if best is None or wall < best[0]:
+                best = (wall, cpu, encodes, quality, len(output), size)
+        return best
+
+    def report(self, name, path, result):
+        wall, cpu, encodes, quality, output_bytes, (width, height) = result
+        self.stdout.write(f'{name:<16} {path:<8} {wall:>9.2f} {cpu:>8.2f} {encodes:>8} '
+                          f'{quality:>8} {output_bytes / 1024:>12.1f} {f"{width}x{height}":>11}')
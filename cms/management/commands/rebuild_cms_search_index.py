@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from cms.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index of pages, blog posts, impact stories and announcements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Objects indexed per batch (default: 500)')
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} objects'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:07
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0007_media_processing_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='media',
+            name='file',
+            field=models.FileField(storage=core.storage.dedup_storage, upload_to='media/'),
+        ),
+    ]
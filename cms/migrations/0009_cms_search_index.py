@@ -0,0 +1,77 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:13
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from cms.search import SEARCH_FIELDS, tokenize
+
+
+def build_search_index(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    SearchField = apps.get_model('cms', 'SearchField')
+    SearchPosting = apps.get_model('cms', 'SearchPosting')
+    for label, weights in SEARCH_FIELDS.items():
+        app_label, model_name = label.split('.')
+        model = apps.get_model(app_label, model_name)
+        content_type, _ = ContentType.objects.get_or_create(app_label=app_label, model=model_name.lower())
+        fields = list(weights)
+        last_pk = 0
+        while True:
+            rows = list(model.objects.filter(pk__gt=last_pk).order_by('pk').values('pk', *fields)[:500])
+            if not rows:
+                break
+            last_pk = rows[-1]['pk']
+            words = {(row['pk'], field): Counter(tokenize(row[field])) for row in rows for field in fields}
+            SearchField.objects.bulk_create([
+                SearchField(content_type=content_type, object_id=object_id, field=field, length=sum(counts.values()))
+                for (object_id, field), counts in words.items()
+            ])
+            field_ids = {
+                (object_id, field): pk for pk, object_id, field in SearchField.objects.filter(
+                    content_type=content_type, object_id__in={object_id for object_id, _ in words}
+                ).values_list('pk', 'object_id', 'field')
+            }
+            SearchPosting.objects.bulk_create([
+                SearchPosting(search_field_id=field_ids[key], term=term, frequency=frequency)
+                for key, counts in words.items() for term, frequency in counts.items()
+            ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0008_dedup_storage'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='impactstory',
+            name='search_vector',
+        ),
+        migrations.CreateModel(
+            name='SearchField',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('field', models.CharField(max_length=50)),
+                ('length', models.PositiveIntegerField(default=0)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('content_type', 'object_id', 'field')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=64)),
+                ('frequency', models.PositiveIntegerField()),
+                ('search_field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='cms.searchfield')),
+            ],
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0009_cms_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchfield',
+            name='object_id',
+            field=models.PositiveBigIntegerField(),
+        ),
+    ]
@@ -1,6 +1,4 @@
 from django.db import models
-from django.contrib.postgres.search import SearchVectorField, SearchVector
-from django.db.models import Q
 from django.utils.text import slugify
 from ckeditor_uploader.fields import RichTextUploadingField
 from taggit.managers import TaggableManager
@@ -12,9 +10,10 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 import os
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
+
+from core.models import ChangeTrackingMixin
+from core.renditions import is_renderable
+from core.storage import dedup_storage
 
 
 User = get_user_model
@@ -60,31 +59,23 @@ class Category(models.Model):
             current = current.parent
         return ancestors[::-1]
 
-class Media(models.Model):
+PROCESSING_STATUS_CHOICES = (
+    ('pending', 'Pending'),
+    ('processing', 'Processing'),
+    ('ready', 'Ready'),
+    ('failed', 'Failed'),
+)
+
+
+class Media(ChangeTrackingMixin, models.Model):
     title = models.CharField(max_length=200)
-    file = models.FileField(upload_to='media/')
+    file = models.FileField(upload_to='media/', storage=dedup_storage)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     alt_text = models.CharField(max_length=255, blank=True)
-
-    def compress_image(self, image_file):
-        img = Image.open(image_file)
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
-        
-        # Calculate compression quality
-        img_io = BytesIO()
-        quality = 95
-        img.save(img_io, format='JPEG', quality=quality, optimize=True)
-        
-        # Keep reducing quality until file size is under 200KB
-        while img_io.tell() > 200 * 1024 and quality > 10:
-            img_io = BytesIO()
-            quality -= 5
-            img.save(img_io, format='JPEG', quality=quality, optimize=True)
-        
-        img_io.seek(0)
-        return ContentFile(img_io.getvalue())
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUS_CHOICES, default='ready')
+    processing_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
         if self.file and not self.title:
@@ -93,20 +84,10 @@ class Media(models.Model):
             if not self.alt_text:
                 self.alt_text = self.title
 
-        # Compress image if it's an image file
+        # New images are compressed and rendered by the image worker (see core.image_jobs)
         if self.file and not self.file._committed:
-            try:
-                file_ext = self.file.name.split('.')[-1].lower()
-                if file_ext in ['jpg', 'jpeg', 'png', 'gif']:
-                    compressed_image = self.compress_image(self.file)
-                    self.file.save(
-                        f"{self.file.name.rsplit('.', 1)[0]}_compressed.jpg",
-                        compressed_image,
-                        save=False
-                    )
-            except Exception as e:
-                # If compression fails, continue with original file
-                pass
+            self.processing_status = 'pending' if is_renderable(self.file.name) else 'ready'
+            self.processing_error = ''
 
         super().save(*args, **kwargs)
 
@@ -123,7 +104,7 @@ class Media(models.Model):
         return self.file.name.split('.')[-1] if self.file else None
 
 
-class Page(models.Model):
+class Page(ChangeTrackingMixin, models.Model):
     title = models.CharField(max_length=200, db_index=True)
     slug = models.SlugField(unique=True)
     content = models.TextField(db_index=True)
@@ -246,19 +227,10 @@ class Page(models.Model):
     def __str__(self):
         return self.title
 
-    def update_search_vector(self):
-        self.search_vector = SearchVector('title', weight='A') + \
-                           SearchVector('content', weight='B') + \
-                           SearchVector('meta_description', weight='C')
-        self.save(update_fields=['search_vector'])
-
     @classmethod
     def search(cls, query):
-        return cls.objects.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query) |
-            Q(meta_description__icontains=query)
-        ).distinct()
+        from .search import search_content
+        return search_content(cls.objects.all(), query)
 
     class Meta:
         ordering = ['order', '-published_at']
@@ -267,7 +239,7 @@ class Page(models.Model):
 
             
 
-class ImpactStory(models.Model):
+class ImpactStory(ChangeTrackingMixin, models.Model):
     title = models.CharField(max_length=200)
     beneficiary_name = models.CharField(max_length=100)
     story = models.TextField()
@@ -276,22 +248,11 @@ class ImpactStory(models.Model):
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    search_vector = SearchVectorField(null=True)
-
-
-    def update_search_vector(self):
-        self.search_vector = SearchVector('title', weight='A') + \
-                           SearchVector('story', weight='B') + \
-                           SearchVector('beneficiary_name', weight='C')
-        self.save(update_fields=['search_vector'])
 
     @classmethod
     def search(cls, query):
-        return cls.objects.filter(
-            Q(title__icontains=query) |
-            Q(story__icontains=query) |
-            Q(beneficiary_name__icontains=query)
-        ).distinct()
+        from .search import search_content
+        return search_content(cls.objects.all(), query)
 
     class Meta:
         verbose_name_plural = 'Impact Stories'
@@ -307,7 +268,7 @@ class ImpactStory(models.Model):
             raise ValidationError('Impact story must be associated with a program.')
     
 
-class Announcement(models.Model):
+class Announcement(ChangeTrackingMixin, models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     is_published = models.BooleanField(default=False)
@@ -344,10 +305,8 @@ class Announcement(models.Model):
 
     @classmethod
     def search(cls, query):
-        return cls.objects.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query)
-        ).distinct()
+        from .search import search_content
+        return search_content(cls.objects.all(), query)
 
 
 # Tracking Content Version
@@ -370,7 +329,7 @@ class ContentVersion(models.Model):
         return f"Version {self.version_number} of {self.content_object}"
 
 
-class BlogPost(models.Model):
+class BlogPost(ChangeTrackingMixin, models.Model):
     STATUS_CHOICES = (
         ('draft', 'Draft'),
         ('published', 'Published'),
@@ -405,4 +364,32 @@ class BlogPost(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class SearchField(models.Model):
+    """
+    One indexed field of a CMS object and its length in tokens.
+
+    Maintained by cms.search; the lengths give BM25 its per-field length
+    normalisation.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    field = models.CharField(max_length=50)
+    length = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'field')
+
+    def __str__(self):
+        return f"{self.content_type.model} {self.object_id}: {self.field}"
+
+
+class SearchPosting(models.Model):
+    """How often a term occurs in one indexed field"""
+    search_field = models.ForeignKey(SearchField, on_delete=models.CASCADE, related_name='postings')
+    term = models.CharField(max_length=64, db_index=True)
+    frequency = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.term} x{self.frequency}"
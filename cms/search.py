@@ -0,0 +1,240 @@
+"""
+Search over CMS content.
+
+Pages, blog posts, impact stories and announcements are kept in an
+inverted index of their own: every field in SEARCH_FIELDS is reduced to
+plain text (rich text loses its markup), split into lower-cased words and
+stored as a SearchField row with its length plus one SearchPosting per
+distinct word. Saves re-index the fields they wrote (see cms.signals) and
+the ``rebuild_cms_search_index`` command indexes everything.
+
+Matches are ranked with BM25F: each word's frequency is weighted by field,
+normalised by the field's length against its average, and scored against
+the word's rarity across objects of the same model. Matching and scoring
+run in the database as subqueries over the postings, so nothing grows with
+the number of matches on the Python side. The index is ordinary tables
+queried with ordinary lookups, so it works the same on every database.
+"""
+import math
+import re
+from collections import Counter
+from html.parser import HTMLParser
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import (
+    Avg, Case, Count, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+)
+
+from .models import SearchField, SearchPosting
+
+# Indexed fields and their ranking weights, by model label
+SEARCH_FIELDS = {
+    'cms.Page': {'title': 3.0, 'meta_description': 1.5, 'content': 1.0},
+    'cms.BlogPost': {'title': 3.0, 'excerpt': 1.5, 'content': 1.0},
+    'cms.ImpactStory': {'title': 3.0, 'beneficiary_name': 2.0, 'story': 1.0},
+    'cms.Announcement': {'title': 3.0, 'content': 1.0},
+}
+
+# BM25 term frequency saturation and length normalisation
+K1 = 1.2
+B = 0.75
+
+# Query words this long also match longer words they begin, at PREFIX_WEIGHT
+PREFIX_MIN_LENGTH = 3
+PREFIX_WEIGHT = 0.5
+
+MAX_TERM_LENGTH = SearchPosting._meta.get_field('term').max_length
+WORD_RE = re.compile(r'\w+')
+
+
+class TextExtractor(HTMLParser):
+    """The text of an HTML fragment, without scripts and styles"""
+    INLINE_TAGS = {'a', 'abbr', 'b', 'code', 'em', 'i', 'mark', 'small', 'span', 'strong', 'sub', 'sup', 'u'}
+    SKIPPED_TAGS = {'script', 'style'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self.skipping += 1
+        elif tag not in self.INLINE_TAGS:
+            # Block tags separate words: <p>one</p><p>two</p> is two words
+            self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS:
+            self.skipping = max(self.skipping - 1, 0)
+        elif tag not in self.INLINE_TAGS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+
+def html_text(value):
+    parser = TextExtractor()
+    parser.feed(value)
+    parser.close()
+    return ''.join(parser.parts)
+
+
+def tokenize(value):
+    """Lower-cased words of a text or HTML value"""
+    if not value:
+        return []
+    return [word for word in WORD_RE.findall(html_text(str(value)).lower()) if len(word) <= MAX_TERM_LENGTH]
+
+
+def search_terms(query):
+    """Distinct words of a user query, in order"""
+    return list(dict.fromkeys(tokenize(query)))
+
+
+def indexed_models():
+    return [apps.get_model(label) for label in SEARCH_FIELDS]
+
+
+def indexed_fields(model):
+    return list(SEARCH_FIELDS.get(model._meta.label, {}))
+
+
+def index_objects(objects, fields=None):
+    """
+    Replace the index entries of ``objects``, all of one model.
+
+    ``fields`` limits the update to some of the model's indexed fields.
+    """
+    objects = [obj for obj in objects if obj.pk is not None]
+    if not objects:
+        return 0
+    model = type(objects[0])
+    fields = [field for field in indexed_fields(model) if fields is None or field in fields]
+    content_type = ContentType.objects.get_for_model(model)
+    object_ids = [obj.pk for obj in objects]
+
+    words = {(obj.pk, field): Counter(tokenize(getattr(obj, field))) for obj in objects for field in fields}
+    with transaction.atomic():
+        entries = SearchField.objects.filter(content_type=content_type, object_id__in=object_ids, field__in=fields)
+        entries.delete()
+        SearchField.objects.bulk_create([
+            SearchField(content_type=content_type, object_id=object_id, field=field, length=sum(counts.values()))
+            for (object_id, field), counts in words.items()
+        ], batch_size=500)
+        # Looked up again: not every database returns the ids of bulk inserts
+        field_ids = {(object_id, field): pk for pk, object_id, field in entries.values_list('pk', 'object_id', 'field')}
+        SearchPosting.objects.bulk_create([
+            SearchPosting(search_field_id=field_ids[key], term=term, frequency=frequency)
+            for key, counts in words.items() for term, frequency in counts.items()
+        ], batch_size=1000)
+    return len(objects)
+
+
+def remove_from_index(instance):
+    SearchField.objects.filter(
+        content_type=ContentType.objects.get_for_model(instance), object_id=instance.pk
+    ).delete()
+
+
+def term_match(term):
+    """Postings of ``term``, or from PREFIX_MIN_LENGTH letters of any word it begins"""
+    return Q(term__startswith=term) if len(term) >= PREFIX_MIN_LENGTH else Q(term=term)
+
+
+def rank_expression(model, terms):
+    """
+    The BM25F score of an object of ``model`` for ``terms``, as an
+    expression over its pk; higher is better.
+
+    The score is computed by the database, one correlated subquery per word
+    reading only that object's postings, so it costs the same bound
+    parameters however many objects match. Returns None if a word matches
+    nothing.
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    weights = SEARCH_FIELDS[model._meta.label]
+    averages = {}
+    total = 0
+    for field, documents, average in SearchField.objects.filter(content_type=content_type).values('field').annotate(
+        documents=Count('pk'), average=Avg('length')
+    ).values_list('field', 'documents', 'average'):
+        averages[field] = average or 1
+        total = max(total, documents)
+
+    postings = SearchPosting.objects.filter(search_field__content_type=content_type)
+    field_weight = Case(
+        *[When(search_field__field=field, then=Value(weight)) for field, weight in weights.items()],
+        default=Value(0.0), output_field=FloatField(),
+    )
+    field_average = Case(
+        *[When(search_field__field=field, then=Value(float(average))) for field, average in averages.items()],
+        default=Value(1.0), output_field=FloatField(),
+    )
+    # Weighted, length-normalised frequency of a posting
+    normalised = ExpressionWrapper(
+        field_weight * F('frequency') / (Value(1 - B) + Value(B) * F('search_field__length') / field_average),
+        output_field=FloatField(),
+    )
+
+    score = Value(0.0)
+    for term in terms:
+        found = postings.filter(term_match(term)).values('search_field__object_id').distinct().count()
+        if not found:
+            return None
+        idf = math.log(1 + (total - found + 0.5) / (found + 0.5))
+        term_weight = Case(When(term=term, then=Value(1.0)), default=Value(PREFIX_WEIGHT), output_field=FloatField())
+        frequency = Subquery(
+            postings.filter(term_match(term), search_field__object_id=OuterRef('pk'))
+            .values('search_field__object_id').annotate(frequency=Sum(term_weight * normalised)).values('frequency'),
+            output_field=FloatField(),
+        )
+        # idf * f / (K1 + f), written so the subquery appears once
+        score = score + Value(idf) - Value(idf * K1) / (Value(K1) + frequency)
+    return ExpressionWrapper(score, output_field=FloatField())
+
+
+def search_content(queryset, query, rank=True):
+    """
+    Limit a queryset of an indexed model to matches of ``query``.
+
+    Every word is required and, from PREFIX_MIN_LENGTH letters, may be the
+    start of a longer one. With ``rank`` the results are annotated with
+    ``search_rank`` and ordered by it, best match first.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    content_type = ContentType.objects.get_for_model(queryset.model)
+    postings = SearchPosting.objects.filter(search_field__content_type=content_type)
+    for term in terms:
+        queryset = queryset.filter(pk__in=postings.filter(term_match(term)).values('search_field__object_id'))
+    if rank:
+        search_rank = rank_expression(queryset.model, terms)
+        if search_rank is None:
+            return queryset.none()
+        queryset = queryset.annotate(search_rank=search_rank).order_by('-search_rank', '-pk')
+    return queryset
+
+
+def rebuild_search_index(chunk_size=500):
+    """Re-index every object of the indexed models ``chunk_size`` at a time; returns the number indexed"""
+    indexed = 0
+    for model in indexed_models():
+        manager = model._base_manager
+        last_pk = 0
+        while True:
+            objects = list(manager.filter(pk__gt=last_pk).order_by('pk').only('pk', *indexed_fields(model))[:chunk_size])
+            if not objects:
+                break
+            indexed += index_objects(objects)
+            last_pk = objects[-1].pk
+        # Entries of objects deleted without the post_delete signal, e.g. with raw SQL
+        SearchField.objects.filter(content_type=ContentType.objects.get_for_model(model)).exclude(
+            object_id__in=manager.values('pk')
+        ).delete()
+    return indexed
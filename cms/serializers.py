@@ -11,7 +11,9 @@ class MediaSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Media
-        fields = ['id', 'title', 'file', 'file_url', 'file_type', 'alt_text', 'mime_type']
+        fields = ['id', 'title', 'file', 'file_url', 'file_type', 'alt_text', 'mime_type',
+                  'processing_status', 'processing_error', 'processed_at']
+        read_only_fields = ['processing_status', 'processing_error', 'processed_at']
 
     def get_file_url(self, obj):
         return obj.get_file_url()
@@ -2,7 +2,11 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.core.cache import cache
 from django.urls import reverse
-from .models import Page, Category, Announcement, ImpactStory
+
+from core.image_jobs import image_job_changed
+
+from .models import Page, Category, Announcement, ImpactStory, Media, BlogPost
+from .search import index_objects, indexed_fields, remove_from_index
 
 @receiver([post_save, post_delete], sender=Page)
 def clear_page_cache(sender, instance, **kwargs):
@@ -24,4 +28,41 @@ def clear_announcement_cache(sender, instance, **kwargs):
 def clear_impact_story_cache(sender, instance, **kwargs):
     cache.delete('featured_impact_stories')
     if instance.program:
-        cache.delete(f'program_impact_stories_{instance.program.id}')
\ No newline at end of file
+        cache.delete(f'program_impact_stories_{instance.program.id}')
+
+@receiver(post_save, sender=Page)
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=ImpactStory)
+@receiver(post_save, sender=Announcement)
+def update_search_index(sender, instance, created, update_fields=None, **kwargs):
+    """Re-index the searchable fields the save wrote"""
+    fields = indexed_fields(sender)
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields]
+    elif not created and instance.is_tracking_changes:
+        fields = [field for field in fields if instance.has_changed(field)]
+    if fields:
+        index_objects([instance], fields)
+
+@receiver(post_delete, sender=Page)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=ImpactStory)
+@receiver(post_delete, sender=Announcement)
+def remove_search_entries(sender, instance, **kwargs):
+    remove_from_index(instance)
+
+# Image job status as the media API reports it
+MEDIA_PROCESSING_STATUS = {'running': 'processing', 'completed': 'ready', 'failed': 'failed'}
+
+@receiver(image_job_changed, sender=Media)
+def record_media_processing(sender, job, **kwargs):
+    status = MEDIA_PROCESSING_STATUS.get(job.status)
+    if not status:
+        return
+    # The details, which may name server paths, stay on the job for staff
+    updates = {'processing_status': status,
+               'processing_error': 'The file could not be processed as an image.' if status == 'failed' else ''}
+    if job.finished_at:
+        updates['processed_at'] = job.finished_at
+    # Only while the record still holds the file the job was for
+    Media.objects.filter(pk=job.object_id, file__in=[job.source, job.output or job.source]).update(**updates)
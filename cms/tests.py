@@ -1,9 +1,23 @@
-from django.test import TestCase, Client
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import Category, Page, Media, ImpactStory, Announcement
+from PIL import Image
+
+from core.image_jobs import claim_image_job, run_image_job
+from core.images import compress_to_size, encode_jpeg, load_image
+from core.models import ImageJob, Rendition
+from .models import Category, Page, Media, ImpactStory, Announcement, BlogPost, SearchField
+from .search import rebuild_search_index, search_content, tokenize
+from .views import BlogListView
 
 User = get_user_model()
 
@@ -100,4 +114,222 @@ class APITests(APITestCase):
         self.page.create_version(user=self.user, comment='Initial version')
         response = self.client.get(f'/cms/api/pages/{self.page.slug}/versions/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
\ No newline at end of file
+        self.assertEqual(len(response.data), 1)
+
+class KeysetPaginationAPITests(APITestCase):
+    def setUp(self):
+        self.stories = [
+            ImpactStory.objects.create(title=f'Story {i}', beneficiary_name='Ada', story='Text')
+            for i in range(5)
+        ]
+
+    def test_cursor_pages(self):
+        response = self.client.get('/cms/api/impact-stories/', {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+        self.assertIsNone(response.data['previous'])
+        titles = [story['title'] for story in response.data['results']]
+
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            titles += [story['title'] for story in response.data['results']]
+        self.assertEqual(titles, [f'Story {i}' for i in range(4, -1, -1)])
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([story['title'] for story in response.data['results']], ['Story 2', 'Story 1'])
+
+    def test_count_can_be_skipped(self):
+        response = self.client.get('/cms/api/impact-stories/', {'count': 'false'})
+        self.assertIsNone(response.data['count'])
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/cms/api/impact-stories/', {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def noisy_image(size, mode='RGB'):
+    """An image that does not compress well, like a photo"""
+    bands = [Image.effect_noise((size[0] // 3, size[1] // 3), 60).resize(size, Image.NEAREST) for _ in range(3)]
+    return Image.merge('RGB', bands).convert(mode)
+
+
+@override_settings(IMAGE_MAX_DIMENSION=800, IMAGE_TARGET_BYTES=60 * 1024, IMAGE_MAX_ENCODES=5)
+class MediaCompressionTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def upload(self, img, name, image_format):
+        output = BytesIO()
+        img.save(output, format=image_format)
+        return SimpleUploadedFile(name, output.getvalue())
+
+    def test_large_photo_is_bounded_and_fits(self):
+        upload = self.upload(noisy_image((2400, 1600)), 'photo.jpg', 'JPEG')
+        img = load_image(upload)
+        self.assertEqual(max(img.size), 800)
+
+        data, quality, encodes = compress_to_size(img)
+        self.assertLessEqual(len(data), 60 * 1024)
+        self.assertTrue(1 < encodes <= 5)
+        self.assertGreater(len(encode_jpeg(img, 95)), 60 * 1024)
+
+    def test_small_image_keeps_top_quality(self):
+        upload = self.upload(Image.new('RGB', (300, 200), 'navy'), 'logo.png', 'PNG')
+        data, quality, encodes = compress_to_size(load_image(upload))
+        self.assertEqual((quality, encodes), (95, 1))
+
+    def test_floor_quality_when_nothing_fits(self):
+        img = load_image(self.upload(noisy_image((800, 800)), 'noise.png', 'PNG'))
+        data, quality, encodes = compress_to_size(img, target_bytes=1024, max_encodes=2)
+        self.assertEqual(quality, 10)
+        self.assertEqual(encodes, 2)
+
+    def test_transparent_png_is_flattened_on_white(self):
+        upload = self.upload(Image.new('RGBA', (100, 100), (255, 0, 0, 0)), 'clear.png', 'PNG')
+        img = load_image(upload)
+        self.assertEqual(img.mode, 'RGB')
+        self.assertEqual(img.getpixel((50, 50)), (255, 255, 255))
+
+    def test_media_upload_is_compressed_by_worker(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            media = Media.objects.create(
+                title='Banner', file=self.upload(noisy_image((1600, 1200)), 'banner.jpg', 'JPEG'),
+            )
+            original = media.file.name
+            self.assertEqual(media.processing_status, 'pending')
+            self.assertTrue(default_storage.exists(original))
+
+            job = run_image_job(claim_image_job())
+
+            media.refresh_from_db()
+            self.assertEqual((job.status, media.processing_status), ('completed', 'ready'))
+            self.assertIsNotNone(media.processed_at)
+            self.assertEqual(media.file.name, job.output)
+            self.assertTrue(media.file.name.endswith('banner_compressed.jpg'))
+            self.assertFalse(default_storage.exists(original))
+            with media.file.open('rb') as f, Image.open(f) as img:
+                self.assertEqual(img.size, (800, 600))
+            self.assertLessEqual(media.file.size, 60 * 1024)
+            self.assertTrue(Rendition.objects.filter(source=media.file.name).exists())
+
+            # Editing the record afterwards queues nothing
+            media.title = 'Front banner'
+            media.save()
+            self.assertEqual(ImageJob.objects.count(), 1)
+
+    def test_processing_status_api(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            broken = Media.objects.create(title='Broken', file=SimpleUploadedFile('broken.png', b'not an image'))
+            document = Media.objects.create(title='Report', file=SimpleUploadedFile('report.pdf', b'%PDF'))
+            url = f"{reverse('cms:media-processing')}?ids={broken.pk},{document.pk}"
+
+            response = self.client.get(url)
+            self.assertEqual([item['processing_status'] for item in response.json()], ['pending', 'ready'])
+
+            job = claim_image_job()
+            self.assertEqual(Media.objects.get(pk=broken.pk).processing_status, 'processing')
+            run_image_job(job)
+
+            data = {item['id']: item for item in self.client.get(url).json()}
+            self.assertEqual(data[broken.pk]['processing_status'], 'failed')
+            self.assertTrue(data[broken.pk]['processing_error'])
+            self.assertEqual(data[document.pk]['processing_status'], 'ready')
+
+
+class CMSSearchTests(APITestCase):
+    def setUp(self):
+        self.water = ImpactStory.objects.create(
+            title='Clean water for Ikorodu', beneficiary_name='Amina Bello',
+            story='<p>A borehole brought <strong>clean</strong> water to the school.</p>',
+        )
+        self.school = ImpactStory.objects.create(
+            title='Back to school', beneficiary_name='Tunde Ade',
+            story='<p>Water</p><p>was scarce at home; a scholarship covered the fees.</p>',
+        )
+        self.farm = ImpactStory.objects.create(
+            title='Harvest season', beneficiary_name='Chidi Eze', story='Training in dry-season farming.',
+        )
+
+    def search(self, query):
+        return list(ImpactStory.search(query))
+
+    def test_tokenize_strips_markup(self):
+        self.assertEqual(
+            tokenize('<p>Hello</p><p>World &amp; <b>fr</b>iends</p><script>var x;</script>'),
+            ['hello', 'world', 'friends'],
+        )
+
+    def test_ranked_by_field_weight(self):
+        self.assertEqual(self.search('water'), [self.water, self.school])
+        ranks = [story.search_rank for story in ImpactStory.search('water')]
+        self.assertGreater(ranks[0], ranks[1])
+        self.assertEqual(self.search('drought'), [])
+
+    def test_every_word_required_and_may_be_a_prefix(self):
+        self.assertEqual(self.search('clean bore'), [self.water])
+        self.assertEqual(self.search('water fees'), [self.school])
+        self.assertEqual(self.search('sch'), [self.school, self.water])
+        # Short words only match whole words
+        self.assertEqual(self.search('dr'), [])
+        self.assertEqual(list(search_content(ImpactStory.objects.all(), '!!')), list(ImpactStory.objects.all()))
+
+    def test_every_match_is_returned_and_paged(self):
+        ImpactStory.objects.bulk_create(
+            ImpactStory(title=f'Water point {n}', beneficiary_name='Ada Obi', story='Water. ' * (n % 5 + 1))
+            for n in range(300)
+        )
+        rebuild_search_index()
+        self.assertEqual(len(self.search('water')), 302)
+
+        response = self.client.get('/cms/api/impact-stories/', {'search': 'water', 'page_size': 100})
+        ids = [story['id'] for story in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids += [story['id'] for story in response.data['results']]
+        self.assertEqual(ids, [story.pk for story in ImpactStory.search('water')])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.farm.title = 'Rainwater harvest'
+        self.farm.save()
+        self.assertEqual(self.search('rainwater'), [self.farm])
+
+        entries = set(SearchField.objects.values_list('pk', flat=True))
+        self.farm.is_featured = True
+        self.farm.save()
+        self.assertEqual(set(SearchField.objects.values_list('pk', flat=True)), entries)
+
+        self.water.delete()
+        self.assertEqual(self.search('clean'), [])
+
+        SearchField.objects.all().delete()
+        self.assertEqual(rebuild_search_index(chunk_size=1), 2)
+        self.assertEqual(self.search('rainwater'), [self.farm])
+
+    def test_api_pages_in_rank_order(self):
+        response = self.client.get('/cms/api/impact-stories/', {'search': 'water', 'page_size': 1})
+        titles = [story['title'] for story in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            titles += [story['title'] for story in response.data['results']]
+        self.assertEqual(titles, ['Clean water for Ikorodu', 'Back to school'])
+
+    def test_blog_list_search(self):
+        author = User.objects.create_user(email='writer@example.com', password='x')
+        posts = [
+            BlogPost.objects.create(
+                title=title, slug=slug, author=author, excerpt=excerpt, content=content,
+                status='published', published_at=timezone.now(),
+            )
+            for title, slug, excerpt, content in [
+                ('Scholarship results', 'results', 'Who won this year', '<p>Fifty students</p>'),
+                ('Volunteer day', 'volunteers', 'Scholarship interviews', '<p>Thanks to all</p>'),
+                ('Annual report', 'report', 'Our year', '<p>Scholarship spending rose</p>'),
+            ]
+        ]
+        view = BlogListView()
+        view.setup(RequestFactory().get(reverse('cms:blog_list'), {'search': 'scholarship'}))
+        queryset = view.get_queryset()
+        self.assertEqual(list(queryset), posts)
+        self.assertEqual(view.get_keyset_ordering(queryset), ('-search_rank', '-id'))
@@ -1,17 +1,20 @@
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.urls import reverse_lazy
-from rest_framework import viewsets, permissions, filters
+from django.urls import reverse, reverse_lazy
+from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db.models import F
 from django.utils import timezone
 from drf_yasg.utils import swagger_auto_schema
 from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from drf_yasg import openapi
 from .models import Category, Page, Media, ImpactStory, Announcement, ContentVersion, BlogPost
+from core.pagination import KeysetPagination, KeysetPaginationMixin
+from .search import search_content
 from .serializers import (CategorySerializer, PageSerializer, MediaSerializer,
                         ImpactStorySerializer, AnnouncementSerializer)
 
@@ -110,24 +113,29 @@ class CategoryViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(children, many=True)
         return Response(serializer.data)
 
-class PageViewSet(viewsets.ModelViewSet):
+class SearchRankOrderingMixin:
+    """Keyset pages in ``search_rank`` order while a search is applied"""
+
+    def get_keyset_ordering(self, queryset):
+        if 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', '-id')
+        return self.keyset_ordering
+
+
+class PageViewSet(SearchRankOrderingMixin, viewsets.ModelViewSet):
     serializer_class = PageSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-published_at', '-id')
     lookup_field = 'slug'
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'content', 'meta_description']
 
     def get_queryset(self):
         queryset = Page.objects.all() if self.request.user.is_staff else Page.published.filter(visibility='public')
         
-        # Handle search using MySQL compatible queries
+        # Ranked search through the CMS search index
         search_query = self.request.query_params.get('search', None)
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(content__icontains=search_query) |
-                Q(meta_description__icontains=search_query)
-            )
+            queryset = search_content(queryset, search_query)
         
         return queryset
 
@@ -141,7 +149,8 @@ class PageViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(
         operation_description="List all pages with pagination and filtering",
         manual_parameters=[
-            openapi.Parameter('page', openapi.IN_QUERY, description="Page number", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor from the previous response's next or previous link", type=openapi.TYPE_STRING),
+            openapi.Parameter('count', openapi.IN_QUERY, description="Set to false to skip the total count", type=openapi.TYPE_BOOLEAN),
             openapi.Parameter('page_size', openapi.IN_QUERY, description="Number of items per page", type=openapi.TYPE_INTEGER),
             openapi.Parameter('search', openapi.IN_QUERY, description="Search in title, content", type=openapi.TYPE_STRING),
             openapi.Parameter('status', openapi.IN_QUERY, description="Filter by status", type=openapi.TYPE_STRING, enum=['draft', 'published', 'archived'])
@@ -241,11 +250,14 @@ class MediaViewSet(viewsets.ModelViewSet):
     queryset = Media.objects.all()
     serializer_class = MediaSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-uploaded_at', '-id')
 
     @swagger_auto_schema(
         operation_description="List media files with pagination",
         manual_parameters=[
-            openapi.Parameter('page', openapi.IN_QUERY, description="Page number", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor from the previous response's next or previous link", type=openapi.TYPE_STRING),
+            openapi.Parameter('count', openapi.IN_QUERY, description="Set to false to skip the total count", type=openapi.TYPE_BOOLEAN),
             openapi.Parameter('page_size', openapi.IN_QUERY, description="Number of items per page", type=openapi.TYPE_INTEGER),
         ],
         responses={
@@ -281,12 +293,42 @@ class MediaViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
-class ImpactStoryViewSet(viewsets.ModelViewSet):
+    @swagger_auto_schema(
+        operation_description="Processing status of uploaded media (compression and image renditions)",
+        manual_parameters=[
+            openapi.Parameter('ids', openapi.IN_QUERY, description="Comma-separated media ids", type=openapi.TYPE_STRING),
+        ],
+    )
+    @action(detail=False)
+    def processing(self, request):
+        ids = [pk for pk in request.query_params.get('ids', '').split(',') if pk.strip().isdigit()]
+        media = Media.objects.filter(pk__in=ids[:100])
+        return Response([media_processing_data(item) for item in media])
+
+
+def media_processing_data(media):
+    """What the upload page polls while the image worker handles an upload"""
+    return {
+        'id': media.pk,
+        'processing_status': media.processing_status,
+        'processing_error': media.processing_error,
+        'processed_at': media.processed_at,
+        'url': media.get_file_url(),
+    }
+
+class ImpactStoryViewSet(SearchRankOrderingMixin, viewsets.ModelViewSet):
     queryset = ImpactStory.objects.all()
     serializer_class = ImpactStorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'story', 'beneficiary_name']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        search_query = self.request.query_params.get('search')
+        if search_query:
+            queryset = search_content(queryset, search_query)
+        return queryset
 
     @swagger_auto_schema(
         operation_description="List impact stories with filtering",
@@ -367,6 +409,8 @@ class ImpactStoryDetailView(DetailView):
 class AnnouncementViewSet(viewsets.ModelViewSet):
     serializer_class = AnnouncementSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-publish_date', '-id')
 
     @swagger_auto_schema(
         operation_description="List active announcements",
@@ -404,11 +448,12 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
         return Announcement.get_active()
 
 
-class BlogListView(ListView):
+class BlogListView(SearchRankOrderingMixin, KeysetPaginationMixin, ListView):
     model = BlogPost
     template_name = 'cms/blog_list.html'
     context_object_name = 'posts'
     paginate_by = 9
+    keyset_ordering = ('-published_at', '-id')
 
     def get_queryset(self):
         queryset = BlogPost.objects.filter(
@@ -419,11 +464,7 @@ class BlogListView(ListView):
         # Handle search
         search_query = self.request.GET.get('search')
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(excerpt__icontains=search_query) |
-                Q(content__icontains=search_query)
-            )
+            queryset = search_content(queryset, search_query)
 
         # Handle category filter
         category_slug = self.kwargs.get('category_slug')
@@ -456,7 +497,7 @@ class BlogDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Get related posts based on category and tags
-        post = self.get_object()
+        post = self.object
         related_posts = BlogPost.objects.filter(
             status='published',
             published_at__lte=timezone.now()
@@ -465,9 +506,9 @@ class BlogDetailView(DetailView):
         if post.category:
             related_posts = related_posts.filter(category=post.category)
 
-        # Increment view count
+        # Increment view count in the database without rewriting the post
+        BlogPost.objects.filter(pk=post.pk).update(views_count=F('views_count') + 1)
         post.views_count += 1
-        post.save()
 
         # Get recent posts
         context['recent_posts'] = BlogPost.objects.filter(
@@ -480,11 +521,12 @@ class BlogDetailView(DetailView):
         return context
 
 
-class CategoryListView(ListView):
+class CategoryListView(KeysetPaginationMixin, ListView):
     model = BlogPost
     template_name = 'cms/category_list.html'
     context_object_name = 'posts'
     paginate_by = 9
+    keyset_ordering = ('-published_at', '-id')
 
     def get_queryset(self):
         self.category = get_object_or_404(Category, slug=self.kwargs['slug'])
@@ -525,7 +567,9 @@ def admin_media_upload(request):
                 'success': True,
                 'id': media.id,
                 'title': media.title,
-                'url': media.file.url
+                'url': media.file.url,
+                'processing_status': media.processing_status,
+                'status_url': f"{reverse('cms:media-processing')}?ids={media.id}",
             })
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
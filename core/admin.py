@@ -1,15 +1,12 @@
 from django.contrib import admin
 from django.urls import path, reverse
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.utils.html import format_html
-from django.db import transaction
-from django.core.exceptions import ValidationError
-from datetime import datetime
 import csv
-import io
-from .models import SiteSettings, SliderImage, GalleryImage, TeamMember, Achievement, WhatWeDo, Student
+from .imports import READERS, import_job_status_data, queue_import_job, stream_error_report
+from .models import SiteSettings, SliderImage, GalleryImage, TeamMember, Achievement, WhatWeDo, Student, ImportJob, ImageJob
 
 
 @admin.register(WhatWeDo)
@@ -156,8 +153,11 @@ class StudentAdmin(admin.ModelAdmin):
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
-            path('bulk-upload/', self.bulk_upload_view, name='core_student_bulk_upload'),
-            path('download-template/', self.download_template_view, name='core_student_download_template'),
+            path('bulk-upload/', self.admin_site.admin_view(self.bulk_upload_view), name='core_student_bulk_upload'),
+            path(
+                'download-template/', self.admin_site.admin_view(self.download_template_view),
+                name='core_student_download_template'
+            ),
         ]
         return custom_urls + urls
     
@@ -211,7 +211,7 @@ class StudentAdmin(admin.ModelAdmin):
         return response
     
     def process_bulk_upload(self, request):
-        """Process the uploaded CSV file and create student records"""
+        """Queue the uploaded file for the import worker; the page polls the job for progress"""
         if 'csv_file' not in request.FILES:
             return JsonResponse({
                 'success': False,
@@ -222,171 +222,68 @@ class StudentAdmin(admin.ModelAdmin):
         csv_file = request.FILES['csv_file']
         
         # Validate file type
-        if not csv_file.name.endswith(('.csv', '.xlsx', '.xls')):
+        if not csv_file.name.lower().endswith(tuple(READERS)):
             return JsonResponse({
                 'success': False,
-                'message': 'Invalid file type. Please upload a CSV or Excel file.',
+                'message': 'Invalid file type. Please upload a CSV or Excel (.xlsx) file.',
                 'errors': []
             })
         
-        try:
-            # Read file content
-            if csv_file.name.endswith('.csv'):
-                decoded_file = csv_file.read().decode('utf-8')
-                io_string = io.StringIO(decoded_file)
-                reader = csv.DictReader(io_string)
-            else:
-                # Handle Excel files
-                try:
-                    import pandas as pd
-                    df = pd.read_excel(csv_file)
-                    # Convert DataFrame to CSV format for processing
-                    csv_string = df.to_csv(index=False)
-                    io_string = io.StringIO(csv_string)
-                    reader = csv.DictReader(io_string)
-                except ImportError:
-                    return JsonResponse({
-                        'success': False,
-                        'message': 'Excel files require pandas library. Please use CSV format or install pandas.',
-                        'errors': []
-                    })
-            
-            created_count = 0
-            errors = []
-            
-            with transaction.atomic():
-                for row_num, row in enumerate(reader, start=1):
-                    try:
-                        # Clean and validate data
-                        student_data = self.clean_row_data(row)
-                        
-                        # Create student instance
-                        student = Student(**student_data)
-                        student.created_by = request.user
-                        student.full_clean()  # Validate model
-                        student.save()
-                        
-                        created_count += 1
-                        
-                    except ValidationError as e:
-                        error_msg = f"Validation error: {', '.join(e.messages)}"
-                        errors.append(f"Row {row_num}: {error_msg}")
-                    except Exception as e:
-                        errors.append(f"Row {row_num}: {str(e)}")
-                
-                # If there are too many errors, rollback transaction
-                if len(errors) > created_count:
-                    transaction.set_rollback(True)
-                    return JsonResponse({
-                        'success': False,
-                        'message': f'Too many errors encountered. No students were imported.',
-                        'errors': errors[:20]  # Limit error display
-                    })
-            
-            if created_count > 0:
-                message = f'Successfully imported {created_count} students.'
-                if errors:
-                    message += f' {len(errors)} rows had errors and were skipped.'
-                
-                return JsonResponse({
-                    'success': True,
-                    'message': message,
-                    'errors': errors[:10] if errors else []  # Show first 10 errors
-                })
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'message': 'No students were imported. Please check your file format and data.',
-                    'errors': errors[:10]
-                })
-                
-        except Exception as e:
-            return JsonResponse({
-                'success': False,
-                'message': f'File processing error: {str(e)}',
-                'errors': []
-            })
-    
-    def clean_row_data(self, row):
-        """Clean and validate row data from CSV"""
-        from applications.models import Program
-        
-        cleaned_data = {}
-        
-        # Required fields
-        cleaned_data['full_name'] = row.get('full_name', '').strip()
-        
-        # Date fields
-        date_fields = ['date_of_birth', 'scholarship_start_date', 'scholarship_end_date']
-        for field in date_fields:
-            date_str = row.get(field, '').strip()
-            if date_str:
-                try:
-                    # Try different date formats
-                    for date_format in ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y']:
-                        try:
-                            cleaned_data[field] = datetime.strptime(date_str, date_format).date()
-                            break
-                        except ValueError:
-                            continue
-                    else:
-                        if field == 'date_of_birth' or field == 'scholarship_start_date':
-                            raise ValueError(f"Invalid date format for {field}: {date_str}. Use YYYY-MM-DD format.")
-                except ValueError as e:
-                    raise ValidationError(str(e))
-        
-        # Choice fields with validation
-        gender = row.get('gender', '').strip().lower()
-        if gender:
-            valid_genders = dict(Student.GENDER_CHOICES)
-            if gender not in valid_genders:
-                raise ValidationError(f"Invalid gender: {gender}. Must be one of: {', '.join(valid_genders.keys())}")
-            cleaned_data['gender'] = gender
-        
-        current_class = row.get('current_class', '').strip()
-        if current_class:
-            valid_classes = dict(Student.EDUCATION_LEVEL_CHOICES)
-            if current_class not in valid_classes:
-                raise ValidationError(f"Invalid class: {current_class}. Must be one of: {', '.join(valid_classes.keys())}")
-            cleaned_data['current_class'] = current_class
-        
-        scholarship_status = row.get('scholarship_status', '').strip().lower()
-        if scholarship_status:
-            valid_statuses = dict(Student.SCHOLARSHIP_STATUS_CHOICES)
-            if scholarship_status not in valid_statuses:
-                scholarship_status = 'active'  # Default to active
-            cleaned_data['scholarship_status'] = scholarship_status
-        
-        # Numeric fields
-        scholarship_amount = row.get('scholarship_amount', '').strip()
-        if scholarship_amount:
-            try:
-                cleaned_data['scholarship_amount'] = float(scholarship_amount)
-            except ValueError:
-                raise ValidationError(f"Invalid scholarship amount: {scholarship_amount}. Must be a number.")
-        
-        # Program lookup
-        program_name = row.get('program', '').strip()
-        if program_name:
-            try:
-                program = Program.objects.get(name=program_name)
-                cleaned_data['program'] = program
-            except Program.DoesNotExist:
-                # Just skip the program if not found
-                pass
-        
-        # Other text fields
-        text_fields = [
-            'phone_number', 'email', 'school_name', 'school_address',
-            'guardian_name', 'guardian_relationship', 'guardian_phone', 
-            'guardian_address', 'notes'
+        job = queue_import_job(request.user, 'student', csv_file)
+        return JsonResponse({
+            'success': True,
+            'message': f'"{csv_file.name}" has been queued for import.',
+            'errors': [],
+            'job': import_job_status_data(job),
+        })
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'original_name', 'progress_display', 'created_rows', 'failed_rows', 'requested_by', 'created_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = (
+        'kind', 'file', 'original_name', 'requested_by', 'status', 'total_rows', 'processed_rows',
+        'created_rows', 'failed_rows', 'attempts', 'error', 'created_at', 'started_at', 'finished_at',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def progress_display(self, obj):
+        return f'{obj.progress}%'
+    progress_display.short_description = 'Progress'
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('<int:pk>/status/', self.admin_site.admin_view(self.status_view), name='core_importjob_status'),
+            path('<int:pk>/errors/', self.admin_site.admin_view(self.errors_view), name='core_importjob_errors'),
         ]
-        
-        for field in text_fields:
-            value = row.get(field, '').strip()
-            if value:
-                cleaned_data[field] = value
-        
-        return cleaned_data
+        return custom_urls + urls
+
+    def status_view(self, request, pk):
+        """Progress of an import as JSON, polled by the upload pages"""
+        job = get_object_or_404(ImportJob, pk=pk)
+        return JsonResponse(import_job_status_data(job))
+
+    def errors_view(self, request, pk):
+        """Download the rows an import skipped, with the reasons"""
+        job = get_object_or_404(ImportJob, pk=pk)
+        response = StreamingHttpResponse(stream_error_report(job), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="import_{job.pk}_errors.csv"'
+        return response
 
 
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'model', 'object_id', 'compress', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'model')
+    search_fields = ('source', 'output')
+    readonly_fields = (
+        'model', 'object_id', 'field', 'source', 'output', 'compress', 'status', 'attempts', 'error',
+        'created_at', 'started_at', 'finished_at',
+    )
+
+    def has_add_permission(self, request):
+        return False
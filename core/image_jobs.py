@@ -0,0 +1,146 @@
+"""
+Background processing of uploaded images.
+
+Saving a record with a new image in one of RENDITION_FIELDS or
+COMPRESSED_FIELDS queues an ImageJob instead of decoding the upload in the
+request, so the original is stored and the request returns at once. The
+``process_image_jobs`` worker, at most IMAGE_MAX_CONCURRENT_JOBS at a time,
+compresses the file where asked (replacing the stored original with the
+compressed JPEG), renders its variants and sends ``image_job_changed`` so
+the owning model can record progress, as cms.Media does.
+"""
+import logging
+import os
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .images import compress_image_file
+from .jobs import claim_job
+from .models import ImageJob, Rendition
+from .renditions import RENDITION_FIELDS, build_renditions, is_renderable, store_renditions
+
+logger = logging.getLogger(__name__)
+
+# Image fields whose uploads are replaced by a compressed JPEG (see core.images)
+COMPRESSED_FIELDS = {
+    'cms.Media': ['file'],
+}
+
+# Sent with ``job`` whenever an ImageJob starts or finishes; the sender is the owning model
+image_job_changed = Signal()
+
+
+def queued_fields(model_label):
+    fields = list(RENDITION_FIELDS.get(model_label, []))
+    return fields + [field for field in COMPRESSED_FIELDS.get(model_label, []) if field not in fields]
+
+
+def queue_image_jobs(instance, fields=None):
+    """
+    Queue the images of ``instance``, or of its ``fields``, that have not
+    been processed yet.
+
+    An image counts as processed once a job was queued for it, or its
+    compressed replacement, or it has renditions.
+    """
+    label = instance._meta.label
+    names = {field: getattr(instance, field).name for field in fields or queued_fields(label)}
+    names = {field: name for field, name in names.items() if is_renderable(name)}
+    if not names:
+        return []
+
+    seen = set(Rendition.objects.filter(source__in=names.values()).values_list('source', flat=True))
+    for source, output in ImageJob.objects.filter(
+        Q(source__in=names.values()) | Q(output__in=names.values())
+    ).values_list('source', 'output'):
+        seen.update((source, output))
+
+    compressed = COMPRESSED_FIELDS.get(label, [])
+    jobs = [
+        ImageJob(model=label, object_id=str(instance.pk), field=field, source=name, compress=field in compressed)
+        for field, name in names.items() if name not in seen
+    ]
+    return ImageJob.objects.bulk_create(jobs)
+
+
+def claim_image_job(max_running=None):
+    """
+    Mark the oldest queued job as running and return it.
+
+    Returns None when nothing is queued or IMAGE_MAX_CONCURRENT_JOBS jobs
+    are already running. Jobs running for longer than IMAGE_JOB_TIMEOUT are
+    queued again, or marked failed after IMAGE_JOB_MAX_ATTEMPTS tries.
+    """
+    max_running = max_running or getattr(settings, 'IMAGE_MAX_CONCURRENT_JOBS', 2)
+    max_attempts = getattr(settings, 'IMAGE_JOB_MAX_ATTEMPTS', 3)
+    now = timezone.now()
+    stale = ImageJob.objects.filter(
+        status='running', updated_at__lt=now - timedelta(seconds=getattr(settings, 'IMAGE_JOB_TIMEOUT', 300))
+    )
+    for job in stale.filter(attempts__gte=max_attempts):
+        job.status, job.error, job.finished_at = 'failed', 'The image worker stopped responding.', now
+        job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+        job_changed(job)
+    stale.update(status='queued', updated_at=now)
+
+    job = claim_job(
+        ImageJob, max_running, started_at=Coalesce(F('started_at'), now), attempts=F('attempts') + 1, updated_at=now,
+    )
+    if job:
+        job_changed(job)
+    return job
+
+
+def run_image_job(job):
+    """Compress and render a claimed job's image and record the outcome"""
+    try:
+        process_image(job)
+    except Exception as exc:
+        logger.exception("Image job %s failed", job.pk)
+        job.status = 'failed'
+        job.error = str(exc)
+    else:
+        job.status = 'completed'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'output', 'finished_at', 'updated_at'])
+    job_changed(job)
+    return job
+
+
+def process_image(job):
+    model = apps.get_model(job.model)
+    storage = model._meta.get_field(job.field).storage
+    owner = model._default_manager.filter(pk=job.object_id)
+    if not owner.filter(**{job.field: job.source}).exists():
+        # The record was deleted or given another file since the upload
+        return
+
+    source = job.source
+    if job.compress:
+        with storage.open(source, 'rb') as image_file:
+            compressed = compress_image_file(image_file)
+        output = storage.save(f"{os.path.splitext(source)[0]}_compressed.jpg", compressed)
+        # Saved with update() so the new name does not queue another job
+        if not owner.filter(**{job.field: source}).update(**{job.field: output}):
+            storage.delete(output)
+            return
+        storage.delete(source)
+        job.output = source = output
+
+    if job.field in RENDITION_FIELDS.get(job.model, []):
+        with storage.open(source, 'rb') as image_file:
+            store_renditions(source, build_renditions(image_file))
+
+
+def job_changed(job):
+    try:
+        model = apps.get_model(job.model)
+    except LookupError:
+        return
+    image_job_changed.send(sender=model, job=job)
@@ -0,0 +1,114 @@
+"""
+JPEG compression to a byte budget.
+
+An upload is decoded once, scaled down so neither side is longer than
+IMAGE_MAX_DIMENSION, and then encoded at a few qualities picked by binary
+search: the highest quality that fits in IMAGE_TARGET_BYTES wins. JPEG
+sources are decoded at reduced scale when they are much larger than the
+bound, so a 6000×4000 photo never has to be held at full size.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+
+MIN_QUALITY = 10
+MAX_QUALITY = 95
+
+
+def image_max_dimension():
+    return getattr(settings, 'IMAGE_MAX_DIMENSION', 2560)
+
+
+def image_target_bytes():
+    return getattr(settings, 'IMAGE_TARGET_BYTES', 200 * 1024)
+
+
+def image_max_encodes():
+    return getattr(settings, 'IMAGE_MAX_ENCODES', 5)
+
+
+def open_image(image_file, draft_size=None):
+    """
+    Decode ``image_file`` as an RGB or greyscale image, flattening transparency onto white.
+
+    A JPEG is decoded at the smallest DCT scale still covering ``draft_size``,
+    skipping detail a downscale would throw away anyway.
+    """
+    img = Image.open(image_file)
+    if draft_size:
+        img.draft('RGB', draft_size)
+    img.load()
+
+    if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        img = background
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    return img
+
+
+def load_image(image_file, max_dimension=None):
+    """Decode ``image_file`` no larger than ``max_dimension`` on its longest side"""
+    max_dimension = max_dimension or image_max_dimension()
+    img = open_image(image_file, (max_dimension, max_dimension))
+    if max(img.size) > max_dimension:
+        img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    return img
+
+
+def encode_jpeg(img, quality):
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def compress_to_size(img, target_bytes=None, max_encodes=None):
+    """
+    Encode ``img`` as JPEG at the highest quality that fits in ``target_bytes``.
+
+    Returns ``(data, quality, encodes)``. The top quality is tried first, as
+    most bounded images already fit; the rest of the budget bisects the
+    range below it, except that the last encode goes to the lowest quality
+    if nothing has fit by then. When nothing fits, the smallest encode is
+    returned. At most ``max_encodes`` encodes are made.
+    """
+    target_bytes = target_bytes or image_target_bytes()
+    max_encodes = max(max_encodes or image_max_encodes(), 1)
+
+    data = encode_jpeg(img, MAX_QUALITY)
+    encodes = 1
+    if len(data) <= target_bytes:
+        return data, MAX_QUALITY, encodes
+
+    best = None
+    smallest = (data, MAX_QUALITY)
+    low, high = MIN_QUALITY, MAX_QUALITY - 1
+    while low <= high and encodes < max_encodes:
+        if best is None and encodes == max_encodes - 1:
+            # Every quality tried so far was too big; the floor is the best chance left
+            quality = MIN_QUALITY
+        else:
+            quality = (low + high) // 2
+        data = encode_jpeg(img, quality)
+        encodes += 1
+        if len(data) <= target_bytes:
+            best = (data, quality)
+            low = quality + 1
+        else:
+            high = quality - 1
+            if len(data) < len(smallest[0]):
+                smallest = (data, quality)
+
+    data, quality = best or smallest
+    return data, quality, encodes
+
+
+def compress_image_file(image_file, target_bytes=None, max_dimension=None):
+    """An uploaded image as a bounded JPEG ContentFile of at most ``target_bytes`` where possible"""
+    img = load_image(image_file, max_dimension)
+    data, _quality, _encodes = compress_to_size(img, target_bytes)
+    return ContentFile(data)
@@ -0,0 +1,482 @@
+"""
+Background spreadsheet imports.
+
+An upload (CSV or .xlsx, both read incrementally) is stored as an
+ImportJob and imported by the ``process_import_jobs`` worker,
+IMPORT_BATCH_SIZE rows at a time. Each
+chunk's records, its rejected rows (ImportRowError) and the job's
+``processed_rows`` checkpoint are committed in one transaction. A job
+whose worker stops reporting for IMPORT_JOB_TIMEOUT seconds is queued
+again and resumes after the last committed row, so no row is imported
+twice. Rejected rows never undo the rows imported around them; they are
+listed with their sheet row numbers in the job's error report. The admin upload pages poll ``import_job_status_data`` for progress.
+"""
+import csv
+import io
+import logging
+import os
+import re
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from openpyxl import load_workbook
+
+from applications.models import Program
+
+from .jobs import claim_job
+from .models import ImportJob, ImportRowError, Student
+from .utils import Echo
+
+logger = logging.getLogger(__name__)
+
+IMPORTERS = {
+    'student': 'core.imports.StudentImporter',
+    'beneficiary': 'applications.importers.BeneficiaryImporter',
+}
+
+# Row errors shown on the upload page; the rest are in the downloadable report
+STATUS_ERROR_LIMIT = 10
+
+
+class ImportJobTakenOver(Exception):
+    """Another worker committed this job's next chunk first"""
+
+
+def import_batch_size():
+    return getattr(settings, 'IMPORT_BATCH_SIZE', 500)
+
+
+def read_csv(file):
+    """
+    ``(row number, row)`` pairs of an uploaded CSV, read incrementally.
+
+    Rows are dicts keyed by the header and numbered by the line of the file
+    they start on, header first, so blank lines and line breaks inside
+    quoted cells are counted. A UTF-8 byte order mark is skipped.
+    """
+    file.seek(0)
+    stream = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        records = csv.reader(stream)
+        header = next(records, [])
+        number = records.line_num + 1
+        for values in records:
+            if values:
+                yield number, dict(zip(header, values))
+            number = records.line_num + 1
+    finally:
+        # Leave the file to its owner rather than closing it with the wrapper
+        if not file.closed:
+            stream.detach()
+
+
+def cell_text(value):
+    """A spreadsheet cell as the text a CSV export of the sheet would hold"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == time.min else value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def read_xlsx(file):
+    """
+    ``(row number, row)`` pairs of the first sheet of an uploaded workbook.
+
+    Rows are dicts of strings keyed by the first row. The workbook is opened
+    read-only, so rows are parsed from the file as they are iterated and
+    memory use depends on the row width, not the number of rows. Blank rows
+    are skipped; the numbers are still the sheet's.
+    """
+    file.seek(0)
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [cell_text(value).strip() for value in next(rows, ())]
+        for number, values in enumerate(rows, start=2):
+            if all(value is None or value == '' for value in values):
+                continue
+            yield number, dict(zip(header, map(cell_text, values)))
+    finally:
+        workbook.close()
+
+
+READERS = {
+    '.csv': read_csv,
+    '.xlsx': read_xlsx,
+}
+
+
+def read_rows(file, name):
+    extension = os.path.splitext(name)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f'Unsupported file type "{extension}". Upload a CSV or .xlsx file.')
+    return READERS[extension](file)
+
+
+class RowImporter:
+    """
+    Import the rows of an ImportJob's file.
+
+    Subclasses set ``columns`` and implement ``build(row)``, returning an
+    unsaved, validated instance or raising ValidationError, and
+    ``save_batch(objects)``.
+    """
+    columns = ()
+
+    def __init__(self, job):
+        self.job = job
+
+    def rows(self):
+        return read_rows(self.job.file, self.job.original_name)
+
+    def count_rows(self):
+        with self.job.file.open('rb') as file:
+            return sum(1 for _ in read_rows(file, self.job.original_name))
+
+    def build(self, row):
+        raise NotImplementedError
+
+    def build_batch(self, rows):
+        """``(objects, errors)`` for a chunk of rows; errors are ``(index, exception)`` pairs"""
+        objects, errors = [], []
+        for index, row in enumerate(rows):
+            try:
+                objects.append(self.build(row))
+            except ValidationError as exc:
+                errors.append((index, exc))
+        return objects, errors
+
+    def save_batch(self, objects):
+        raise NotImplementedError
+
+    def error_message(self, exc):
+        if hasattr(exc, 'message_dict'):
+            return '; '.join(
+                ' '.join(errors) if field == '__all__' else f'{field}: {" ".join(errors)}'
+                for field, errors in exc.message_dict.items()
+            )
+        return ' '.join(exc.messages)
+
+    def import_chunk(self, rows):
+        """
+        Import one chunk of ``(row number, row)`` pairs and move the job's
+        checkpoint past it, atomically
+        """
+        job = self.job
+        numbers, rows = zip(*rows)
+        objects, errors = self.build_batch(rows)
+        row_errors = [
+            ImportRowError(
+                job=job, row=numbers[index], message=self.error_message(exc),
+                values={column: rows[index].get(column) or '' for column in self.columns},
+            )
+            for index, exc in errors
+        ]
+        with transaction.atomic():
+            if objects:
+                self.save_batch(objects)
+            ImportRowError.objects.bulk_create(row_errors)
+            checkpointed = ImportJob.objects.filter(
+                pk=job.pk, status='running', processed_rows=job.processed_rows
+            ).update(
+                processed_rows=F('processed_rows') + len(rows),
+                created_rows=F('created_rows') + len(objects),
+                failed_rows=F('failed_rows') + len(row_errors),
+                updated_at=timezone.now(),
+            )
+            if not checkpointed:
+                raise ImportJobTakenOver(job.pk)
+        job.processed_rows += len(rows)
+        job.created_rows += len(objects)
+        job.failed_rows += len(row_errors)
+
+    def run(self, batch_size=None):
+        batch_size = batch_size or import_batch_size()
+        if self.job.total_rows is None:
+            self.job.total_rows = self.count_rows()
+            ImportJob.objects.filter(pk=self.job.pk).update(total_rows=self.job.total_rows)
+
+        with self.job.file.open('rb'):
+            rows = islice(self.rows(), self.job.processed_rows, None)
+            while True:
+                chunk = list(islice(rows, batch_size))
+                if not chunk:
+                    break
+                self.import_chunk(chunk)
+
+
+class StudentImporter(RowImporter):
+    """
+    Scholarship students, in the columns of the admin's download template.
+
+    A chunk is validated column by column rather than row by row: each
+    column is checked for the rows that passed the columns before it, so
+    every row gets the same first error, with the same message, as when
+    rows were cleaned one at a time.
+    """
+    columns = (
+        'full_name', 'date_of_birth', 'gender', 'phone_number', 'email',
+        'school_name', 'school_address', 'current_class', 'program',
+        'scholarship_amount', 'scholarship_start_date', 'scholarship_end_date',
+        'scholarship_status', 'guardian_name', 'guardian_relationship',
+        'guardian_phone', 'guardian_address', 'notes',
+    )
+    date_fields = ('date_of_birth', 'scholarship_start_date', 'scholarship_end_date')
+    required_date_fields = ('date_of_birth', 'scholarship_start_date')
+    date_formats = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y')
+    text_fields = (
+        'phone_number', 'email', 'school_name', 'school_address',
+        'guardian_name', 'guardian_relationship', 'guardian_phone',
+        'guardian_address', 'notes',
+    )
+    # Resolved by the importer, so model validation skips them
+    unvalidated_fields = ('program', 'created_by')
+
+    genders = frozenset(dict(Student.GENDER_CHOICES))
+    classes = frozenset(dict(Student.EDUCATION_LEVEL_CHOICES))
+    statuses = frozenset(dict(Student.SCHOLARSHIP_STATUS_CHOICES))
+    gender_list = ', '.join(dict(Student.GENDER_CHOICES))
+    class_list = ', '.join(dict(Student.EDUCATION_LEVEL_CHOICES))
+
+    iso_date = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+    def __init__(self, job):
+        super().__init__(job)
+        self.programs = {}
+        self.dates = {}
+
+    def parse_date(self, value):
+        """The date of the first format in ``date_formats`` that reads ``value``, or None"""
+        if value not in self.dates:
+            parsed = None
+            if self.iso_date.fullmatch(value):
+                # The common case; fromisoformat reads exactly what '%Y-%m-%d' reads here
+                try:
+                    parsed = date.fromisoformat(value)
+                except ValueError:
+                    pass
+            if parsed is None:
+                for date_format in self.date_formats:
+                    try:
+                        parsed = datetime.strptime(value, date_format).date()
+                        break
+                    except ValueError:
+                        continue
+            self.dates[value] = parsed
+        return self.dates[value]
+
+    def load_programs(self, names):
+        """Resolve the program names not seen yet with one IN query; unknown names map to None"""
+        missing = {name for name in names if name not in self.programs}
+        if not missing:
+            return
+        for program in Program.objects.filter(name__in=missing).order_by('pk'):
+            self.programs.setdefault(program.name, program)
+        for name in missing:
+            self.programs.setdefault(name, None)
+
+    def build_batch(self, rows):
+        errors = {}
+        cleaned = [{'full_name': (row.get('full_name') or '').strip()} for row in rows]
+
+        def column(name, lower=False):
+            """(index, value) of the stripped, non-empty values of rows still valid"""
+            for index, row in enumerate(rows):
+                if index in errors:
+                    continue
+                value = (row.get(name) or '').strip()
+                if value:
+                    yield index, value.lower() if lower else value
+
+        for field in self.date_fields:
+            for index, value in column(field):
+                parsed = self.parse_date(value)
+                if parsed is not None:
+                    cleaned[index][field] = parsed
+                elif field in self.required_date_fields:
+                    errors[index] = ValidationError(
+                        f"Invalid date format for {field}: {value}. Use YYYY-MM-DD format."
+                    )
+
+        for index, gender in column('gender', lower=True):
+            if gender not in self.genders:
+                errors[index] = ValidationError(f"Invalid gender: {gender}. Must be one of: {self.gender_list}")
+            else:
+                cleaned[index]['gender'] = gender
+
+        for index, current_class in column('current_class'):
+            if current_class not in self.classes:
+                errors[index] = ValidationError(
+                    f"Invalid class: {current_class}. Must be one of: {self.class_list}"
+                )
+            else:
+                cleaned[index]['current_class'] = current_class
+
+        for index, scholarship_status in column('scholarship_status', lower=True):
+            # Unknown statuses default to active
+            cleaned[index]['scholarship_status'] = scholarship_status if scholarship_status in self.statuses else 'active'
+
+        for index, amount in column('scholarship_amount'):
+            try:
+                cleaned[index]['scholarship_amount'] = float(amount)
+            except ValueError:
+                errors[index] = ValidationError(f"Invalid scholarship amount: {amount}. Must be a number.")
+
+        # An unknown program is left empty
+        program_names = list(column('program'))
+        self.load_programs(name for _, name in program_names)
+        for index, name in program_names:
+            if self.programs[name] is not None:
+                cleaned[index]['program'] = self.programs[name]
+
+        for field in self.text_fields:
+            for index, value in column(field):
+                cleaned[index][field] = value
+
+        students = {
+            index: Student(created_by_id=self.job.requested_by_id, **data)
+            for index, data in enumerate(cleaned) if index not in errors
+        }
+        errors.update(self.validate_fields(students))
+        return (
+            [student for index, student in students.items() if index not in errors],
+            sorted(errors.items()),
+        )
+
+    def validate_fields(self, students):
+        """
+        Model field validation, one column at a time.
+
+        Does what ``full_clean`` does for a Student, which has no unique
+        fields or constraints, and raises the same errors in the same order.
+        """
+        field_errors = {}
+        for field in Student._meta.fields:
+            if field.name in self.unvalidated_fields or field.generated:
+                continue
+            for index, student in students.items():
+                raw_value = getattr(student, field.attname)
+                if field.blank and raw_value in field.empty_values:
+                    continue
+                try:
+                    setattr(student, field.attname, field.clean(raw_value, student))
+                except ValidationError as exc:
+                    field_errors.setdefault(index, {})[field.name] = exc.error_list
+        return {index: ValidationError(errors) for index, errors in field_errors.items()}
+
+    def build(self, row):
+        objects, errors = self.build_batch([row])
+        if errors:
+            raise errors[0][1]
+        return objects[0]
+
+    def error_message(self, exc):
+        return f"Validation error: {', '.join(exc.messages)}"
+
+    def save_batch(self, objects):
+        Student.objects.bulk_create(objects)
+
+
+def get_importer(job):
+    return import_string(IMPORTERS[job.kind])(job)
+
+
+def queue_import_job(user, kind, uploaded_file):
+    """Store an upload and queue it for the import worker"""
+    job = ImportJob(requested_by=user, kind=kind, original_name=uploaded_file.name)
+    job.file.save(uploaded_file.name, uploaded_file, save=False)
+    job.save()
+    return job
+
+
+def claim_import_job(max_running=None):
+    """
+    Mark the oldest queued job as running and return it.
+
+    Returns None when nothing is queued or IMPORT_MAX_CONCURRENT_JOBS jobs
+    are already running. Jobs that stopped reporting progress for longer
+    than IMPORT_JOB_TIMEOUT are queued again to resume, or marked failed
+    after IMPORT_JOB_MAX_ATTEMPTS tries.
+    """
+    max_running = max_running or getattr(settings, 'IMPORT_MAX_CONCURRENT_JOBS', 2)
+    max_attempts = getattr(settings, 'IMPORT_JOB_MAX_ATTEMPTS', 3)
+    now = timezone.now()
+    stale = ImportJob.objects.filter(
+        status='running', updated_at__lt=now - timedelta(seconds=getattr(settings, 'IMPORT_JOB_TIMEOUT', 600))
+    )
+    stale.filter(attempts__gte=max_attempts).update(
+        status='failed', error='The import worker stopped responding.', finished_at=now, updated_at=now
+    )
+    stale.update(status='queued', updated_at=now)
+
+    return claim_job(
+        ImportJob, max_running, started_at=Coalesce(F('started_at'), now), attempts=F('attempts') + 1, updated_at=now,
+    )
+
+
+def run_import_job(job, batch_size=None):
+    """Import a claimed job from its checkpoint and record the outcome"""
+    try:
+        get_importer(job).run(batch_size)
+    except ImportJobTakenOver:
+        logger.warning("Import job %s was resumed by another worker", job.pk)
+        return job
+    except Exception as exc:
+        logger.exception("Import job %s failed", job.pk)
+        job.status = 'failed'
+        job.error = str(exc)
+    else:
+        job.status = 'completed'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'total_rows', 'finished_at', 'updated_at'])
+    return job
+
+
+def import_job_status_data(job):
+    """What the upload pages poll: progress, counts and the first row errors"""
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'processed_rows': job.processed_rows,
+        'total_rows': job.total_rows,
+        'created_rows': job.created_rows,
+        'failed_rows': job.failed_rows,
+        'error': job.error,
+        'errors': [
+            {'row': row, 'message': message}
+            for row, message in job.row_errors.values_list('row', 'message')[:STATUS_ERROR_LIMIT]
+        ],
+        'status_url': reverse('admin:core_importjob_status', args=[job.pk]),
+        'error_report_url': reverse('admin:core_importjob_errors', args=[job.pk]) if job.failed_rows else None,
+    }
+
+
+def stream_error_report(job, rows_per_chunk=500):
+    """The job's rejected rows as CSV text: line number, reason and the original values"""
+    columns = get_importer(job).columns
+    writer = csv.writer(Echo())
+    yield writer.writerow(['row', 'error', *columns])
+    buffer = []
+    for row, message, values in job.row_errors.order_by('row').values_list('row', 'message', 'values').iterator():
+        buffer.append(writer.writerow([row, message, *(values.get(column, '') for column in columns)]))
+        if len(buffer) >= rows_per_chunk:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
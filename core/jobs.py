@@ -0,0 +1,82 @@
+"""
+Claiming work from the background job tables.
+
+Export, import and image jobs share a life cycle: rows are created
+``queued``, a worker claims the oldest one by marking it ``running``, and
+at most a configured number run at once. ``claim_job`` does the claim for
+all of them, and ``WorkerCommand`` is the polling loop of their workers.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+def claim_job(model, max_running, **updates):
+    """
+    Mark the oldest queued ``model`` job as running and return it.
+
+    ``updates`` are written along with the status. Returns None when nothing
+    is queued or ``max_running`` jobs are already running. Every claim locks
+    the oldest queued job before counting the running ones, so concurrent
+    workers take turns and the cap holds. (SQLite ignores the locks, but it
+    only allows one writer at a time anyway.)
+    """
+    with transaction.atomic():
+        pk = (model.objects.select_for_update().filter(status='queued')
+              .order_by('created_at', 'pk').values_list('pk', flat=True).first())
+        if pk is None:
+            return None
+        running = model.objects.select_for_update().filter(status='running').values_list('pk', flat=True)
+        if len(running) >= max_running:
+            return None
+        model.objects.filter(pk=pk).update(status='running', **updates)
+    return model.objects.get(pk=pk)
+
+
+class WorkerCommand(BaseCommand):
+    """
+    A management command that polls for background work.
+
+    Subclasses implement ``process_one(options)``: it does one unit of work
+    and returns ``{counter: amount}`` to add to the totals, or None when
+    there is nothing to do, in which case the command sleeps ``--interval``
+    seconds, or exits with ``--once``. The totals of ``counters`` are
+    printed on exit, Ctrl-C included. Setting ``max_concurrent_setting``
+    adds ``--max-concurrent``, defaulting to that setting.
+    """
+    interval = 5
+    counters = ('completed', 'failed')
+    max_concurrent_setting = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Process the queued work and exit instead of polling')
+        parser.add_argument('--interval', type=float, default=self.interval,
+                            help=f'Seconds to sleep when there is nothing to do (default: {self.interval:g})')
+        if self.max_concurrent_setting:
+            parser.add_argument('--max-concurrent', type=int, default=None,
+                                help=f'Running jobs allowed across all workers (default: {self.max_concurrent_setting})')
+
+    def process_one(self, options):
+        raise NotImplementedError('subclasses of WorkerCommand must provide a process_one() method')
+
+    def handle(self, *args, **options):
+        totals = dict.fromkeys(self.counters, 0)
+        try:
+            while True:
+                counts = self.process_one(options)
+                if counts is not None:
+                    for name, amount in counts.items():
+                        if name in totals:
+                            totals[name] += amount
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            'Done: ' + ', '.join(f'{totals[name]} {name}' for name in self.counters)
+        ))
@@ -0,0 +1,84 @@
+import csv
+import gc
+import io
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from openpyxl import Workbook
+
+from core.imports import StudentImporter, read_xlsx
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Command(BaseCommand):
+    help = ('Benchmark reading a student .xlsx upload: the streaming openpyxl reader against the '
+            'old pandas read_excel -> CSV -> DictReader path. Only parsing is measured; nothing is saved.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000],
+                            help='Row counts to benchmark (default: 1000 10000 50000)')
+        parser.add_argument('--skip-legacy', action='store_true',
+                            help='Only measure the streaming reader, not the pandas path')
+
+    def handle(self, *args, **options):
+        try:
+            import pandas  # noqa: F401
+        except ImportError:
+            if not options['skip_legacy']:
+                self.stdout.write(self.style.WARNING('pandas is not installed; only the streaming reader is measured.'))
+            options['skip_legacy'] = True
+
+        self.stdout.write(f"{'rows':>9} {'path':<10} {'total (s)':>10} {'peak heap (MB)':>15} {'max RSS (MB)':>13}")
+
+        for row_count in sorted(options['rows']):
+            with tempfile.TemporaryFile() as workbook:
+                self.write_workbook(workbook, row_count)
+
+                self.report(row_count, 'streaming', self.measure(lambda: read_xlsx(workbook)))
+                if not options['skip_legacy']:
+                    self.report(row_count, 'legacy', self.measure(lambda: self.legacy_rows(workbook)))
+
+        self.stdout.write('peak heap = Python allocations traced by tracemalloc (timings include its '
+                          'overhead); max RSS is the process high-water mark so far.')
+
+    def write_workbook(self, output, row_count):
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(StudentImporter.columns)
+        for i in range(row_count):
+            sheet.append([
+                f'Student {i}', '2010-05-15', 'female', '08012345678', f'student{i}@example.com',
+                'Sample Primary School', '123 School Street, Lagos', 'primary_5', '', 50000,
+                '2024-01-15', '', 'active', 'Jane Doe', 'Mother', '08087654321', '456 Home Street, Lagos', '',
+            ])
+        workbook.save(output)
+
+    def legacy_rows(self, workbook):
+        """The Excel path as it worked before streaming"""
+        import pandas as pd
+        workbook.seek(0)
+        df = pd.read_excel(workbook)
+        csv_string = df.to_csv(index=False)
+        return csv.DictReader(io.StringIO(csv_string))
+
+    def measure(self, make_rows):
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        for _ in make_rows():
+            pass
+        total = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else 0
+        return total, peak / 2 ** 20, max_rss
+
+    def report(self, rows, path, result):
+        total, peak, max_rss = result
+        self.stdout.write(f'{rows:>9} {path:<10} {total:>10.2f} {peak:>15.1f} {max_rss:>13.1f}')
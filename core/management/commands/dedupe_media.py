@@ -0,0 +1,127 @@
+import errno
+import os
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import FileField
+from django.utils.module_loading import import_string
+
+from core.storage import DedupFileSystemStorage, file_digest
+
+
+class Command(BaseCommand):
+    help = ('Move the files in the upload directories of the deduplicating storage into its '
+            'content-addressed blob store, replacing identical files with hard links to one copy, '
+            'and remove blobs no file uses any more')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report the duplicates and the space they use without changing anything')
+
+    def handle(self, *args, **options):
+        storage = DedupFileSystemStorage()
+        dry_run = options['dry_run']
+        self.check_same_device(storage)
+
+        by_digest = defaultdict(list)
+        for path in self.files(storage):
+            by_digest[file_digest(path)].append(path)
+
+        merged = reclaimed = 0
+        for digest, paths in by_digest.items():
+            blob = storage.blob_path(digest)
+            if dry_run:
+                inodes = {}
+                for path in paths:
+                    stat = os.stat(path)
+                    inodes.setdefault((stat.st_dev, stat.st_ino), stat.st_size)
+                merged += len(paths) - 1
+                reclaimed += sum(inodes.values()) - next(iter(inodes.values()))
+                continue
+
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                self.link(paths[0], blob)
+            for path in paths:
+                stat = os.stat(path)
+                if os.path.samestat(stat, os.stat(blob)):
+                    continue
+                # Swap the copy for a link in one step so the name is never missing
+                tmp_path = f'{path}.dedupe'
+                self.link(blob, tmp_path)
+                os.replace(tmp_path, path)
+                merged += 1
+                if stat.st_nlink == 1:
+                    reclaimed += stat.st_size
+
+        collected = 0 if dry_run else self.collect(storage.blob_location)
+        prefix = 'Would merge' if dry_run else 'Merged'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} {merged} duplicate files in {len(by_digest)} distinct contents, '
+            f'{reclaimed / 2 ** 20:.1f} MB reclaimed; removed {collected} unused blobs'
+        ))
+
+    def upload_directories(self):
+        """The directories under MEDIA_ROOT that the deduplicating storage saves to"""
+        directories = set()
+        backend = getattr(settings, 'CKEDITOR_STORAGE_BACKEND', None)
+        if backend and issubclass(import_string(backend), DedupFileSystemStorage):
+            directories.add(settings.CKEDITOR_UPLOAD_PATH)
+        for model in apps.get_models():
+            for field in model._meta.get_fields():
+                if (isinstance(field, FileField) and isinstance(field.storage, DedupFileSystemStorage)
+                        and isinstance(field.upload_to, str)):
+                    # Date-based paths such as 'receipts/%Y/' are walked from their fixed part
+                    directories.add(field.upload_to.split('%')[0])
+        directories = sorted(os.path.normpath(directory.strip('/')) for directory in directories)
+        # Nested directories are walked with their parent
+        return [
+            directory for index, directory in enumerate(directories)
+            if not any(directory.startswith(parent + os.sep) for parent in directories[:index])
+        ]
+
+    def files(self, storage):
+        blob_location = os.path.normpath(storage.blob_location)
+        for upload_directory in self.upload_directories():
+            location = os.path.normpath(storage.path(upload_directory))
+            for directory, directories, files in os.walk(location):
+                directories[:] = [name for name in directories if os.path.join(directory, name) != blob_location]
+                for filename in files:
+                    path = os.path.join(directory, filename)
+                    if os.path.isfile(path) and not os.path.islink(path):
+                        yield path
+
+    def check_same_device(self, storage):
+        blob_location = storage.blob_location
+        while not os.path.exists(blob_location):
+            blob_location = os.path.dirname(blob_location)
+        if os.stat(blob_location).st_dev != os.stat(storage.location).st_dev:
+            raise self.cross_device_error(storage.blob_location, storage.location)
+
+    def link(self, source, destination):
+        try:
+            os.link(source, destination)
+        except OSError as e:
+            if e.errno == errno.EXDEV:
+                raise self.cross_device_error(source, destination) from e
+            raise
+
+    def cross_device_error(self, first, second):
+        return CommandError(
+            f'{first} and {second} are on different file systems, and hard links cannot cross them. '
+            'Keep DEDUP_BLOB_ROOT and every upload directory on the same file system as MEDIA_ROOT.'
+        )
+
+    def collect(self, blob_location):
+        """Remove blobs whose every name was deleted outside the dedup storage"""
+        collected = 0
+        for directory, _directories, files in os.walk(blob_location):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                # .upload- files are uploads still being written
+                if not filename.startswith('.upload-') and os.stat(path).st_nlink == 1:
+                    os.remove(path)
+                    collected += 1
+        return collected
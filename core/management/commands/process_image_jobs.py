@@ -0,0 +1,19 @@
+import time
+
+from core.image_jobs import claim_image_job, run_image_job
+from core.jobs import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = 'Compress and render queued image uploads'
+    interval = 2
+    max_concurrent_setting = 'IMAGE_MAX_CONCURRENT_JOBS'
+
+    def process_one(self, options):
+        job = claim_image_job(max_running=options['max_concurrent'])
+        if not job:
+            return None
+        started = time.monotonic()
+        run_image_job(job)
+        self.stdout.write(f'{job} in {time.monotonic() - started:.1f}s')
+        return {job.status: 1}
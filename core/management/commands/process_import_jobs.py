@@ -0,0 +1,27 @@
+import time
+
+from core.imports import claim_import_job, run_import_job
+from core.jobs import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = 'Import queued spreadsheet uploads, resuming interrupted ones from their last committed row'
+    max_concurrent_setting = 'IMPORT_MAX_CONCURRENT_JOBS'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows committed per chunk (default: IMPORT_BATCH_SIZE)')
+
+    def process_one(self, options):
+        job = claim_import_job(max_running=options['max_concurrent'])
+        if not job:
+            return None
+        started = time.monotonic()
+        run_import_job(job, batch_size=options['batch_size'])
+        self.stdout.write(
+            f'{job}: {job.created_rows} created, {job.failed_rows} skipped '
+            f'in {time.monotonic() - started:.1f}s'
+        )
+        # A job taken over by another worker is back to queued and counted there
+        return {job.status: 1}
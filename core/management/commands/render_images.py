@@ -0,0 +1,80 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.models import Rendition
+from core.renditions import (
+    build_renditions, cache_key, is_renderable, rendered_models, rendition_specs, store_renditions,
+)
+
+
+def build(source, specs):
+    with default_storage.open(source, 'rb') as image_file:
+        return build_renditions(image_file, specs)
+
+
+class Command(BaseCommand):
+    help = 'Render the responsive variants of images uploaded before renditions existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Images decoded and encoded at once (default: one per CPU)')
+        parser.add_argument('--force', action='store_true',
+                            help='Render images that already have renditions again')
+        parser.add_argument('--prune', action='store_true',
+                            help='Also delete renditions of images no longer used by any record')
+
+    def handle(self, *args, **options):
+        sources = self.sources()
+        if not options['force']:
+            done = set(Rendition.objects.values_list('source', flat=True).distinct())
+            sources = {source: specs for source, specs in sources.items() if source not in done}
+
+        rendered = failed = 0
+        # Pillow releases the GIL while resizing and encoding, so threads render in parallel
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            pending = iter(sources.items())
+            while batch := list(islice(pending, options['workers'] * 4)):
+                futures = [(source, executor.submit(build, source, specs)) for source, specs in batch]
+                for source, future in futures:
+                    try:
+                        store_renditions(source, future.result())
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(f'{source}: {e}')
+                    else:
+                        rendered += 1
+
+        pruned = self.prune(set(self.sources())) if options['prune'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {rendered} images, {failed} failed' + (f', pruned {pruned} unused' if options['prune'] else '')
+        ))
+
+    def sources(self):
+        """``{source name: specs}`` for every renderable image in the RENDITION_FIELDS models"""
+        sources = {}
+        specs = rendition_specs()
+        for model, fields in rendered_models():
+            for names in model._default_manager.values_list(*fields).iterator():
+                for name in names:
+                    if is_renderable(name):
+                        sources.setdefault(name, specs)
+        return sources
+
+    def prune(self, in_use):
+        stale = [
+            rendition for rendition in Rendition.objects.only('source', 'file').iterator()
+            if rendition.source not in in_use
+        ]
+        for rendition in stale:
+            default_storage.delete(rendition.file.name)
+        pks = [rendition.pk for rendition in stale]
+        for start in range(0, len(pks), 500):
+            Rendition.objects.filter(pk__in=pks[start:start + 500]).delete()
+        sources = {rendition.source for rendition in stale}
+        cache.delete_many([cache_key(source) for source in sources])
+        return len(sources)
@@ -0,0 +1,31 @@
+from django.core.files.storage import default_storage
+from django.db import migrations
+from django.db.models import Q
+
+VERIFICATION_MODEL = 'users.UserVerification'
+VERIFICATION_UPLOADS = 'verification_documents/'
+
+
+def remove_verification_renditions(apps, schema_editor):
+    """Identity documents are no longer rendered; delete the copies made so far"""
+    ImageJob = apps.get_model('core', 'ImageJob')
+    Rendition = apps.get_model('core', 'Rendition')
+    jobs = ImageJob.objects.filter(model=VERIFICATION_MODEL)
+    renditions = Rendition.objects.filter(
+        Q(source__startswith=VERIFICATION_UPLOADS) | Q(source__in=jobs.values('source'))
+    )
+    for name in renditions.values_list('file', flat=True).iterator():
+        default_storage.delete(name)
+    renditions.delete()
+    jobs.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_imagejob'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_verification_renditions, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,121 @@
-from django.db import models
+import copy
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import DatabaseError, models
+from django.db.models.fields.files import FieldFile
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+
+class ChangeTrackingMixin:
+    """
+    Remember the values a model instance was loaded with.
+
+    ``has_changed(name)`` and ``changed_fields`` compare the current values
+    against them, and ``save()`` on a loaded instance writes only the changed
+    columns plus any ``auto_now`` fields unless ``update_fields`` is given.
+    The changes are collected after ``pre_save``; an unchanged instance is
+    saved in full, as without the mixin.
+    Place it before ``models.Model`` in the bases.
+    """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_loaded_values()
+        return instance
+
+    @staticmethod
+    def _comparable(value):
+        # Files compare by name; containers are copied so in-place edits show up
+        if isinstance(value, FieldFile):
+            return value.name
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
+
+    def _snapshot_loaded_values(self, attnames=None):
+        if not self.is_tracking_changes:
+            self._loaded_values = {}
+        if attnames is None:
+            self._loaded_values = {}
+            attnames = [f.attname for f in self._meta.concrete_fields]
+        for attname in attnames:
+            if attname in self.__dict__:
+                self._loaded_values[attname] = self._comparable(self.__dict__[attname])
+
+    @property
+    def is_tracking_changes(self):
+        return getattr(self, '_loaded_values', None) is not None
+
+    def loaded_value(self, name):
+        """
+        The value ``name`` had when the instance was loaded or last saved.
+
+        Raises KeyError for new instances and fields that were not loaded.
+        """
+        if self._state.adding or not self.is_tracking_changes:
+            raise KeyError(name)
+        return self._loaded_values[self._meta.get_field(name).attname]
+
+    def has_changed(self, name):
+        attname = self._meta.get_field(name).attname
+        if not self.is_tracking_changes or attname not in self.__dict__:
+            return False
+        if attname not in self._loaded_values:
+            # A deferred field that has since been assigned
+            return True
+        return self._comparable(self.__dict__[attname]) != self._loaded_values[attname]
+
+    @property
+    def changed_fields(self):
+        """Names of the concrete fields whose value differs from the loaded one"""
+        return [f.name for f in self._meta.concrete_fields if not f.primary_key and self.has_changed(f.name)]
+
+    def save(self, *args, **kwargs):
+        # Only the columns changed by then are written, see _save_table()
+        self._save_changed_only = (kwargs.get('update_fields') is None and not args
+                                   and not kwargs.get('force_insert') and not kwargs.get('force_update'))
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            self._save_changed_only = False
+        saved = kwargs.get('update_fields')
+        if saved is None:
+            self._snapshot_loaded_values()
+        else:
+            self._snapshot_loaded_values([self._meta.get_field(name).attname for name in saved])
+
+    def _save_table(self, raw=False, cls=None, force_insert=False, force_update=False, using=None,
+                    update_fields=None):
+        # Runs after pre_save and any overridden save(), so their changes are included
+        if (update_fields is None and not force_insert and getattr(self, '_save_changed_only', False)
+                and not self._state.adding and self.is_tracking_changes and cls is self._meta.concrete_model):
+            changed = self.changed_fields
+            if changed:
+                auto_now = [f.name for f in self._meta.concrete_fields if getattr(f, 'auto_now', False)]
+                self._update_matched = None
+                try:
+                    return super()._save_table(raw, cls, force_insert, force_update, using,
+                                               changed + [name for name in auto_now if name not in changed])
+                except DatabaseError:
+                    # Only when the row was deleted meanwhile: insert it again, as a full save would
+                    if self._update_matched is not False:
+                        raise
+        return super()._save_table(raw, cls, force_insert, force_update, using, update_fields)
+
+    def _do_update(self, *args, **kwargs):
+        self._update_matched = super()._do_update(*args, **kwargs)
+        return self._update_matched
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if self.is_tracking_changes and fields is not None:
+            self._snapshot_loaded_values([self._meta.get_field(name).attname for name in fields])
+        else:
+            self._snapshot_loaded_values()
+
 class SiteSettings(models.Model):
     site_name = models.CharField(max_length=100, default='HEO Foundation')
     logo = models.ImageField(upload_to='site/', null=True, blank=True)
@@ -75,7 +188,7 @@ class SiteSettings(models.Model):
 
 
 
-class SliderImage(models.Model):
+class SliderImage(ChangeTrackingMixin, models.Model):
     title = models.CharField(max_length=200)
     image = models.ImageField(upload_to='slider/')
     caption = models.TextField(blank=True)
@@ -93,7 +206,7 @@ class SliderImage(models.Model):
         return self.title
 
 
-class GalleryImage(models.Model):
+class GalleryImage(ChangeTrackingMixin, models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='gallery/')
@@ -116,7 +229,7 @@ class GalleryImage(models.Model):
         return self.title
 
 
-class TeamMember(models.Model):
+class TeamMember(ChangeTrackingMixin, models.Model):
     name = models.CharField(max_length=100)
     position = models.CharField(max_length=100)
     photo = models.ImageField(upload_to='team/', null=True, blank=True)
@@ -161,7 +274,7 @@ class WhatWeDo(models.Model):
         return self.title
 
 
-class Student(models.Model):
+class Student(ChangeTrackingMixin, models.Model):
     EDUCATION_LEVEL_CHOICES = [
         ('primary_1', 'Primary 1'),
         ('primary_2', 'Primary 2'),
@@ -249,5 +362,148 @@ class Student(models.Model):
         return self.scholarship_status == 'active'
 
 
+def import_storage():
+    """Uploaded import files live outside MEDIA_ROOT and are never served publicly"""
+    return FileSystemStorage(location=getattr(settings, 'IMPORT_ROOT', settings.BASE_DIR / 'private' / 'imports'))
+
+
+class ImportJob(models.Model):
+    """
+    Spreadsheet upload imported in the background by the ``process_import_jobs`` worker.
+
+    Rows are imported in chunks; ``processed_rows`` is committed with each
+    chunk, so a job whose worker died resumes after the last committed row.
+    """
+    KIND_CHOICES = (
+        ('student', 'Scholarship students'),
+        ('beneficiary', 'Beneficiaries'),
+    )
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file = models.FileField(storage=import_storage, upload_to='uploads/%Y/%m/')
+    original_name = models.CharField(max_length=255)
+    requested_by = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='import_jobs')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_rows = models.PositiveIntegerField(default=0)
+    failed_rows = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Import Job'
+        verbose_name_plural = 'Import Jobs'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} import #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def progress(self):
+        """Percentage of rows imported so far"""
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(int(self.processed_rows * 100 / self.total_rows), 100)
+
+
+class ImportRowError(models.Model):
+    """A row an ImportJob skipped, with the reason and the values it had in the file"""
+    job = models.ForeignKey(ImportJob, on_delete=models.CASCADE, related_name='row_errors')
+    row = models.PositiveIntegerField(help_text="Line number in the uploaded file, the header being line 1")
+    message = models.TextField()
+    values = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ['job', 'row']
+        indexes = [
+            models.Index(fields=['job', 'row']),
+        ]
+
+    def __str__(self):
+        return f"Row {self.row}: {self.message}"
+
+
+
+class Rendition(models.Model):
+    """
+    A fixed-width variant of an uploaded image (see core.renditions).
+
+    ``source`` is the name of the original in the default storage; every
+    spec is rendered once per source in each of IMAGE_RENDITION_FORMATS.
+    """
+    source = models.CharField(max_length=255, db_index=True)
+    spec = models.CharField(max_length=20)
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.FileField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'spec', 'format'], name='unique_rendition'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} ({self.spec}, {self.format})"
+
+
+class ImageJob(models.Model):
+    """
+    Compression and rendering of one uploaded image, done by the ``process_image_jobs`` worker.
+
+    ``model``, ``object_id`` and ``field`` point at the image field the
+    upload was saved to; ``output`` is the file it was replaced with when
+    ``compress`` is set.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    model = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=64)
+    field = models.CharField(max_length=100)
+    source = models.CharField(max_length=255, db_index=True)
+    output = models.CharField(max_length=255, blank=True, db_index=True)
+    compress = models.BooleanField(default=False)
 
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
 
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Image Job'
+        verbose_name_plural = 'Image Jobs'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Image job #{self.pk} for {self.source} ({self.get_status_display()})"
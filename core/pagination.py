@@ -0,0 +1,309 @@
+"""
+Keyset (cursor) pagination.
+
+A page is fetched with a WHERE on the ordering columns of the last row
+seen instead of an OFFSET, so a deep page costs the same as the first one
+and rows inserted in the meantime never shift items between pages. The
+total count is only run when asked for.
+
+``KeysetPaginationMixin`` plugs the paginator into ListView and
+``KeysetPagination`` into DRF viewsets.
+"""
+import base64
+import datetime
+import decimal
+import json
+import uuid
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _json_default(value):
+    # Full precision: DjangoJSONEncoder drops microseconds past milliseconds
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not a valid cursor value')
+
+
+def encode_cursor(values, reverse=False):
+    payload = json.dumps({'v': values, 'r': int(reverse)}, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """The key values and direction of a cursor; raises InvalidCursor"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return list(data['v']), bool(data['r'])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+
+
+class OrderingKey:
+    """One column of a keyset ordering, e.g. '-submitted_at'"""
+
+    def __init__(self, queryset, key):
+        self.descending = key.startswith('-')
+        name = key.lstrip('-')
+        opts = queryset.model._meta
+        if name == 'pk':
+            name = opts.pk.name
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            self.attname = name
+            self.field = annotation.output_field
+            self.nullable = False
+        else:
+            self.field = opts.get_field(name)
+            self.attname = self.field.attname
+            self.nullable = self.field.null
+        self.unique = annotation is None and (self.field.primary_key or self.field.unique)
+
+    def value(self, obj):
+        return getattr(obj, self.attname)
+
+    def to_python(self, value):
+        return None if value is None else self.field.to_python(value)
+
+    def order_by(self, reverse):
+        expression = F(self.attname)
+        # NULLs always sort after the other values, whatever the database default
+        nulls = {}
+        if self.nullable:
+            nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+        if self.descending != reverse:
+            return expression.desc(**nulls)
+        return expression.asc(**nulls)
+
+    def equal(self, value):
+        if value is None:
+            return Q(**{f'{self.attname}__isnull': True})
+        return Q(**{self.attname: value})
+
+    def after(self, value, reverse):
+        """Rows past ``value`` in the walking direction, or None if there are none"""
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        if not self.nullable:
+            return Q(**{f'{self.attname}__{lookup}': value})
+        if reverse:
+            # Walking back from the NULLs towards the values
+            if value is None:
+                return Q(**{f'{self.attname}__isnull': False})
+            return Q(**{f'{self.attname}__{lookup}': value})
+        if value is None:
+            return None
+        return Q(**{f'{self.attname}__{lookup}': value}) | Q(**{f'{self.attname}__isnull': True})
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering``, e.g. ('-submitted_at', '-id').
+
+    The ordering should end with a unique column; the primary key is added
+    when it does not. With ``count`` the total number of rows is available
+    as ``paginator.count``, otherwise it is None and no COUNT query is run.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count=False):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keys = [OrderingKey(queryset, key) for key in ordering]
+        if not self.keys or not self.keys[-1].unique:
+            last_descending = bool(self.keys) and self.keys[-1].descending
+            self.keys.append(OrderingKey(queryset, '-pk' if last_descending else 'pk'))
+        self.with_count = count
+
+    @cached_property
+    def count(self):
+        return self.queryset.count() if self.with_count else None
+
+    def cursor_for(self, obj, reverse=False):
+        return encode_cursor([key.value(obj) for key in self.keys], reverse)
+
+    def _filter(self, values, reverse):
+        condition = Q()
+        conditions = []
+        for key, value in zip(self.keys, values):
+            after = key.after(value, reverse)
+            if after is not None:
+                conditions.append(condition & after)
+            condition &= key.equal(value)
+        if not conditions:
+            return Q(pk__in=[])
+        match = conditions[0]
+        for other in conditions[1:]:
+            match |= other
+        return match
+
+    def page(self, cursor=None):
+        """The page after (or, for a previous-page cursor, before) ``cursor``"""
+        values, reverse = None, False
+        if cursor:
+            values, reverse = decode_cursor(cursor)
+            if len(values) != len(self.keys):
+                raise InvalidCursor(cursor)
+            try:
+                values = [key.to_python(value) for key, value in zip(self.keys, values)]
+            except ValidationError:
+                raise InvalidCursor(cursor)
+
+        queryset = self.queryset.order_by(*[key.order_by(reverse) for key in self.keys])
+        if values is not None:
+            queryset = queryset.filter(self._filter(values, reverse))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=has_more)
+        return KeysetPage(rows, self, has_next=has_more, has_previous=values is not None)
+
+
+class KeysetPage(Sequence):
+    """A page of a KeysetPaginator, used like Django's Page in templates"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        return self.paginator.cursor_for(self.object_list[-1]) if self._has_next else None
+
+    @property
+    def previous_cursor(self):
+        return self.paginator.cursor_for(self.object_list[0], reverse=True) if self._has_previous else None
+
+
+class KeysetPaginationMixin:
+    """
+    ListView pagination by cursor instead of page number.
+
+    Set ``keyset_ordering`` (or override ``get_keyset_ordering``) and
+    ``keyset_count`` if the template shows the total.
+    """
+    keyset_ordering = ('-pk',)
+    keyset_count = False
+    cursor_kwarg = 'cursor'
+
+    def get_keyset_ordering(self, queryset):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(
+            queryset, page_size, self.get_keyset_ordering(queryset), count=self.keyset_count
+        )
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF pagination by cursor.
+
+    The ordering comes from the view's ``get_keyset_ordering(queryset)``
+    if it has one, else its ``keyset_ordering``. Responses carry
+    ``count``, ``next``, ``previous`` and ``results``; ``?count=false``
+    skips the count query.
+    """
+    page_size = 20
+    max_page_size = 100
+    ordering = ('-pk',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() not in ('0', 'false', 'no')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        if hasattr(view, 'get_keyset_ordering'):
+            ordering = view.get_keyset_ordering(queryset)
+        else:
+            ordering = getattr(view, 'keyset_ordering', None)
+        ordering = ordering or self.ordering
+        paginator = KeysetPaginator(
+            queryset, self.get_page_size(request), ordering, count=self.wants_count(request)
+        )
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound('Invalid cursor.')
+        return list(self.page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
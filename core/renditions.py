@@ -0,0 +1,170 @@
+"""
+Responsive image renditions.
+
+Every image uploaded to one of RENDITION_FIELDS is rendered once, by the
+image worker (see core.image_jobs), at the widths in IMAGE_RENDITIONS
+(never wider than the original) and in each of IMAGE_RENDITION_FORMATS.
+The variants are stored under ``renditions/`` and recorded as Rendition
+rows; ``renditions_for`` caches a source's rows so templates (the
+``responsive_image`` tag) and admin previews can pick a variant without
+touching the database. Images uploaded before this existed are
+rendered by the ``render_images`` command.
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image
+
+from .images import open_image
+from .models import Rendition
+
+# Image fields rendered on upload, by model label
+RENDITION_FIELDS = {
+    'applications.Beneficiary': ['photo'],
+    'cms.BlogPost': ['featured_image'],
+    'cms.Media': ['file'],
+    'core.GalleryImage': ['image'],
+    'core.SliderImage': ['image'],
+    'core.Student': ['photo'],
+    'core.TeamMember': ['photo'],
+}
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+# format: (PIL format, file extension, MIME type)
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+    'webp': ('WEBP', 'webp', 'image/webp'),
+}
+
+CACHE_KEY = 'image_renditions:{digest}'
+
+
+def rendition_specs():
+    return getattr(settings, 'IMAGE_RENDITIONS', {'thumbnail': 160, 'card': 480, 'hero': 1600})
+
+
+def rendition_formats():
+    return getattr(settings, 'IMAGE_RENDITION_FORMATS', ('webp', 'jpeg'))
+
+
+def rendition_quality():
+    return getattr(settings, 'IMAGE_RENDITION_QUALITY', 80)
+
+
+def rendition_cache_timeout():
+    return getattr(settings, 'IMAGE_RENDITION_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def is_renderable(name):
+    return bool(name) and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def rendition_name(source, spec, width, image_format):
+    return f"renditions/{os.path.splitext(source)[0]}/{spec}-{width}.{FORMATS[image_format][1]}"
+
+
+def build_renditions(image_file, specs=None):
+    """
+    Render ``image_file`` at every spec width, decoding it once.
+
+    Returns ``[(spec, format, width, height, data)]``; nothing is stored.
+    """
+    specs = specs or rendition_specs()
+    img = open_image(image_file, (max(specs.values()), 1))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    rendered = []
+    for spec, spec_width in sorted(specs.items(), key=lambda item: item[1]):
+        width = min(spec_width, img.width)
+        height = max(round(img.height * width / img.width), 1)
+        variant = img if width == img.width else img.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for image_format in rendition_formats():
+            output = BytesIO()
+            variant.save(output, format=FORMATS[image_format][0], quality=rendition_quality(),
+                         **({'optimize': True, 'progressive': True} if image_format == 'jpeg' else {'method': 4}))
+            rendered.append((spec, image_format, width, height, output.getvalue()))
+    return rendered
+
+
+def store_renditions(source, rendered, storage=None):
+    """Save the output of ``build_renditions`` for ``source``, replacing any earlier variants"""
+    storage = storage or default_storage
+    renditions = []
+    for spec, image_format, width, height, data in rendered:
+        name = rendition_name(source, spec, width, image_format)
+        if storage.exists(name):
+            storage.delete(name)
+        renditions.append(Rendition(
+            source=source, spec=spec, format=image_format, width=width, height=height,
+            file=storage.save(name, ContentFile(data)),
+        ))
+
+    stored = {rendition.file.name for rendition in renditions}
+    with transaction.atomic():
+        earlier = Rendition.objects.filter(source=source)
+        stale = [name for name in earlier.values_list('file', flat=True) if name not in stored]
+        earlier.delete()
+        Rendition.objects.bulk_create(renditions)
+    for name in stale:
+        storage.delete(name)
+    cache.set(cache_key(source), rendition_map(renditions), rendition_cache_timeout())
+    return renditions
+
+
+def render_source(source, specs=None, storage=None):
+    """Render and store the variants of the image named ``source``"""
+    storage = storage or default_storage
+    with storage.open(source, 'rb') as image_file:
+        return store_renditions(source, build_renditions(image_file, specs), storage)
+
+
+def rendered_models():
+    """``(model, fields)`` for the RENDITION_FIELDS models that are installed"""
+    for label, fields in RENDITION_FIELDS.items():
+        try:
+            yield apps.get_model(label), fields
+        except LookupError:
+            continue
+
+
+def cache_key(source):
+    return CACHE_KEY.format(digest=hashlib.md5(source.encode()).hexdigest())
+
+
+def rendition_map(renditions):
+    """``{spec: {format: (name, width, height)}}``"""
+    variants = {}
+    for rendition in renditions:
+        variants.setdefault(rendition.spec, {})[rendition.format] = (
+            rendition.file.name, rendition.width, rendition.height,
+        )
+    return variants
+
+
+def renditions_for(source):
+    """The variants of ``source`` as a ``rendition_map``; empty until it has been rendered"""
+    if not source:
+        return {}
+    key = cache_key(source)
+    variants = cache.get(key)
+    if variants is None:
+        variants = rendition_map(Rendition.objects.filter(source=source))
+        cache.set(key, variants, rendition_cache_timeout())
+    return variants
+
+
+def rendition_url(file, spec='thumbnail', image_format='jpeg'):
+    """URL of one variant of an image field's file, or of the original if it has none"""
+    if not file:
+        return ''
+    variant = renditions_for(file.name).get(spec, {}).get(image_format)
+    return default_storage.url(variant[0]) if variant else file.url
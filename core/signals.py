@@ -1,51 +1,22 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.core.files.base import ContentFile
-from django.conf import settings
-from .utils import compress_image
-import os
 
-# List of models with image fields to compress
-IMAGE_MODELS = {
-    'wagtailimages.Image': ['file'],  # Wagtail images if you're using Wagtail
-    # Add your application models with image fields here, for example:
-    # 'applications.Document': ['document'],  # Adjust based on your actual model and field names
-}
+from .image_jobs import queued_fields, queue_image_jobs
 
-@receiver(pre_save)
-def compress_images_on_save(sender, instance, **kwargs):
+
+@receiver(post_save)
+def queue_uploaded_images(sender, instance, created=False, update_fields=None, **kwargs):
     """
-    Signal handler to compress images before saving.
+    Hand newly uploaded images to the ``process_image_jobs`` worker.
+
+    Compression (COMPRESSED_FIELDS) and renditions (RENDITION_FIELDS) are
+    too slow to run inside the request that saved the upload. Only image
+    fields of a new record, or that this save changed, are looked at.
     """
-    # Get the model name in the format 'app_label.ModelName'
-    model_name = f"{sender._meta.app_label}.{sender.__name__}"
-    
-    # Check if this model is in our list of models to compress
-    if model_name in IMAGE_MODELS:
-        # Get the list of image fields for this model
-        image_fields = IMAGE_MODELS[model_name]
-        
-        # Process each image field
-        for field_name in image_fields:
-            # Get the image field
-            image_field = getattr(instance, field_name, None)
-            
-            # Check if the image field has a file and it's an image
-            if image_field and hasattr(image_field, 'file'):
-                # Get the file extension
-                file_ext = os.path.splitext(image_field.name)[1].lower()
-                
-                # Only compress image files
-                if file_ext in ['.jpg', '.jpeg', '.png', '.gif']:
-                    # Get the original file name
-                    original_name = os.path.basename(image_field.name)
-                    
-                    # Compress the image
-                    compressed_image = compress_image(
-                        image_field, 
-                        quality=getattr(settings, 'IMAGE_COMPRESSION_QUALITY', 70)
-                    )
-                    
-                    if compressed_image:
-                        # Save the compressed image back to the field
-                        image_field.save(original_name, compressed_image, save=False)
\ No newline at end of file
+    fields = queued_fields(sender._meta.label)
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields]
+    if not created:
+        fields = [field for field in fields if instance.has_changed(field)]
+    if fields:
+        queue_image_jobs(instance, fields)
@@ -0,0 +1,144 @@
+"""
+Content-addressed file storage.
+
+``DedupFileSystemStorage`` hashes an upload while writing it to a
+temporary file, keeps one copy of each distinct content under
+``.blobs/<aa>/<bb>/<sha256>`` and gives every saved name a hard link to
+that copy. Names, URLs and directory listings are unchanged, so models,
+templates and the CKEditor browser work as before; the file system's link
+count is the reference count, and the blob is removed with its last name.
+Files stored before this existed are merged by the ``dedupe_media``
+command. Where hard links are not available, files are copied instead.
+"""
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = '.blobs'
+CHUNK_SIZE = 64 * 1024
+
+
+def file_digest(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@deconstructible
+class DedupFileSystemStorage(FileSystemStorage):
+    """FileSystemStorage keeping a single copy of identical files"""
+
+    @property
+    def blob_location(self):
+        return getattr(settings, 'DEDUP_BLOB_ROOT', None) or os.path.join(self.location, BLOB_DIR)
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_location, digest[:2], digest[2:4], digest)
+
+    def _save(self, name, content):
+        blob = self.store_blob(content)
+        while True:
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                os.link(blob, full_path)
+            except FileExistsError:
+                # Taken since get_available_name() ran; pick another
+                name = self.get_available_name(name)
+                continue
+            except FileNotFoundError:
+                # The blob's last other name was deleted meanwhile, removing the blob too
+                blob = self.store_blob(content)
+                continue
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                    raise
+                name = self.copy_blob(blob, name)
+                if os.stat(blob).st_nlink == 1:
+                    os.remove(blob)
+            return str(name).replace('\\', '/')
+
+    def store_blob(self, content):
+        """Write ``content`` to the blob store, hashing it on the way, and return the blob's path"""
+        os.makedirs(self.blob_location, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_location, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    f.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+
+            blob = self.blob_path(digest.hexdigest())
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            try:
+                # Never replaced once there, so existing links keep sharing it
+                os.link(tmp_path, blob)
+            except FileExistsError:
+                pass
+            except OSError:
+                if not os.path.exists(blob):
+                    os.replace(tmp_path, blob)
+            return blob
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def copy_blob(self, blob, name):
+        """Fallback for file systems without hard links: an ordinary copy"""
+        while True:
+            full_path = self.path(name)
+            try:
+                fd = os.open(full_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+            except FileExistsError:
+                name = self.get_available_name(name)
+                continue
+            with os.fdopen(fd, 'wb') as f, open(blob, 'rb') as source:
+                shutil.copyfileobj(source, f, CHUNK_SIZE)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+            return name
+
+    def references(self, name):
+        """How many stored names share ``name``'s content"""
+        try:
+            return max(os.stat(self.path(name)).st_nlink - 1, 1)
+        except FileNotFoundError:
+            return 0
+
+    def delete(self, name):
+        path = self.path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        if stat.st_nlink == 2:
+            # The last name left besides the blob itself
+            blob = self.blob_path(file_digest(path))
+            if os.path.exists(blob) and os.path.samestat(os.stat(blob), stat):
+                os.remove(blob)
+        super().delete(name)
+
+    def listdir(self, path):
+        directories, files = super().listdir(path)
+        if os.path.normpath(self.path(path)) == os.path.normpath(self.location):
+            directories = [directory for directory in directories if directory != BLOB_DIR]
+        return directories, files
+
+
+def dedup_storage():
+    """Storage for uploads that are often repeated: logos, receipt scans, documents"""
+    return DedupFileSystemStorage()
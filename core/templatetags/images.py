@@ -0,0 +1,53 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from core.renditions import FORMATS, renditions_for, rendition_url
+
+register = template.Library()
+
+
+def srcset(variants, image_format):
+    """``url 480w, ...`` for one format, one entry per distinct width"""
+    widths = {}
+    for formats in variants.values():
+        if image_format in formats:
+            name, width, _height = formats[image_format]
+            widths.setdefault(width, default_storage.url(name))
+    return ', '.join(f'{url} {width}w' for width, url in sorted(widths.items()))
+
+
+@register.simple_tag
+def responsive_image(file, spec='card', sizes='100vw', **attrs):
+    """
+    A ``<picture>`` serving the renditions of an image field's file.
+
+    ``spec`` is the variant used as the fallback ``src``; any other keyword
+    (``alt``, ``class``, ``style``...) becomes an attribute of the ``<img>``.
+    Images without renditions yet are served as a plain ``<img>`` of the original.
+    """
+    if not file:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    variants = renditions_for(file.name)
+    fallback = variants.get(spec, {}).get('jpeg')
+    if not fallback:
+        return format_html('<img src="{}"{}>', file.url, flatatt(attrs))
+
+    name, width, height = fallback
+    srcsets = {image_format: srcset(variants, image_format) for image_format in FORMATS}
+    sources = format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', (
+        (FORMATS[image_format][2], value, sizes)
+        for image_format, value in srcsets.items() if value and image_format != 'jpeg'
+    ))
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}"{}></picture>',
+        sources, default_storage.url(name), srcsets['jpeg'], sizes, width, height, flatatt(attrs),
+    )
+
+
+@register.simple_tag
+def image_variant_url(file, spec='thumbnail', image_format='jpeg'):
+    """URL of one rendition of an image field's file, falling back to the original"""
+    return rendition_url(file, spec, image_format)
@@ -1,3 +1,585 @@
-from django.test import TestCase
+import errno
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_save, pre_save
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+from PIL import Image
+
+from applications.models import Application, Program, ProgramStats
+from core.imports import (
+    ImportJobTakenOver, RowImporter, StudentImporter, claim_import_job, get_importer, read_csv, read_xlsx,
+    run_import_job
+)
+from core.image_jobs import claim_image_job, run_image_job
+from core.models import GalleryImage, ImageJob, ImportJob, Rendition, Student
+from core.pagination import InvalidCursor, KeysetPaginator
+from core.renditions import rendition_url
+from core.storage import BLOB_DIR, DedupFileSystemStorage
+from users.models import EmailVerificationToken, UserVerification
+
+User = get_user_model()
+
+
+class ChangeTrackingMixinTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='tracked@example.com', password='x')
+        self.program = Program.objects.create(
+            name='Tracked Program',
+            program_type='scholarship',
+            description='Test Description',
+            eligibility_criteria='Test Criteria',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+        Application.objects.create(
+            program=self.program, applicant=self.user, form_data={'school': 'Unity'}, status='draft'
+        )
+        self.application = Application.objects.get()
+
+    def test_has_changed(self):
+        self.assertFalse(self.application.has_changed('status'))
+        self.application.status = 'submitted'
+        self.assertTrue(self.application.has_changed('status'))
+        self.assertEqual(self.application.loaded_value('status'), 'draft')
+        self.assertEqual(self.application.changed_fields, ['status'])
+
+    def test_in_place_json_edits_are_detected(self):
+        self.application.form_data['school'] = 'Kings'
+        self.assertEqual(self.application.changed_fields, ['form_data'])
+
+    def test_save_writes_only_changed_columns(self):
+        self.application.review_notes = 'Looks good'
+        with CaptureQueriesContext(connection) as queries:
+            self.application.save()
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('review_notes', updates[0])
+        self.assertIn('updated_at', updates[0])
+        self.assertNotIn('form_data', updates[0])
+        # The status signal reads the loaded value instead of selecting the row again
+        self.assertFalse(any('FROM "applications_application"' in q['sql'] for q in queries))
+
+        self.assertFalse(self.application.has_changed('review_notes'))
+        self.assertEqual(Application.objects.get().review_notes, 'Looks good')
+
+    def test_status_change_still_reaches_signals(self):
+        self.application.status = 'submitted'
+        self.application.save()
+        stats = ProgramStats.objects.get(program=self.program)
+        self.assertEqual((stats.draft, stats.submitted), (0, 1))
+
+    def test_refresh_from_db_resets_snapshot(self):
+        Application.objects.update(status='approved')
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.loaded_value('status'), 'approved')
+        self.assertEqual(self.application.changed_fields, [])
+
+    def test_unchanged_instance_is_saved_in_full(self):
+        token = EmailVerificationToken.objects.create(user=self.user)
+        token = EmailVerificationToken.objects.get(pk=token.pk)
+        received = []
+        post_save.connect(lambda instance, **kwargs: received.append(instance), sender=EmailVerificationToken,
+                          weak=False, dispatch_uid='tracked')
+        self.addCleanup(post_save.disconnect, sender=EmailVerificationToken, dispatch_uid='tracked')
+        with CaptureQueriesContext(connection) as queries:
+            token.save()
+        self.assertEqual(len(received), 1)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('expires_at', queries[0]['sql'])
+
+        with CaptureQueriesContext(connection) as queries:
+            token.mark_as_used()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('expires_at', queries[0]['sql'])
+        self.assertTrue(EmailVerificationToken.objects.get(pk=token.pk).is_used)
+
+    def test_fields_set_in_pre_save_are_written(self):
+        def add_notes(sender, instance, **kwargs):
+            instance.review_notes = 'Checked'
+        pre_save.connect(add_notes, sender=Application, dispatch_uid='notes')
+        self.addCleanup(pre_save.disconnect, sender=Application, dispatch_uid='notes')
+
+        self.application.save()
+        self.assertEqual(Application.objects.get().review_notes, 'Checked')
+
+    def test_deleted_row_is_inserted_again(self):
+        self.application.review_notes = 'Restored'
+        Application.objects.filter(pk=self.application.pk).delete()
+        self.application.save()
+        self.assertEqual(Application.objects.get(pk=self.application.pk).review_notes, 'Restored')
+
+    def test_other_database_errors_propagate(self):
+        User.objects.create_user(email='taken@example.com', password='x')
+        user = User.objects.get(pk=self.user.pk)
+        user.email = 'taken@example.com'
+        with CaptureQueriesContext(connection) as queries, self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                user.save()
+        self.assertEqual([q['sql'].split()[0] for q in queries if 'SAVEPOINT' not in q['sql']], ['UPDATE'])
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(
+            name='Paged Program',
+            program_type='scholarship',
+            description='Test Description',
+            eligibility_criteria='Test Criteria',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+        now = timezone.now()
+        # Ties and NULLs in submitted_at are broken by id
+        submitted = [now, now, None, now - timedelta(days=1), None, now - timedelta(days=2), now]
+        for i, submitted_at in enumerate(submitted):
+            user = User.objects.create_user(email=f'paged{i}@example.com', password='x')
+            Application.objects.create(program=program, applicant=user, form_data={}, status='submitted')
+            Application.objects.filter(applicant=user).update(submitted_at=submitted_at)
+        self.expected = sorted(
+            Application.objects.all(),
+            key=lambda a: (a.submitted_at is not None, a.submitted_at or now, a.pk),
+            reverse=True,
+        )
+
+    def paginator(self, **kwargs):
+        return KeysetPaginator(Application.objects.all(), 3, ('-submitted_at', '-id'), **kwargs)
+
+    def test_walks_forward_and_back_without_gaps(self):
+        paginator = self.paginator()
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([obj for page in pages for obj in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous())
+
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = paginator.page(page.previous_cursor)
+            self.assertEqual(list(page), list(expected))
+        self.assertFalse(page.has_previous())
+
+    def test_inserts_do_not_shift_pages(self):
+        paginator = self.paginator()
+        first = paginator.page()
+        user = User.objects.create_user(email='late@example.com', password='x')
+        Application.objects.create(
+            program=Program.objects.get(), applicant=user, form_data={}, status='submitted'
+        )
+        Application.objects.filter(applicant=user).update(submitted_at=timezone.now())
+        self.assertEqual(list(paginator.page(first.next_cursor)), self.expected[3:6])
+
+    def test_count_is_optional(self):
+        with CaptureQueriesContext(connection) as queries:
+            paginator = self.paginator()
+            paginator.page(paginator.page().next_cursor)
+            self.assertIsNone(paginator.count)
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries))
+        self.assertEqual(self.paginator(count=True).count, 7)
+
+    def test_invalid_cursor(self):
+        for cursor in ['garbage', 'eyJ2IjpbMV0sInIiOjB9', 'eyJ2IjpbIm5vdCBhIGRhdGUiLDFdLCJyIjowfQ']:
+            with self.assertRaises(InvalidCursor):
+                self.paginator().page(cursor)
+
+
+class ImportJobTests(TestCase):
+    HEADER = (
+        'full_name,date_of_birth,gender,phone_number,email,school_name,school_address,current_class,program,'
+        'scholarship_amount,scholarship_start_date,scholarship_end_date,scholarship_status,guardian_name,'
+        'guardian_relationship,guardian_phone,guardian_address,notes\n'
+    )
+
+    def setUp(self):
+        import_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, import_root)
+        storage = mock.patch.object(ImportJob._meta.get_field('file'), 'storage', FileSystemStorage(import_root))
+        storage.start()
+        self.addCleanup(storage.stop)
+        self.staff_user = User.objects.create_user(
+            email='students@example.com', password='x', is_staff=True, is_superuser=True
+        )
+        self.client.force_login(self.staff_user)
+
+    def student_row(self, name, gender='female'):
+        return (
+            f'{name},2010-05-15,{gender},080,,Unity School,1 School Road,primary_5,,50000,2024-01-15,,active,'
+            'Jane Doe,Mother,080,2 Home Road,\n'
+        )
+
+    def upload(self, *rows):
+        csv_file = SimpleUploadedFile('students.csv', (self.HEADER + ''.join(rows)).encode('utf-8'))
+        response = self.client.post(reverse('admin:core_student_bulk_upload'), {'csv_file': csv_file})
+        return response.json()
+
+    def test_upload_queues_job_and_status_reports_results(self):
+        data = self.upload(self.student_row('Ada'), self.student_row('Obi', gender='other'), self.student_row('Eze'))
+
+        self.assertTrue(data['success'])
+        self.assertEqual(data['job']['status'], 'queued')
+        self.assertEqual(Student.objects.count(), 0)
+
+        job = run_import_job(claim_import_job(), batch_size=2)
+
+        self.assertEqual((job.status, job.total_rows, job.created_rows, job.failed_rows), ('completed', 3, 2, 1))
+        self.assertEqual(Student.objects.filter(created_by=self.staff_user).count(), 2)
+        status = self.client.get(data['job']['status_url']).json()
+        self.assertEqual(status['progress'], 100)
+        self.assertEqual(status['errors'], [
+            {'row': 3, 'message': 'Validation error: Invalid gender: other. Must be one of: male, female'}
+        ])
+        report = b''.join(self.client.get(status['error_report_url']).streaming_content).decode()
+        self.assertIn('3,"Validation error: Invalid gender: other. Must be one of: male, female",Obi', report)
+
+    def test_xlsx_upload_is_imported(self):
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(StudentImporter.columns)
+        sheet.append([
+            'Ada', datetime(2010, 5, 15), 'female', '080', '', 'Unity School', '1 School Road', 'primary_5', '',
+            50000, date(2024, 1, 15), None, 'active', 'Jane Doe', 'Mother', '080', '2 Home Road', None,
+        ])
+        sheet.append([None] * len(StudentImporter.columns))
+        output = io.BytesIO()
+        workbook.save(output)
+        xlsx_file = SimpleUploadedFile('students.xlsx', output.getvalue())
+
+        data = self.client.post(reverse('admin:core_student_bulk_upload'), {'csv_file': xlsx_file}).json()
+        self.assertTrue(data['success'])
+        job = run_import_job(claim_import_job())
+
+        self.assertEqual((job.status, job.total_rows, job.created_rows), ('completed', 1, 1))
+        student = Student.objects.get()
+        self.assertEqual((student.date_of_birth, student.scholarship_amount), (date(2010, 5, 15), 50000))
+
+    def test_xlsx_cells_read_as_text(self):
+        workbook = Workbook()
+        workbook.active.append(['name', 'amount', 'ratio', 'day', 'stamp', 'empty'])
+        workbook.active.append(['Ada', 50000.0, 0.5, date(2024, 1, 15), datetime(2024, 1, 15, 9, 30), None])
+        output = io.BytesIO()
+        workbook.save(output)
+
+        self.assertEqual(list(read_xlsx(output)), [(2, {
+            'name': 'Ada', 'amount': '50000', 'ratio': '0.5', 'day': '2024-01-15',
+            'stamp': '2024-01-15 09:30:00', 'empty': '',
+        })])
+
+    def test_errors_keep_the_sheet_row_numbers_past_blank_rows(self):
+        data = self.upload('\n', self.student_row('Ada'), ',,,\n', '\n', self.student_row('Obi', gender='other'))
+        job = run_import_job(claim_import_job(), batch_size=1)
+
+        self.assertEqual((job.total_rows, job.created_rows, job.failed_rows), (3, 1, 2))
+        self.assertEqual(list(job.row_errors.order_by('row').values_list('row', flat=True)), [4, 6])
+
+        workbook = Workbook()
+        workbook.active.append(['name'])
+        workbook.active.append([None])
+        workbook.active.append(['Ada'])
+        output = io.BytesIO()
+        workbook.save(output)
+        self.assertEqual(list(read_xlsx(output)), [(3, {'name': 'Ada'})])
+
+    def test_csv_rows_are_numbered_by_the_line_they_start_on(self):
+        upload = io.BytesIO(b'name,notes\nAda,"two\nlines"\n\nObi,one\n')
+        self.assertEqual(list(read_csv(upload)), [
+            (2, {'name': 'Ada', 'notes': 'two\nlines'}),
+            (5, {'name': 'Obi', 'notes': 'one'}),
+        ])
+
+    def test_legacy_xls_upload_is_rejected(self):
+        xls_file = SimpleUploadedFile('students.xls', b'not a zip')
+        data = self.client.post(reverse('admin:core_student_bulk_upload'), {'csv_file': xls_file}).json()
+        self.assertFalse(data['success'])
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_batch_validation_messages(self):
+        program = Program.objects.create(
+            name='Unity Scholars', program_type='scholarship', description='d', eligibility_criteria='c',
+            start_date=timezone.now().date(), end_date=timezone.now().date(),
+        )
+        row = dict(zip(StudentImporter.columns, self.student_row('Ada').rstrip('\n').split(',')))
+        rows = [
+            {**row, 'date_of_birth': '2010/05/15'},
+            {**row, 'date_of_birth': 'soon', 'gender': 'other'},
+            {**row, 'gender': 'Other'},
+            {**row, 'current_class': 'year_9'},
+            {**row, 'scholarship_amount': 'lots'},
+            {**row, 'email': 'not-an-email', 'school_name': ''},
+            {**row, 'date_of_birth': '01/02/2010', 'scholarship_status': 'paused', 'program': 'Unity Scholars'},
+            {**row, 'scholarship_end_date': 'later', 'program': 'Unknown'},
+        ]
+        job = ImportJob(requested_by=self.staff_user, kind='student')
+
+        with CaptureQueriesContext(connection) as queries:
+            students, errors = StudentImporter(job).build_batch(rows)
+
+        self.assertEqual(len(queries), 1)
+        messages = {index: StudentImporter(job).error_message(exc) for index, exc in errors}
+        self.assertEqual(messages, {
+            0: 'Validation error: Invalid date format for date_of_birth: 2010/05/15. Use YYYY-MM-DD format.',
+            1: 'Validation error: Invalid date format for date_of_birth: soon. Use YYYY-MM-DD format.',
+            2: 'Validation error: Invalid gender: other. Must be one of: male, female',
+            3: 'Validation error: Invalid class: year_9. Must be one of: ' + ', '.join(
+                dict(Student.EDUCATION_LEVEL_CHOICES)
+            ),
+            4: 'Validation error: Invalid scholarship amount: lots. Must be a number.',
+            5: 'Validation error: Enter a valid email address., This field cannot be blank.',
+        })
+        ambiguous, unknown_program = students
+        self.assertEqual(ambiguous.date_of_birth, date(2010, 2, 1))
+        self.assertEqual((ambiguous.scholarship_status, ambiguous.program), ('active', program))
+        self.assertEqual((unknown_program.program, unknown_program.scholarship_end_date), (None, None))
+
+    def test_interrupted_job_resumes_after_last_committed_chunk(self):
+        self.upload(*[self.student_row(f'Student {i}') for i in range(5)])
+        job = claim_import_job()
+        import_chunk = RowImporter.import_chunk
+        calls = []
+
+        def crash_after_first_chunk(importer, rows):
+            if calls:
+                raise KeyboardInterrupt
+            calls.append(rows)
+            import_chunk(importer, rows)
+
+        with mock.patch.object(RowImporter, 'import_chunk', crash_after_first_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                run_import_job(job, batch_size=2)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, Student.objects.count()), ('running', 2, 2))
+        self.assertIsNone(claim_import_job())
+
+        ImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        resumed = claim_import_job()
+        self.assertEqual((resumed.pk, resumed.attempts), (job.pk, 2))
+        run_import_job(resumed, batch_size=2)
+
+        self.assertEqual(resumed.status, 'completed')
+        self.assertEqual(
+            sorted(Student.objects.values_list('full_name', flat=True)), [f'Student {i}' for i in range(5)]
+        )
+
+    def test_chunk_committed_by_another_worker_is_rolled_back(self):
+        self.upload(self.student_row('Ada'), self.student_row('Obi'))
+        job = claim_import_job()
+        stale = ImportJob.objects.get(pk=job.pk)
+        get_importer(job).import_chunk(list(get_importer(job).rows())[:1])
+
+        with self.assertRaises(ImportJobTakenOver):
+            get_importer(stale).import_chunk(list(get_importer(stale).rows())[:1])
+
+        self.assertEqual(Student.objects.count(), 1)
+        self.assertEqual(ImportJob.objects.get(pk=job.pk).processed_rows, 1)
+
+    def test_job_failing_repeatedly_is_given_up(self):
+        self.upload(self.student_row('Ada'))
+        with self.settings(IMPORT_JOB_MAX_ATTEMPTS=1):
+            job = claim_import_job()
+            ImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+            self.assertIsNone(claim_import_job())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'The import worker stopped responding.'))
+
+
+@override_settings(IMAGE_RENDITIONS={'thumbnail': 100, 'card': 300, 'hero': 900})
+class RenditionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = self.settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+
+    def photo(self, size=(600, 400), name='photo.jpg'):
+        output = io.BytesIO()
+        Image.new('RGB', size, 'teal').save(output, format='JPEG')
+        return SimpleUploadedFile(name, output.getvalue())
+
+    def upload(self, **kwargs):
+        image = GalleryImage.objects.create(title='Class', image=self.photo(**kwargs), category='education')
+        while job := claim_image_job():
+            run_image_job(job)
+        return image
+
+    def test_upload_is_rendered_by_worker(self):
+        image = GalleryImage.objects.create(title='Class', image=self.photo(), category='education')
+        self.assertFalse(Rendition.objects.exists())
+        job = ImageJob.objects.get()
+        self.assertEqual((job.model, job.object_id, job.field, job.compress),
+                         ('core.GalleryImage', str(image.pk), 'image', False))
+
+        self.assertEqual(run_image_job(claim_image_job()).status, 'completed')
+
+        renditions = {(r.spec, r.format): r for r in Rendition.objects.filter(source=image.image.name)}
+        self.assertEqual(len(renditions), 6)
+        self.assertEqual((renditions['card', 'webp'].width, renditions['card', 'webp'].height), (300, 200))
+        # Never wider than the original
+        self.assertEqual(renditions['hero', 'jpeg'].width, 600)
+        with default_storage.open(renditions['thumbnail', 'webp'].file.name, 'rb') as f, Image.open(f) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (100, 67)))
+
+        # Saving again does not look for the image again, nor queue it
+        with self.assertNumQueries(1):
+            image.save()
+        image.title = 'Classroom'
+        with self.assertNumQueries(1):
+            image.save()
+        self.assertEqual(ImageJob.objects.count(), 1)
+
+        image.image = self.photo(name='new.jpg')
+        image.save()
+        self.assertEqual(ImageJob.objects.filter(source=image.image.name).count(), 1)
+
+    def test_responsive_image_tag(self):
+        image = self.upload()
+        template = Template('{% load images %}{% responsive_image image.image sizes="50vw" alt=image.title %}')
+
+        with self.assertNumQueries(0):
+            html = template.render(Context({'image': image}))
+
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn('card-300.jpg 300w, ', html)
+        self.assertIn('hero-600.jpg 600w" sizes="50vw" width="300" height="200" alt="Class" loading="lazy">', html)
+        self.assertEqual(rendition_url(image.image), default_storage.url(
+            Rendition.objects.get(source=image.image.name, spec='thumbnail', format='jpeg').file.name
+        ))
+
+    def test_unrendered_image_falls_back_to_original(self):
+        image = GalleryImage.objects.create(title='Class', image=self.photo(), category='education')
+        html = Template('{% load images %}{% responsive_image image.image %}').render(Context({'image': image}))
+        self.assertEqual(html, f'<img src="{image.image.url}" loading="lazy">')
+        self.assertEqual(rendition_url(image.image), image.image.url)
+
+    def test_backfill_command(self):
+        image = GalleryImage.objects.create(title='Old', image=self.photo(), category='education')
+        broken = GalleryImage.objects.create(
+            title='Broken', image=SimpleUploadedFile('broken.jpg', b'not an image'), category='education'
+        )
+        Rendition.objects.create(source='gallery/deleted.jpg', spec='card', format='jpeg', width=1, height=1,
+                                 file='renditions/gallery/deleted/card-1.jpg')
+
+        call_command('render_images', workers=2, prune=True, stdout=io.StringIO(), stderr=io.StringIO())
+
+        self.assertEqual(Rendition.objects.filter(source=image.image.name).count(), 6)
+        self.assertFalse(Rendition.objects.filter(source=broken.image.name).exists())
+        self.assertFalse(Rendition.objects.filter(source='gallery/deleted.jpg').exists())
+
+    def test_worker_command(self):
+        GalleryImage.objects.create(title='Class', image=self.photo(), category='education')
+        GalleryImage.objects.create(
+            title='Broken', image=SimpleUploadedFile('broken.jpg', b'not an image'), category='education'
+        )
+        out = io.StringIO()
+        call_command('process_image_jobs', once=True, max_concurrent=1, stdout=out)
+        self.assertEqual(out.getvalue().splitlines()[-1], 'Done: 1 completed, 1 failed')
+        self.assertFalse(ImageJob.objects.filter(status__in=['queued', 'running']).exists())
+
+    def test_identity_documents_are_not_rendered(self):
+        user = User.objects.create_user(email='kyc@example.com', password='x')
+        verification = UserVerification.objects.create(
+            user=user, id_document=self.photo(name='id.jpg'), address_proof=self.photo(name='bill.jpg')
+        )
+        self.assertFalse(ImageJob.objects.exists())
+
+        # A job queued before they were excluded is completed without rendering
+        ImageJob.objects.create(model='users.UserVerification', object_id=str(verification.pk),
+                                field='id_document', source=verification.id_document.name)
+        self.assertEqual(run_image_job(claim_image_job()).status, 'completed')
+        self.assertFalse(Rendition.objects.exists())
+
+
+class DedupStorageTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.storage = DedupFileSystemStorage(location=self.root)
+
+    def blobs(self):
+        return [name for _dir, _dirs, names in os.walk(os.path.join(self.root, BLOB_DIR)) for name in names]
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.storage.save('receipts/scan.pdf', ContentFile(b'%PDF receipt'))
+        second = self.storage.save('receipts/scan.pdf', ContentFile(b'%PDF receipt'))
+        other = self.storage.save('receipts/other.pdf', ContentFile(b'%PDF other'))
+
+        self.assertNotEqual(first, second)
+        self.assertTrue(os.path.samefile(self.storage.path(first), self.storage.path(second)))
+        self.assertEqual((self.storage.references(first), self.storage.references(other)), (2, 1))
+        self.assertEqual(len(self.blobs()), 2)
+        with self.storage.open(second) as f:
+            self.assertEqual(f.read(), b'%PDF receipt')
+        self.assertEqual(self.storage.listdir('')[0], ['receipts'])
+
+        self.storage.delete(first)
+        self.assertEqual(len(self.blobs()), 2)
+        self.storage.delete(second)
+        self.assertFalse(self.storage.exists(second))
+        self.assertEqual(len(self.blobs()), 1)
+
+    def test_blob_deleted_before_it_is_linked_is_stored_again(self):
+        store_blob = self.storage.store_blob
+        removed = []
+
+        def removed_by_concurrent_delete(content):
+            blob = store_blob(content)
+            if not removed:
+                os.remove(blob)
+                removed.append(blob)
+            return blob
+
+        with mock.patch.object(self.storage, 'store_blob', removed_by_concurrent_delete):
+            name = self.storage.save('receipts/scan.pdf', ContentFile(b'%PDF receipt'))
+
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'%PDF receipt')
+        self.assertEqual(os.stat(removed[0]).st_nlink, 2)
+
+    def test_dedupe_command_merges_existing_copies(self):
+        for name in ('media/logo.png', 'uploads/logo.png', 'application_documents/logo.png', 'gallery/logo.png'):
+            os.makedirs(os.path.dirname(os.path.join(self.root, name)), exist_ok=True)
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(b'logo' * 1000)
+
+        with self.settings(MEDIA_ROOT=self.root):
+            call_command('dedupe_media', stdout=io.StringIO())
+            uploaded = DedupFileSystemStorage().save('media/logo.png', ContentFile(b'logo' * 1000))
+
+        paths = [os.path.join(self.root, name) for name in ('media/logo.png', 'uploads/logo.png', uploaded)]
+        self.assertEqual(len({os.stat(path).st_ino for path in paths}), 1)
+        self.assertEqual(os.stat(paths[0]).st_nlink, 5)
+        self.assertEqual(len(self.blobs()), 1)
+        # Only the directories the dedup storage saves to are merged
+        self.assertEqual(os.stat(os.path.join(self.root, 'gallery/logo.png')).st_nlink, 1)
+
+    def test_dedupe_command_reports_cross_device_links(self):
+        for name in ('media/logo.png', 'uploads/logo.png'):
+            os.makedirs(os.path.dirname(os.path.join(self.root, name)), exist_ok=True)
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(b'logo')
+
+        cross_device = OSError(errno.EXDEV, 'Invalid cross-device link')
+        with self.settings(MEDIA_ROOT=self.root), mock.patch('os.link', side_effect=cross_device):
+            with self.assertRaisesMessage(CommandError, 'are on different file systems'):
+                call_command('dedupe_media', stdout=io.StringIO())
+        self.assertEqual(os.stat(os.path.join(self.root, 'media/logo.png')).st_nlink, 1)
@@ -10,6 +10,8 @@ from django.core.paginator import Paginator
 from django.db.models import Q, Count, Sum
 from core.models import SiteSettings, SliderImage, GalleryImage, TeamMember, Achievement, WhatWeDo, Student
 from cms.models import ImpactStory
+from applications.utils import program_stats_totals
+from users.models import User
 from .forms import ContactForm
 from django.core.mail import send_mail
 
@@ -91,7 +93,7 @@ def dashboard_view(request):
     context = {
         'settings': SiteSettings.get_settings(),
         'total_users': User.objects.count(),
-        'total_applications': Application.objects.count()
+        'total_applications': program_stats_totals()['total']
     }
     return render(request, 'core/dashboard.html', context)
 
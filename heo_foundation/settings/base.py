@@ -228,6 +228,7 @@ JAZZMIN_UI_TWEAKS = {
 
 # CKEditor configuration
 CKEDITOR_UPLOAD_PATH = "uploads/"
+CKEDITOR_STORAGE_BACKEND = 'core.storage.DedupFileSystemStorage'  # one copy of repeated uploads
 CKEDITOR_CONFIGS = {
     'default': {
         'toolbar': 'full',
@@ -251,3 +252,54 @@ CKEDITOR_CONFIGS = {
 }
 
 IMAGE_COMPRESSION_QUALITY = 70
+
+# Email outbox (see applications.utils.queue_mail and the send_queued_email command)
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60  # seconds, doubled after every failed attempt
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 600  # seconds before a stuck 'sending' row is requeued
+
+# Exports read applications in primary-key chunks of this many rows
+EXPORT_CHUNK_SIZE = 2000
+
+# Background export jobs (see the process_export_jobs command)
+EXPORT_ROOT = BASE_DIR / 'private' / 'exports'  # outside MEDIA_ROOT so files are never served publicly
+EXPORT_PDF_ROWS_PER_TABLE = 500
+EXPORT_MAX_CONCURRENT_JOBS = 2
+EXPORT_JOB_TIMEOUT = 1800  # seconds without progress before a running job is marked failed
+
+# Seconds a compiled program application form stays cached (it is also dropped when the program or its fields change)
+FORM_SCHEMA_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Seconds an anonymous beneficiary showcase page stays cached (saving a beneficiary replaces it sooner)
+SHOWCASE_CACHE_TIMEOUT = 60 * 15
+
+# Seconds the public impact page figures may be old before a visit recomputes them
+IMPACT_SNAPSHOT_MAX_AGE = 60 * 10
+
+# Shortest word in MySQL's full-text index: the server's innodb_ft_min_token_size (see applications.search)
+SEARCH_MYSQL_MIN_TOKEN_SIZE = 3
+
+# Background spreadsheet imports (see core.imports and the process_import_jobs command)
+IMPORT_BATCH_SIZE = 500  # rows validated and committed per chunk
+IMPORT_ROOT = BASE_DIR / 'private' / 'imports'  # uploaded files, outside MEDIA_ROOT like the exports
+IMPORT_MAX_CONCURRENT_JOBS = 2
+IMPORT_JOB_TIMEOUT = 600  # seconds without progress before a running job is queued again to resume
+IMPORT_JOB_MAX_ATTEMPTS = 3  # runs a job gets before it is marked failed
+
+# Media uploads are re-encoded as JPEG (see core.images)
+IMAGE_MAX_DIMENSION = 2560  # pixels on the longest side
+IMAGE_TARGET_BYTES = 200 * 1024
+IMAGE_MAX_ENCODES = 5  # quality steps tried per upload
+
+# Responsive variants rendered once per uploaded image (see core.renditions and the render_images command)
+IMAGE_RENDITIONS = {'thumbnail': 160, 'card': 480, 'hero': 1600}  # name: width in pixels
+IMAGE_RENDITION_FORMATS = ('webp', 'jpeg')
+IMAGE_RENDITION_QUALITY = 80
+IMAGE_RENDITION_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Background image processing (see core.image_jobs and the process_image_jobs command)
+IMAGE_MAX_CONCURRENT_JOBS = 2
+IMAGE_JOB_TIMEOUT = 300  # seconds a job may run before it is queued again
+IMAGE_JOB_MAX_ATTEMPTS = 3
+
@@ -5,6 +5,8 @@ from django.core.validators import FileExtensionValidator
 from django.core.exceptions import ValidationError
 import uuid
 
+from core.models import ChangeTrackingMixin
+
 
 def validate_image_file_extension(value):
     """Validate that uploaded file is a JPEG or PNG image."""
@@ -31,7 +33,7 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault('is_superuser', True)
         return self.create_user(email, password, **extra_fields)
 
-class User(AbstractUser):
+class User(ChangeTrackingMixin, AbstractUser):
     USER_TYPE_CHOICES = (
         ('applicant', 'Applicant'),
         ('admin', 'Admin'),
@@ -54,7 +56,7 @@ class User(AbstractUser):
     def __str__(self):
         return self.username or self.email or f"User {self.pk}"
 
-class UserVerification(models.Model):
+class UserVerification(ChangeTrackingMixin, models.Model):
     VERIFICATION_STATUS = (
         ('pending', 'Pending'),
         ('approved', 'Approved'),
@@ -124,7 +126,7 @@ class UserVerification(models.Model):
         )
 
 
-class EmailVerificationToken(models.Model):
+class EmailVerificationToken(ChangeTrackingMixin, models.Model):
     """Token for email verification during registration"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='verification_tokens')
     token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)